@@ -1,35 +1,60 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from PyQt5.QtCore import QTimer
-from PyQt5.QtGui import QColor
-from PyQt5.QtWidgets import QColorDialog
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QColor, QPalette
+from PyQt5.QtWidgets import QApplication, QColorDialog
 
 from .internals import Setting, MenuAction, alert
 from .color_map import ColorMapWindow
-from .mode import ModeWindow
+from .colors import duplicate_colors
+from .mode import ModeWindow, PaletteChangeWatcher
 from .selector import StylersSelectorWindow
 
 
-class UserColorMap(Setting, MenuAction):
-    value = {'#000000': 'white'}
+class WindowMixin:
+    """For settings edited in a dialog; the dialog is kept only as long as it is open."""
+
     window = None
+
+    def show_window(self, create_window):
+        if not self.window:
+            self.window = create_window()
+            self.window.setAttribute(Qt.WA_DeleteOnClose)
+            self.window.destroyed.connect(self.release_window)
+        self.window.show()
+
+    def release_window(self):
+        self.window = None
+
+
+class UserColorMap(WindowMixin, Setting, MenuAction):
+    value = {'#000000': 'white'}
     label = 'Customise colors on cards'
 
     def action(self):
         from aqt import mw as main_window
-        if not self.window:
-            # self.value is mutable, any modifications done by ColorMapWindow
-            # will be done on the value of this singleton class object
-            self.window = ColorMapWindow(
+        # self.value is mutable, any modifications done by ColorMapWindow
+        # will be done on the value of this singleton class object
+        self.show_window(
+            lambda: ColorMapWindow(
                 main_window,
                 self.value,
                 on_update=self.on_colors_changed
             )
-        self.window.show()
+        )
 
     def on_colors_changed(self):
         self.app.refresh()
 
+    def on_load(self):
+        # the editor does not allow these, but the configuration could have been edited by hand
+        duplicates = duplicate_colors(self.value)
+        if duplicates:
+            alert(
+                'Following colors are mapped more than once (in different spellings), '
+                'only the first mapping of each will be used: ' + ', '.join(duplicates)
+            )
+
 
 class InvertImage(Setting, MenuAction):
     """Toggles image inversion.
@@ -186,6 +211,7 @@ class EnableInDialogs(Setting, MenuAction):
 
     def action(self):
         self.value = not self.value
+        self.app.refresh()
 
 
 class StyleScrollBars(Setting, MenuAction):
@@ -198,19 +224,48 @@ class StyleScrollBars(Setting, MenuAction):
         self.app.refresh()
 
 
-class ModeSettings(Setting, MenuAction):
+class PaletteStylers(Setting):
+    """Names of stylers which style dialogs with Qt palette instead of style sheets.
+
+    Palettes are much faster to paint with (e.g. when scrolling
+    the browser's table), but cannot reproduce all the details
+    of the style sheets, like gradients on buttons.
+    """
+    value = set()
+
+
+class CardProfiles(Setting):
+    """Settings overridden for cards of chosen decks and note types.
+
+    Each profile is a dict like:
+        {
+            'decks': [1500000000000],       # deck ids, empty for all decks
+            'note_types': [1400000000000],  # note type ids, empty for all note types
+            'settings': {'invert_image': False, 'color_b': '#000000'}
+        }
+
+    A profile restricted by both, decks and note types, takes precedence
+    over these restricted by decks only, which take precedence over these
+    restricted by note types only; the last one wins among equally specific.
+    """
+    value = []
+
+    # only the settings used to style the cards can be overridden
+    overridable = {'invert_image', 'invert_latex', 'color_t', 'color_b', 'user_color_map'}
+
+
+class ModeSettings(WindowMixin, Setting, MenuAction):
     value = {
         'mode': 'manual',
         'start_at': '21:30',
         'end_at': '07:30'
     }
-    window = None
     label = 'Start automatically'
     checkable = True
 
     @property
     def is_checked(self):
-        return self.mode == 'auto'
+        return self.mode != 'manual'
 
     @property
     def mode(self):
@@ -219,22 +274,28 @@ class ModeSettings(Setting, MenuAction):
     def action(self):
         from aqt import mw as main_window
 
-        if not self.window:
-            # self.value is mutable, any modifications done by ColorMapWindow
-            # will be done on the value of this singleton class object
-            self.window = ModeWindow(
+        # self.value is mutable, any modifications done by ModeWindow
+        # will be done on the value of this singleton class object
+        self.show_window(
+            lambda: ModeWindow(
                 main_window,
                 self.value,
                 on_update=self.update
             )
-        self.window.show()
-        self.app.update_menu()
+        )
+        # the action was checked (or unchecked) by Qt on trigger, restore the actual state
+        self.notify()
 
     def update(self):
+        self.notify()
         self.app.refresh()
+        self.app.config.state_on.schedule_check()
 
     @property
     def is_active(self):
+        if self.mode == 'system':
+            return self.system_is_dark
+
         current_time = datetime.now().time()
         start = self.time('start_at')
         end = self.time('end_at')
@@ -243,9 +304,27 @@ class ModeSettings(Setting, MenuAction):
         else:
             return start <= current_time or current_time <= end
 
+    @property
+    def system_is_dark(self):
+        window_color = QApplication.palette().color(QPalette.Window)
+        return window_color.lightness() < 128
+
     def time(self, which):
         return datetime.strptime(self.value[which], '%H:%M').time()
 
+    def next_switch(self, now=None):
+        """The closest moment in future at which the scheduled night mode starts or ends."""
+        now = now or datetime.now()
+        moments = []
+
+        for which in ['start_at', 'end_at']:
+            moment = datetime.combine(now.date(), self.time(which))
+            if moment <= now:
+                moment += timedelta(days=1)
+            moments.append(moment)
+
+        return min(moments)
+
 
 class EnableNightMode(Setting, MenuAction):
     """Switch night mode"""
@@ -270,6 +349,7 @@ class EnableNightMode(Setting, MenuAction):
                 'or re-enable the Automatic Night Mode in the menu. '
             )
             self.mode_settings.value['mode'] = 'manual'
+            self.mode_settings.notify()
 
         success = self.app.refresh()
 
@@ -277,6 +357,7 @@ class EnableNightMode(Setting, MenuAction):
             self.value = not self.value
 
         self.app.config.state_on.update_state()
+        self.app.config.state_on.schedule_check()
 
 
 class StateSetting(Setting):
@@ -304,51 +385,71 @@ class StateSetting(Setting):
     def value(self, value):
         pass
 
+    # margin for the timer, so that the state is checked after the switch for sure
+    switch_delay = timedelta(seconds=1)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # check the state every 60 seconds
-        # (maybe a bit suboptimal, but the most reliable)
+        # in the automatic mode, check the state at the next scheduled switch
         from aqt import mw as main_window
         self.timer = QTimer(main_window)
-        self.timer.setInterval(60 * 100)  # 1000 milliseconds
+        self.timer.setSingleShot(True)
         self.timer.timeout.connect(self.maybe_enable_maybe_disable)
+        # in the "follow system" mode, check the state when the system theme changes
+        self.palette_watcher = PaletteChangeWatcher(main_window, self.on_palette_change)
 
     def on_load(self):
         if self.value:
             self.app.on()
 
         self.update_state()
-        self.timer.start()
+        self.schedule_check()
 
     def on_save(self):
         self.timer.stop()
 
+    def schedule_check(self):
+        self.timer.stop()
+
+        if self.mode_settings.mode != 'auto':
+            return
+
+        now = datetime.now()
+        delay = self.mode_settings.next_switch(now) - now + self.switch_delay
+        self.timer.start(int(delay.total_seconds() * 1000))
+
+    def on_palette_change(self):
+        if self.mode_settings.mode == 'system':
+            self.maybe_enable_maybe_disable()
+
     def maybe_enable_maybe_disable(self):
         if self.value != self.state:
             self.app.refresh()
             self.update_state()
+        self.schedule_check()
 
     def update_state(self):
         self.state = self.value
 
 
-class DisabledStylers(Setting, MenuAction):
+class DisabledStylers(WindowMixin, Setting, MenuAction):
 
     value = set()
-    window = None
     label = 'Choose what to style'
 
     def action(self):
         from aqt import mw as main_window
 
-        if not self.window:
-            self.window = StylersSelectorWindow(
+        self.show_window(
+            lambda: StylersSelectorWindow(
                 main_window,
                 self.value,
                 self.app.styles.stylers,
                 on_update=self.update
             )
-        self.window.show()
+        )
+        # the action was checked (or unchecked) by Qt on trigger, restore the actual state
+        self.notify()
 
     def update(self):
         self.app.refresh(reload=True)
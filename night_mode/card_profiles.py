@@ -0,0 +1,71 @@
+from collections import namedtuple
+
+from .config import ConfigValueGetter
+from .internals import style_tag
+from .stylers import ReviewerCards
+
+
+Profile = namedtuple('Profile', ['overrides', 'style'])
+
+
+def deck_of(card):
+    """Id of the deck which the card belongs to (the original deck for cards in filtered decks)."""
+    return card.odid or card.did
+
+
+class CardProfileTable:
+    """Profiles of cards (see CardProfiles), compiled into a lookup table keyed by (deck id, note type id).
+
+    The profiles are compiled once per configuration version; the table
+    is filled lazily, so that every pair is resolved only once.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.version = None
+        # (deck id or None, note type id or None) => Profile
+        self.rules = {}
+        # (deck id, note type id) => Profile or None
+        self.table = {}
+
+    def compile(self):
+        setting = self.app.config.card_profiles
+        rules = {}
+
+        for profile in setting.value:
+            overrides = {
+                name: value
+                for name, value in profile.get('settings', {}).items()
+                if name in setting.overridable
+            }
+            compiled = Profile(overrides, self.render(overrides))
+
+            for deck_id in profile.get('decks') or [None]:
+                for note_type_id in profile.get('note_types') or [None]:
+                    rules[deck_id, note_type_id] = compiled
+
+        self.rules = rules
+        self.table = {}
+        self.version = self.app.config.version
+
+    def render(self, overrides):
+        with ConfigValueGetter.overridden(overrides):
+            return style_tag(ReviewerCards.instance.profile_css)
+
+    def resolve(self, deck_id, note_type_id):
+        for key in [(deck_id, note_type_id), (deck_id, None), (None, note_type_id), (None, None)]:
+            if key in self.rules:
+                return self.rules[key]
+        return None
+
+    def get(self, deck_id, note_type_id):
+        """Returns: the Profile of cards of given deck and note type, or None"""
+        if self.version != self.app.config.version:
+            self.compile()
+
+        key = deck_id, note_type_id
+        try:
+            return self.table[key]
+        except KeyError:
+            profile = self.table[key] = self.resolve(deck_id, note_type_id)
+            return profile
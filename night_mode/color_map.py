@@ -1,125 +1,222 @@
-from PyQt5.QtCore import Qt, pyqtSlot as slot
+import csv
+import io
+import json
+
+from PyQt5.QtCore import Qt, pyqtSlot as slot, QAbstractTableModel, QModelIndex
 from PyQt5.QtGui import QColor
-from PyQt5.QtWidgets import QWidget, QLabel, QGridLayout, QPushButton, QColorDialog, QHBoxLayout, QVBoxLayout
+from PyQt5.QtWidgets import (
+    QLabel, QColorDialog, QHBoxLayout, QVBoxLayout, QTableView, QHeaderView,
+    QAbstractItemView, QApplication, QFileDialog
+)
 
+from .colors import parse_color, lightness, to_css
 from .internals import alert
-from .gui import create_button, remove_layout, AddonDialog
+from .gui import create_button, AddonDialog
 from .languages import _
 
 
-class ColorSwatch(QPushButton):
+def parse_mappings(text):
+    """Read color mappings from JSON (an object or a list of pairs) or CSV (two columns).
 
-    def __init__(self, parent, color=None, on_color_change=None, name='Color', verify_colors=False):
-        """
+    Returns:
+        list of (normal color, night color) pairs, in the original order
+    """
+    text = text.strip()
 
-        Args:
-            parent: a parent Qt instance
-            color: the color name or hexadecimal code (in form of a string)
-            on_color_change: a function or method taking old color and a new one
-            verify_colors: should the parent be asked if the color is acceptable?
-                to verify a color parent.is_acceptable(color) will be invoked
-        """
-        QPushButton.__init__(self, color, parent)
-        self.verify_colors = verify_colors
-        self.parent = parent
-        self.color = color
-        self.name = name
-        self.callback = on_color_change
-
-        if color:
-            self.set_color(color)
+    if text.startswith(('{', '[')):
+        data = json.loads(text)
+        if isinstance(data, dict):
+            pairs = data.items()
+        elif isinstance(data, list):
+            pairs = data
         else:
-            self.setText(_('(Not specified)'))
+            raise ValueError(_('Expected an object or a list of pairs, got: %s') % text)
+    else:
+        pairs = [row for row in csv.reader(io.StringIO(text)) if row]
+        # skip the header (as written by export_mappings)
+        if pairs and [cell.strip().lower() for cell in pairs[0]] == ['normal', 'night']:
+            pairs = pairs[1:]
 
-        self.clicked.connect(self.pick_color)
+    mappings = []
+    for pair in pairs:
+        if not isinstance(pair, (list, tuple)) or len(pair) != 2:
+            raise ValueError(_('Each mapping has to consist of exactly two colors, got: %s') % pair)
+        mappings.append(tuple(str(color).strip() for color in pair))
+    return mappings
 
-    def set_color(self, color):
-        self.color = color
-        self.setText(color)
-        self.setStyleSheet(f'background-color: {self.color}; color: {self.text_color}')
 
-    @property
-    def text_color(self):
-        return 'black' if self.qt_color.lightness() > 127 else 'white'
+def export_mappings(color_map, file_format='json'):
+    if file_format == 'json':
+        return json.dumps(color_map, indent=4)
 
-    @property
-    def qt_color(self):
-        return QColor(self.color)
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator='\n')
+    writer.writerow(['normal', 'night'])
+    writer.writerows(color_map.items())
+    return output.getvalue()
 
-    @slot()
-    def pick_color(self, qt_color=None):
-        if not qt_color:
-            qt_color = self.qt_color
 
-        old_color = self.color
-        qt_color = QColorDialog.getColor(
-            qt_color,
-            parent=self,
-            title=_('Select %s') % _(self.name)
-        )
+class ColorMapModel(QAbstractTableModel):
+    """Table of the color mappings, modifying the given color map in place.
 
-        if qt_color.isValid():
-            color = qt_color.name()
-            if self.verify_colors and not self.parent.is_acceptable(color):
-                alert(_('This color (%s) is already mapped. Please select a different one.') % color)
-                return self.pick_color(qt_color=qt_color)
+    Args:
+        color_map: the mapping (normal color => night color) to be edited
+        on_update: called once per each change (also when many mappings were changed at once)
+    """
 
-            self.set_color(color)
-            self.callback(old_color, self.color)
+    columns = ['Normal Mode Color', 'Night Mode Color']
 
+    def __init__(self, color_map, on_update=None, parent=None):
+        super().__init__(parent)
+        self.color_map = color_map
+        self.on_update = on_update
+        # normal colors, in order of rows
+        self.keys = list(color_map)
 
-class ColorMapping(QWidget):
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.keys)
 
-    def __init__(self, parent, normal_color, night_color):
-        """
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return _(self.columns[section])
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+
+    def color(self, index):
+        normal = self.keys[index.row()]
+        return normal if index.column() == 0 else self.color_map[normal]
 
-        Args:
-            parent: ColorMapWindow instance
-            normal_color: name or code of code to use in normal mode
-            night_color: name or code of code to use in night mode
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        color = self.color(index)
+
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return color
+
+        color_key = parse_color(color)
+        if color_key is None:
+            return None
+
+        if role == Qt.BackgroundRole:
+            return QColor(to_css(color_key))
+        if role == Qt.ForegroundRole:
+            return QColor('black' if lightness(color_key) > 127 else 'white')
+
+    def is_acceptable(self, color, ignored_row=None):
+        """Is the color not mapped yet (in any spelling)?"""
+        color_key = parse_color(color)
+        return all(
+            parse_color(normal) != color_key
+            for row, normal in enumerate(self.keys)
+            if row != ignored_row
+        )
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not index.isValid() or parse_color(value) is None:
+            return False
+
+        row = index.row()
+        normal = self.keys[row]
+
+        if index.column() == 0:
+            if not self.is_acceptable(value, ignored_row=row):
+                return False
+            night = self.color_map.pop(normal)
+            self.keys[row] = value
+            self.color_map[value] = night
+        else:
+            self.color_map[normal] = value
+
+        self.dataChanged.emit(index, index)
+        self.updated()
+        return True
+
+    def add(self, normal, night):
+        row = len(self.keys)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.keys.append(normal)
+        self.color_map[normal] = night
+        self.endInsertRows()
+        self.updated()
+
+    def remove(self, rows):
+        """Remove mappings from given rows, as a single update."""
+        if not rows:
+            return
+        self.beginResetModel()
+        for row in sorted(rows, reverse=True):
+            del self.color_map[self.keys.pop(row)]
+        self.endResetModel()
+        self.updated()
+
+    def merge(self, mappings):
+        """Add (or overwrite) many mappings at once, as a single update.
+
+        Mappings with invalid colors are skipped.
+
+        Returns:
+            list of the skipped mappings
         """
-        QWidget.__init__(self, parent)
-        self.parent = parent
-        self.normal = ColorSwatch(self, normal_color, self.update_normal, 'Normal Mode Color', verify_colors=True)
-        self.night = ColorSwatch(self, night_color, self.update_night, 'Night Mode Color')
-        self.grid = QGridLayout()
-        self.fill_layout()
-        self.setLayout(self.grid)
-
-    def fill_layout(self):
-        remove = create_button('Remove', self.remove)
-        grid = self.grid
-        grid.addWidget(self.normal, 0, 1, 1, 3)
-        arrow = QLabel('→')
-        arrow.setAlignment(Qt.AlignCenter)
-        grid.addWidget(arrow, 0, 4)
-        grid.addWidget(self.night, 0, 5, 1, 3)
-        grid.addWidget(remove, 0, 8)
+        skipped = []
+
+        self.beginResetModel()
+        for normal, night in mappings:
+            if parse_color(normal) is None or parse_color(night) is None:
+                skipped.append((normal, night))
+                continue
+            # replace the mapping for any spelling of the same color
+            for row, key in enumerate(self.keys):
+                if parse_color(key) == parse_color(normal):
+                    del self.color_map[key]
+                    self.keys[row] = normal
+                    break
+            else:
+                self.keys.append(normal)
+            self.color_map[normal] = night
+        self.endResetModel()
+
+        self.updated()
+        return skipped
+
+    def updated(self):
+        if self.on_update:
+            self.on_update()
 
-    @slot()
-    def remove(self):
-        self.parent.update(self.normal.color, None, None)
-        remove_layout(self.grid)
-        self.parent.mappings.removeWidget(self)
-        self.deleteLater()
 
-    def update_normal(self, old, new):
-        night = self.night.color
-        self.parent.update(old, new, night)
+class ColorTableView(QTableView):
+    """Edits colors with a color picker, opened on double click (or on the edit key)."""
 
-    def update_night(self, old, new):
-        normal = self.normal.color
-        self.parent.update(normal, normal, new)
+    def edit(self, index, trigger=QAbstractItemView.AllEditTriggers, event=None):
+        if index.isValid() and int(trigger & self.editTriggers()):
+            self.pick_color(index)
+        # nothing to be edited in place
+        return False
 
-    def is_acceptable(self, color):
-        return self.parent.is_acceptable(color)
+    def pick_color(self, index):
+        model = self.model()
+        color = QColorDialog.getColor(
+            QColor(model.data(index)),
+            parent=self,
+            title=_('Select %s') % _(model.columns[index.column()])
+        )
+
+        if color.isValid() and not model.setData(index, color.name()):
+            alert(_('This color (%s) is already mapped. Please select a different one.') % color.name())
 
 
 class ColorMapWindow(AddonDialog):
 
+    file_filters = 'JSON (*.json);;CSV (*.csv)'
+
     def __init__(self, parent, color_map, title='Customise colors swapping', on_update=None):
         super().__init__(self, parent, Qt.Window)
-        self.on_update = on_update
+        self.model = ColorMapModel(color_map, on_update, parent=self)
         self.color_map = color_map
 
         self.init_ui(title)
@@ -128,16 +225,23 @@ class ColorMapWindow(AddonDialog):
         self.setWindowTitle(_(title))
 
         btn_add_mapping = create_button('+ Add colors mapping', self.on_add)
+        btn_remove = create_button('Remove selected', self.on_remove)
+        btn_paste = create_button('Paste', self.on_paste)
+        btn_import = create_button('Import', self.on_import)
+        btn_export = create_button('Export', self.on_export)
         btn_close = create_button('Close', self.close)
 
         buttons = QHBoxLayout()
 
         buttons.addWidget(btn_close)
+        buttons.addWidget(btn_import)
+        buttons.addWidget(btn_export)
+        buttons.addWidget(btn_paste)
+        buttons.addWidget(btn_remove)
         buttons.addWidget(btn_add_mapping)
         buttons.setAlignment(Qt.AlignBottom)
 
         body = QVBoxLayout()
-        body.setAlignment(Qt.AlignTop)
 
         header = QLabel(_(
             'Specify how particular colors on your cards '
@@ -145,38 +249,84 @@ class ColorMapWindow(AddonDialog):
         ))
         header.setAlignment(Qt.AlignCenter)
 
-        mappings = QVBoxLayout()
-        mappings.setAlignment(Qt.AlignTop)
-
-        for normal_color, night_color in self.color_map.items():
-            mapping = ColorMapping(self, normal_color, night_color)
-            mappings.addWidget(mapping)
-
-        self.mappings = mappings
+        # only the visible rows are painted, no matter how many mappings there are
+        table = ColorTableView(self)
+        table.setModel(self.model)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table.setEditTriggers(QAbstractItemView.DoubleClicked | QAbstractItemView.EditKeyPressed)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        table.verticalHeader().hide()
+        self.table = table
 
         body.addWidget(header)
-        body.addLayout(mappings)
-        body.addStretch(1)
+        body.addWidget(table)
         body.addLayout(buttons)
         self.setLayout(body)
 
-        self.setGeometry(300, 300, 350, 300)
+        self.setGeometry(300, 300, 550, 400)
         self.show()
 
     @slot()
     def on_add(self):
-        mapping = ColorMapping(self, None, None)
-        self.mappings.addWidget(mapping)
-        mapping.normal.pick_color()
-        mapping.night.pick_color()
+        normal = QColorDialog.getColor(parent=self, title=_('Select %s') % _('Normal Mode Color'))
+        if not normal.isValid():
+            return
+        if not self.model.is_acceptable(normal.name()):
+            alert(_('This color (%s) is already mapped. Please select a different one.') % normal.name())
+            return
 
-    def is_acceptable(self, color):
-        return color not in self.color_map
+        night = QColorDialog.getColor(parent=self, title=_('Select %s') % _('Night Mode Color'))
+        if night.isValid():
+            self.model.add(normal.name(), night.name())
 
-    def update(self, old_key, new_key, new_value):
-        if old_key:
-            del self.color_map[old_key]
-        if new_key:
-            self.color_map[new_key] = new_value
-        if self.on_update:
-            self.on_update()
+    @slot()
+    def on_remove(self):
+        rows = {index.row() for index in self.table.selectionModel().selectedRows()}
+        self.model.remove(rows)
+
+    def merge(self, text):
+        try:
+            mappings = parse_mappings(text)
+        except ValueError as error:
+            alert(_('Could not read the color mappings: %s') % error)
+            return
+
+        skipped = self.model.merge(mappings)
+
+        if skipped:
+            alert(
+                _('Following mappings were skipped as these are not valid colors: %s')
+                % ', '.join(f'{normal} → {night}' for normal, night in skipped)
+            )
+
+    @slot()
+    def on_paste(self):
+        self.merge(QApplication.clipboard().text())
+
+    @slot()
+    def on_import(self):
+        path, chosen_filter = QFileDialog.getOpenFileName(self, _('Import color mappings'), '', self.file_filters)
+        if not path:
+            return
+        try:
+            with open(path, encoding='utf-8') as file:
+                text = file.read()
+        except (OSError, UnicodeDecodeError) as error:
+            alert(_('Could not read the color mappings: %s') % error)
+            return
+        self.merge(text)
+
+    @slot()
+    def on_export(self):
+        path, chosen_filter = QFileDialog.getSaveFileName(self, _('Export color mappings'), '', self.file_filters)
+        if not path:
+            return
+        file_format = 'csv' if path.lower().endswith('.csv') else 'json'
+        try:
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(export_mappings(self.color_map, file_format))
+        except OSError as error:
+            alert(_('Could not write the color mappings: %s') % error)
+
+    def is_acceptable(self, color):
+        return self.model.is_acceptable(color)
@@ -0,0 +1,328 @@
+"""
+Parsing and normalization of CSS colors.
+
+Colors are represented as packed integers (0xRRGGBBAA) so that different
+spellings of the same color (like "#FFF", "#ffffff" and "white") are equal
+and can be used as dictionary keys.
+"""
+import re
+from colorsys import hls_to_rgb, rgb_to_hls
+from functools import lru_cache
+from math import pi
+
+
+NAMED_COLORS = {
+    'aliceblue': 0xf0f8ff, 'antiquewhite': 0xfaebd7, 'aqua': 0x00ffff,
+    'aquamarine': 0x7fffd4, 'azure': 0xf0ffff, 'beige': 0xf5f5dc,
+    'bisque': 0xffe4c4, 'black': 0x000000, 'blanchedalmond': 0xffebcd,
+    'blue': 0x0000ff, 'blueviolet': 0x8a2be2, 'brown': 0xa52a2a,
+    'burlywood': 0xdeb887, 'cadetblue': 0x5f9ea0, 'chartreuse': 0x7fff00,
+    'chocolate': 0xd2691e, 'coral': 0xff7f50, 'cornflowerblue': 0x6495ed,
+    'cornsilk': 0xfff8dc, 'crimson': 0xdc143c, 'cyan': 0x00ffff,
+    'darkblue': 0x00008b, 'darkcyan': 0x008b8b, 'darkgoldenrod': 0xb8860b,
+    'darkgray': 0xa9a9a9, 'darkgreen': 0x006400, 'darkgrey': 0xa9a9a9,
+    'darkkhaki': 0xbdb76b, 'darkmagenta': 0x8b008b, 'darkolivegreen': 0x556b2f,
+    'darkorange': 0xff8c00, 'darkorchid': 0x9932cc, 'darkred': 0x8b0000,
+    'darksalmon': 0xe9967a, 'darkseagreen': 0x8fbc8f, 'darkslateblue': 0x483d8b,
+    'darkslategray': 0x2f4f4f, 'darkslategrey': 0x2f4f4f, 'darkturquoise': 0x00ced1,
+    'darkviolet': 0x9400d3, 'deeppink': 0xff1493, 'deepskyblue': 0x00bfff,
+    'dimgray': 0x696969, 'dimgrey': 0x696969, 'dodgerblue': 0x1e90ff,
+    'firebrick': 0xb22222, 'floralwhite': 0xfffaf0, 'forestgreen': 0x228b22,
+    'fuchsia': 0xff00ff, 'gainsboro': 0xdcdcdc, 'ghostwhite': 0xf8f8ff,
+    'gold': 0xffd700, 'goldenrod': 0xdaa520, 'gray': 0x808080,
+    'green': 0x008000, 'greenyellow': 0xadff2f, 'grey': 0x808080,
+    'honeydew': 0xf0fff0, 'hotpink': 0xff69b4, 'indianred': 0xcd5c5c,
+    'indigo': 0x4b0082, 'ivory': 0xfffff0, 'khaki': 0xf0e68c,
+    'lavender': 0xe6e6fa, 'lavenderblush': 0xfff0f5, 'lawngreen': 0x7cfc00,
+    'lemonchiffon': 0xfffacd, 'lightblue': 0xadd8e6, 'lightcoral': 0xf08080,
+    'lightcyan': 0xe0ffff, 'lightgoldenrodyellow': 0xfafad2, 'lightgray': 0xd3d3d3,
+    'lightgreen': 0x90ee90, 'lightgrey': 0xd3d3d3, 'lightpink': 0xffb6c1,
+    'lightsalmon': 0xffa07a, 'lightseagreen': 0x20b2aa, 'lightskyblue': 0x87cefa,
+    'lightslategray': 0x778899, 'lightslategrey': 0x778899, 'lightsteelblue': 0xb0c4de,
+    'lightyellow': 0xffffe0, 'lime': 0x00ff00, 'limegreen': 0x32cd32,
+    'linen': 0xfaf0e6, 'magenta': 0xff00ff, 'maroon': 0x800000,
+    'mediumaquamarine': 0x66cdaa, 'mediumblue': 0x0000cd, 'mediumorchid': 0xba55d3,
+    'mediumpurple': 0x9370db, 'mediumseagreen': 0x3cb371, 'mediumslateblue': 0x7b68ee,
+    'mediumspringgreen': 0x00fa9a, 'mediumturquoise': 0x48d1cc, 'mediumvioletred': 0xc71585,
+    'midnightblue': 0x191970, 'mintcream': 0xf5fffa, 'mistyrose': 0xffe4e1,
+    'moccasin': 0xffe4b5, 'navajowhite': 0xffdead, 'navy': 0x000080,
+    'oldlace': 0xfdf5e6, 'olive': 0x808000, 'olivedrab': 0x6b8e23,
+    'orange': 0xffa500, 'orangered': 0xff4500, 'orchid': 0xda70d6,
+    'palegoldenrod': 0xeee8aa, 'palegreen': 0x98fb98, 'paleturquoise': 0xafeeee,
+    'palevioletred': 0xdb7093, 'papayawhip': 0xffefd5, 'peachpuff': 0xffdab9,
+    'peru': 0xcd853f, 'pink': 0xffc0cb, 'plum': 0xdda0dd,
+    'powderblue': 0xb0e0e6, 'purple': 0x800080, 'rebeccapurple': 0x663399,
+    'red': 0xff0000, 'rosybrown': 0xbc8f8f, 'royalblue': 0x4169e1,
+    'saddlebrown': 0x8b4513, 'salmon': 0xfa8072, 'sandybrown': 0xf4a460,
+    'seagreen': 0x2e8b57, 'seashell': 0xfff5ee, 'sienna': 0xa0522d,
+    'silver': 0xc0c0c0, 'skyblue': 0x87ceeb, 'slateblue': 0x6a5acd,
+    'slategray': 0x708090, 'slategrey': 0x708090, 'snow': 0xfffafa,
+    'springgreen': 0x00ff7f, 'steelblue': 0x4682b4, 'tan': 0xd2b48c,
+    'teal': 0x008080, 'thistle': 0xd8bfd8, 'tomato': 0xff6347,
+    'turquoise': 0x40e0d0, 'violet': 0xee82ee, 'wheat': 0xf5deb3,
+    'white': 0xffffff, 'whitesmoke': 0xf5f5f5, 'yellow': 0xffff00,
+    'yellowgreen': 0x9acd32,
+}
+
+TRANSPARENT = 0x00000000
+
+# names of every opaque color, to be able to spell a color in all the ways
+# it may appear in an attribute of card's HTML
+COLOR_NAMES = {}
+
+for color_name, rgb in sorted(NAMED_COLORS.items()):
+    COLOR_NAMES.setdefault(rgb << 8 | 0xff, []).append(color_name)
+
+
+functional_notation = re.compile(r'^(rgba?|hsla?)\((.*)\)$')
+argument_separator = re.compile(r'\s*,\s*|\s*/\s*|\s+')
+
+angle_units = {
+    'deg': 1,
+    'grad': 360 / 400,
+    'rad': 180 / pi,
+    'turn': 360,
+}
+
+
+def pack(red, green, blue, alpha=255):
+    return red << 24 | green << 16 | blue << 8 | alpha
+
+
+def unpack(color):
+    """Return (red, green, blue, alpha) tuple of 0-255 integers."""
+    return color >> 24 & 0xff, color >> 16 & 0xff, color >> 8 & 0xff, color & 0xff
+
+
+def clamp(value, low=0, high=255):
+    return max(low, min(high, value))
+
+
+def parse_channel(value):
+    if value.endswith('%'):
+        return round(clamp(float(value[:-1]) * 2.55))
+    return round(clamp(float(value)))
+
+
+def parse_alpha(value):
+    if value.endswith('%'):
+        return round(clamp(float(value[:-1]) / 100, high=1) * 255)
+    return round(clamp(float(value), high=1) * 255)
+
+
+def parse_hue(value):
+    for unit, multiplier in angle_units.items():
+        if value.endswith(unit):
+            return float(value[:-len(unit)]) * multiplier % 360
+    return float(value) % 360
+
+
+def parse_percent(value):
+    if not value.endswith('%'):
+        raise ValueError(f'Expected percentage, got {value}')
+    return clamp(float(value[:-1]) / 100, high=1)
+
+
+def parse_hex(digits):
+    if len(digits) in (3, 4):
+        digits = ''.join(digit * 2 for digit in digits)
+    if len(digits) == 6:
+        digits += 'ff'
+    if len(digits) != 8:
+        raise ValueError(f'Wrong number of hexadecimal digits: {digits}')
+    return int(digits, 16)
+
+
+def parse_function(name, arguments):
+    arguments = argument_separator.split(arguments.strip())
+
+    if len(arguments) not in (3, 4):
+        raise ValueError(f'Wrong number of arguments of {name}()')
+
+    alpha = parse_alpha(arguments[3]) if len(arguments) == 4 else 255
+
+    if name.startswith('rgb'):
+        red, green, blue = map(parse_channel, arguments[:3])
+        return pack(red, green, blue, alpha)
+
+    hue = parse_hue(arguments[0])
+    saturation, lightness = map(parse_percent, arguments[1:3])
+    return from_hsl(hue, saturation, lightness, alpha)
+
+
+@lru_cache(maxsize=1024)
+def parse_color(value):
+    """Convert any CSS color to its packed-integer representation.
+
+    Args:
+        value: a color name, hexadecimal code, rgb(), rgba(), hsl() or hsla() expression
+
+    Returns:
+        an integer (0xRRGGBBAA) or None if the value is not a valid color
+    """
+    if not value:
+        return None
+
+    value = value.strip().lower()
+
+    try:
+        if value.startswith('#'):
+            return parse_hex(value[1:])
+
+        if value in NAMED_COLORS:
+            return NAMED_COLORS[value] << 8 | 0xff
+
+        if value == 'transparent':
+            return TRANSPARENT
+
+        match = functional_notation.match(value)
+        if match:
+            return parse_function(*match.groups())
+
+    except ValueError:
+        pass
+
+    return None
+
+
+def is_color(value):
+    return parse_color(value) is not None
+
+
+def to_hex(color):
+    red, green, blue, alpha = unpack(color)
+    code = f'#{red:02x}{green:02x}{blue:02x}'
+    if alpha != 255:
+        code += f'{alpha:02x}'
+    return code
+
+
+def to_css(color):
+    """The shortest, widely supported CSS representation of given color."""
+    red, green, blue, alpha = unpack(color)
+    if alpha == 255:
+        return to_hex(color)
+    return f'rgba({red},{green},{blue},{round(alpha / 255, 3)})'
+
+
+def to_hsl(color):
+    """Return (hue in degrees, saturation, lightness) with the latter two in 0-1 range."""
+    red, green, blue, alpha = unpack(color)
+    hue, lightness, saturation = rgb_to_hls(red / 255, green / 255, blue / 255)
+    return hue * 360, saturation, lightness
+
+
+def from_hsl(hue, saturation, lightness, alpha=255):
+    red, green, blue = hls_to_rgb(hue / 360, lightness, saturation)
+    return pack(round(red * 255), round(green * 255), round(blue * 255), alpha)
+
+
+def lightness(color):
+    """Lightness in 0-255 range, as returned by QColor.lightness()."""
+    red, green, blue, alpha = unpack(color)
+    return (max(red, green, blue) + min(red, green, blue)) // 2
+
+
+def relative_luminance(color):
+    """Relative luminance, as defined by WCAG 2.0"""
+
+    def linear(channel):
+        channel /= 255
+        if channel <= 0.03928:
+            return channel / 12.92
+        return ((channel + 0.055) / 1.055) ** 2.4
+
+    red, green, blue, alpha = unpack(color)
+    return 0.2126 * linear(red) + 0.7152 * linear(green) + 0.0722 * linear(blue)
+
+
+def contrast_ratio(first, second):
+    """Contrast ratio (between 1 and 21) of two colors, as defined by WCAG 2.0"""
+    lighter, darker = sorted(
+        [relative_luminance(first), relative_luminance(second)],
+        reverse=True
+    )
+    return (lighter + 0.05) / (darker + 0.05)
+
+
+def spellings(color):
+    """All the common ways in which given color can be written in an HTML attribute.
+
+    Attribute selectors compare values verbatim; use these
+    (with the case-insensitive "i" flag) to match all of them.
+    """
+    code = to_hex(color)
+    variants = [code]
+
+    red, green, blue, alpha = unpack(color)
+    if all(channel % 17 == 0 for channel in (red, green, blue, alpha)):
+        short = '#' + ''.join(f'{channel // 17:x}' for channel in (red, green, blue))
+        if alpha != 255:
+            short += f'{alpha // 17:x}'
+        variants.append(short)
+
+    variants.extend(COLOR_NAMES.get(color, []))
+    return variants
+
+
+def normalize_color_map(color_map):
+    """Convert a mapping of color strings into a mapping of packed colors.
+
+    Entries which cannot be parsed are skipped; of entries for the
+    same color (in different spellings) the first one is used.
+    """
+    normalized = {}
+
+    for old, new in color_map.items():
+        old_key = parse_color(old)
+        new_key = parse_color(new)
+
+        if old_key is None or new_key is None or old_key in normalized:
+            continue
+
+        normalized[old_key] = new_key
+
+    return normalized
+
+
+def duplicate_colors(color_map):
+    """Keys of the color map which are just another spelling of an earlier key (and are ignored)."""
+    seen = set()
+    duplicates = []
+
+    for old in color_map:
+        old_key = parse_color(old)
+
+        if old_key in seen:
+            duplicates.append(old)
+        elif old_key is not None:
+            seen.add(old_key)
+
+    return duplicates
+
+
+def night_variant(color, against, min_contrast=4.5):
+    """Derive a night mode equivalent of given color by inversion of its lightness.
+
+    The hue, saturation and transparency are preserved. If the inverted color
+    does not stand out enough from the color it will be displayed against
+    (e.g. text against the background), its lightness is moved further away.
+
+    Args:
+        color: packed color to be transformed
+        against: packed color which the result should contrast with
+        min_contrast: the contrast ratio floor (4.5 is the WCAG AA level for text)
+    """
+    hue, saturation, color_lightness = to_hsl(color)
+    alpha = color & 0xff
+
+    color_lightness = 1 - color_lightness
+    variant = from_hsl(hue, saturation, color_lightness, alpha)
+
+    step = 0.05 if relative_luminance(against) < 0.5 else -0.05
+
+    while contrast_ratio(variant, against) < min_contrast and 0 <= color_lightness + step <= 1:
+        color_lightness += step
+        variant = from_hsl(hue, saturation, color_lightness, alpha)
+
+    return variant
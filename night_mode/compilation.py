@@ -0,0 +1,68 @@
+"""
+Generation of the styling on a worker thread.
+
+Generating the stylesheets of all stylers may take a while (e.g. with
+a long user color map); doing so on the main thread would freeze the UI.
+The stylers are compiled from a frozen snapshot of the configuration
+and only the results are applied on the main thread, in one batch.
+"""
+import traceback
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, pyqtSignal as signal, pyqtSlot as slot
+
+
+Job = namedtuple('Job', ['version', 'stylers', 'snapshot', 'on_ready'])
+Result = namedtuple('Result', ['job', 'compiled', 'error'])
+
+
+class CompilationBridge(QObject):
+    """Compiles stylers on a worker thread, passing the results back to the main thread.
+
+    A result is discarded if the configuration changed (i.e. its version
+    was bumped) after the compilation was requested; a newer request is
+    then on its way.
+    """
+
+    compiled = signal(object)
+
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        # the bridge lives in the main thread, so results emitted by the worker are queued there
+        self.compiled.connect(self.on_compiled)
+
+    def is_stale(self, job):
+        return job.version != self.app.config.version
+
+    def submit(self, stylers, on_ready):
+        """Compile the stylers from the current configuration; on_ready(result) is called on the main thread.
+
+        The stylers should be prepared (see StylingManager.prepare) beforehand.
+        """
+        job = Job(self.app.config.version, stylers, self.app.config.snapshot(), on_ready)
+        self.executor.submit(self.run, job)
+        return job
+
+    def run(self, job):
+        # do not waste time on the requests which are already outdated
+        if self.is_stale(job):
+            return
+
+        try:
+            result = Result(job, self.app.styles.compile(job.stylers, job.snapshot), None)
+        except Exception:
+            result = Result(job, None, traceback.format_exc())
+
+        self.compiled.emit(result)
+
+        if not result.error:
+            self.app.styles.precompile_variants(job.stylers, job.snapshot, lambda: self.is_stale(job))
+
+    @slot(object)
+    def on_compiled(self, result):
+        if self.is_stale(result.job):
+            return
+        result.job.on_ready(result)
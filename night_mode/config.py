@@ -1,13 +1,43 @@
+import threading
+from contextlib import contextmanager
+from copy import deepcopy
+
 from aqt import mw
+from .events import color_settings
 from .internals import Setting
 
 
+# settings switched on and off from the menu, changing the generated styling
+switch_settings = {'invert_image', 'invert_latex', 'style_scroll_bars', 'enable_in_dialogs'}
+
+# all the settings which the generated styling depends on;
+# variants of the styling are cached by the values of these
+styling_settings = sorted(color_settings | switch_settings | {'palette_stylers'})
+
+# the settings which transformations of cards depend on; cached transformations are keyed by their values
+card_settings = sorted(set(styling_settings) | {'card_profiles'})
+
+
+def freeze(value):
+    """Hashable equivalent of a setting value (to be used as a part of cache keys)."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
 class Config:
 
     def __init__(self, app, prefix=''):
         self.app = app
         self.prefix = prefix
         self.settings = {}
+        # incremented on every change of settings,
+        # to be used as a part of keys in caches
+        self.version = 0
 
     # has to be separately from __init__ to avoid circular reference
     def init_settings(self):
@@ -18,6 +48,16 @@ class Config:
     def __getattr__(self, attr):
         return self.settings[attr]
 
+    def bump_version(self):
+        self.version += 1
+
+    def snapshot(self):
+        """Copy of the current values of all settings."""
+        return {
+            name: deepcopy(setting.value)
+            for name, setting in self.settings.items()
+        }
+
     def stored_name(self, name):
         return self.prefix + name
 
@@ -28,6 +68,8 @@ class Config:
 
             setting.value = value
 
+        self.bump_version()
+
         for setting in self.settings.values():
             setting.on_load()
 
@@ -46,9 +88,30 @@ class Config:
 
 class ConfigValueGetter:
 
+    # values overriding the settings in the current thread, see overridden()
+    local = threading.local()
+
     def __init__(self, config):
         self.config = config
 
     def __getattr__(self, attr):
+        overrides = getattr(self.local, 'overrides', None)
+        if overrides and attr in overrides:
+            return overrides[attr]
         setting = getattr(self.config, attr)
         return setting.value
+
+    def key(self, names=styling_settings):
+        """Hashable representation of the values of given settings."""
+        return tuple(freeze(getattr(self, name)) for name in names)
+
+    @classmethod
+    @contextmanager
+    def overridden(cls, values):
+        """Make all the getters return given values instead of these of the settings (in the current thread only)."""
+        previous = getattr(cls.local, 'overrides', None)
+        cls.local.overrides = {**(previous or {}), **values}
+        try:
+            yield
+        finally:
+            cls.local.overrides = previous
@@ -0,0 +1,159 @@
+"""
+Post-processing of the generated stylesheets before these are injected into web views.
+
+The sources of the stylesheets are indented triple-quoted strings; these
+are stripped of comments and whitespace, exact duplicates of declarations
+are removed, invalid declarations are dropped (and reported, so that
+the tests can catch these before release) and needlessly expensive
+selectors are replaced with cheaper equivalents (see selector_cost).
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from .colors import is_color
+from .css_parser import Declaration, comments, rules, split_selectors, serialize_rule
+from .selector_cost import optimize_selectors
+
+
+Minified = namedtuple('Minified', ['css', 'problems'])
+Problem = namedtuple('Problem', ['selectors', 'declaration', 'reason'])
+
+# quoted strings are preserved as they are, other runs of whitespace become a single space
+whitespace = re.compile(r'("[^"]*"|\'[^\']*\')|\s+')
+quoted_string = re.compile(r'"[^"]*"|\'[^\']*\'')
+property_name = re.compile(r'^(--[\w-]+|-?[a-z][a-z0-9-]*)$')
+
+color_properties = {
+    'color', 'background-color', 'border-color', 'outline-color',
+    'border-top-color', 'border-right-color', 'border-bottom-color', 'border-left-color'
+}
+color_keywords = {'inherit', 'initial', 'unset', 'currentcolor', 'none'}
+# functions which a literal color can be written with; values using other
+# functions (like var() or color-mix()) are resolved by the browser
+color_functions = {'rgb', 'rgba', 'hsl', 'hsla'}
+function_name = re.compile(r'([\w-]+)\s*\(')
+
+
+def collapse_whitespace(text):
+    return whitespace.sub(lambda match: match.group(1) or ' ', text).strip()
+
+
+def split_declarations(text):
+    """Split on semicolons, except for these inside of parentheses (e.g. in data URLs) or quoted strings."""
+    parts = []
+    depth = 0
+    start = 0
+    quote = None
+
+    for position, character in enumerate(text):
+        if quote:
+            if character == quote:
+                quote = None
+        elif character in '"\'':
+            quote = character
+        elif character == '(':
+            depth += 1
+        elif character == ')':
+            depth = max(depth - 1, 0)
+        elif character == ';' and not depth:
+            parts.append(text[start:position])
+            start = position + 1
+
+    parts.append(text[start:])
+    return parts
+
+
+def is_balanced(value):
+    # parentheses and semicolons in quoted strings do not count
+    value = quoted_string.sub('', value)
+    depth = 0
+    for character in value:
+        if character == '(':
+            depth += 1
+        elif character == ')':
+            depth -= 1
+            if depth < 0:
+                return False
+    return depth == 0 and '"' not in value and "'" not in value
+
+
+def is_literal(value):
+    return all(name.lower() in color_functions for name in function_name.findall(value))
+
+
+def check_declaration(declaration):
+    """Return the reason for which the declaration is invalid, or None if it looks fine."""
+    if not property_name.match(declaration.property):
+        return 'invalid property name'
+    if not declaration.value:
+        return 'empty value'
+    if not is_balanced(declaration.value):
+        return 'unbalanced parentheses or quotes'
+    if declaration.property in color_properties and is_literal(declaration.value):
+        value = declaration.value.lower()
+        if value not in color_keywords and not is_color(value):
+            return 'malformed color'
+    return None
+
+
+def minify_declarations(text, selectors, problems):
+    declarations = []
+
+    for part in split_declarations(text):
+        part = collapse_whitespace(part)
+        if not part:
+            continue
+        if ':' not in part:
+            problems.append(Problem(selectors, part, 'missing colon'))
+            continue
+
+        name, value = part.split(':', 1)
+        value = value.strip()
+        important = value.lower().endswith('!important')
+        if important:
+            value = value[:-len('!important')].rstrip()
+        declaration = Declaration(name.strip().lower(), value, important)
+
+        reason = check_declaration(declaration)
+        if reason:
+            problems.append(Problem(selectors, part, reason))
+            continue
+
+        # of exact duplicates only the last one matters
+        if declaration in declarations:
+            declarations.remove(declaration)
+        declarations.append(declaration)
+
+    return declarations
+
+
+def compress(css):
+    """Minify the stylesheet, collecting the problems found on the way.
+
+    Stylesheets with at-rules (like @media) only get their whitespace
+    and comments removed, as the rules inside of them are nested.
+    """
+    css = comments.sub('', css)
+    problems = []
+
+    if '@' in css:
+        return Minified(re.sub(r'\s*([{};])\s*', r'\1', collapse_whitespace(css)), problems)
+
+    minified = []
+
+    for match in rules.finditer(css):
+        selector_text, body = match.groups()
+        selectors = tuple(collapse_whitespace(selector) for selector in split_selectors(selector_text))
+        declarations = minify_declarations(body, selectors, problems)
+        if selectors and declarations:
+            selectors = optimize_selectors(selectors)
+            minified.append(serialize_rule(selectors, declarations))
+
+    return Minified(''.join(minified), problems)
+
+
+@lru_cache(maxsize=128)
+def minify(css):
+    # the generated stylesheets change only with the configuration, so the cache is hit on almost every call
+    return compress(css).css
@@ -0,0 +1,63 @@
+"""
+Minimal CSS tokenizer, sufficient for the stylesheets found on cards and generated by the add-on.
+
+It does not aim to validate CSS; at-rules with nested blocks (like @media) are
+flattened: the rules from inside of them are returned as if they were top-level.
+"""
+import re
+from collections import namedtuple
+
+
+comments = re.compile(r'/\*.*?\*/', re.DOTALL)
+rules = re.compile(r'([^{}]*)\{([^{}]*)\}')
+
+Declaration = namedtuple('Declaration', ['property', 'value', 'important'])
+Rule = namedtuple('Rule', ['selectors', 'declarations'])
+
+
+def strip_comments(css):
+    return comments.sub('', css)
+
+
+def split_selectors(selector_text):
+    return [
+        selector.strip()
+        for selector in selector_text.split(',')
+        if selector.strip()
+    ]
+
+
+def parse_declarations(text):
+    declarations = []
+    for declaration in text.split(';'):
+        if ':' not in declaration:
+            continue
+        name, value = declaration.split(':', 1)
+        value = value.strip()
+        important = value.lower().endswith('!important')
+        if important:
+            value = value[:-len('!important')].rstrip()
+        declarations.append(Declaration(name.strip().lower(), value, important))
+    return declarations
+
+
+def parse_rules(css):
+    """Yield Rule tuples of all rules found in the stylesheet."""
+    for match in rules.finditer(strip_comments(css)):
+        selector_text, body = match.groups()
+        # drop preceding statements, like: @import url(style.css);
+        selector_text = selector_text.rsplit(';', 1)[-1]
+        # skip blocks of at-rules, like @font-face or @page
+        if selector_text.strip().startswith('@'):
+            continue
+        selectors = split_selectors(selector_text)
+        if selectors:
+            yield Rule(selectors, parse_declarations(body))
+
+
+def serialize_rule(selectors, declarations):
+    body = ';'.join(
+        f'{declaration.property}:{declaration.value}' + ('!important' if declaration.important else '')
+        for declaration in declarations
+    )
+    return ','.join(selectors) + '{' + body + '}'
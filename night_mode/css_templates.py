@@ -0,0 +1,96 @@
+"""
+Minimal templates for CSS (and QSS) blocks.
+
+A template is a string with slots written as ${name} or ${dotted.name};
+the names are resolved as attributes of the object which the template is
+rendered for (e.g. ${config.color_t} or ${shared.colors}), unless given
+explicitly as keyword arguments of render().
+
+Templates are split into literal chunks and slots only once (on creation
+of the class defining them), so that rendering is a single ''.join() call.
+"""
+import re
+from operator import attrgetter
+
+
+slot = re.compile(r'\$\{\s*([A-Za-z_][\w.]*)\s*\}')
+
+
+class Template:
+
+    def __init__(self, source):
+        self.source = source
+        self.parts = None
+        self.names = None
+        self.getter = None
+
+    def compile(self):
+        if self.parts is None:
+            # after split: literal, slot name, literal, slot name, ..., literal
+            parts = slot.split(self.source)
+            self.names = parts[1::2]
+            # a single getter for all slots - returning tuple of values
+            self.getter = attrgetter(*self.names) if self.names else None
+            self.parts = parts
+        return self
+
+    @property
+    def dependencies(self):
+        """Names of all the slots of this template."""
+        self.compile()
+        return list(self.names)
+
+    @property
+    def config_keys(self):
+        """Names of config settings which the rendered text depends on directly."""
+        return {
+            name.split('.')[1]
+            for name in self.dependencies
+            if name.startswith('config.')
+        }
+
+    def values(self, obj, arguments):
+        if arguments:
+            return [
+                arguments[name] if name in arguments else attrgetter(name)(obj)
+                for name in self.names
+            ]
+        values = self.getter(obj)
+        return values if len(self.names) > 1 else [values]
+
+    def render(self, obj, **arguments):
+        self.compile()
+
+        if not self.names:
+            return self.source
+
+        parts = self.parts.copy()
+        parts[1::2] = self.values(obj, arguments)
+
+        try:
+            return ''.join(parts)
+        except TypeError:
+            # some of the values are not strings (e.g. numbers)
+            return ''.join(map(str, parts))
+
+
+class css_template(Template):
+    """Template rendered on each access to the attribute, as if it was a @css property."""
+
+    is_css = True
+
+    def __get__(self, obj, obj_type):
+        if obj is None:
+            return self
+        return self.render(obj)
+
+
+def compile_templates(attributes):
+    """Compile all templates from a class body, returning them by attribute name."""
+    templates = {}
+
+    for key, attr in attributes.items():
+        if isinstance(attr, Template):
+            templates[key] = attr.compile()
+
+    return templates
@@ -0,0 +1,122 @@
+"""
+Notifications about changes of night mode, for the add-on itself and for other add-ons.
+
+Example of use in another add-on:
+
+    from importlib import import_module
+
+    # the package name is the name of the directory of Night Mode add-on
+    night_mode = import_module(night_mode_package).night_mode
+
+    class Heatmap:
+
+        def __init__(self):
+            night_mode.events.subscribe('enabled', self.redraw)
+            night_mode.events.subscribe('disabled', self.redraw)
+
+        def redraw(self, event):
+            dark = event.snapshot['state_on']
+            ...
+
+Subscribers are held by weak references: the subscription ends
+when the subscribed function (or the object of the method) is deleted.
+Builtins (like list.append of some list) cannot be referenced weakly;
+these are held until unsubscribed.
+"""
+import traceback
+from collections import namedtuple
+from inspect import isbuiltin, ismethod
+from weakref import ref, WeakMethod
+
+
+Event = namedtuple('Event', ['name', 'snapshot', 'details'])
+
+color_settings = {'color_t', 'color_b', 'color_s', 'color_a', 'user_color_map'}
+
+
+def diff_snapshots(old, new):
+    """Create events describing the difference between two snapshots of the config.
+
+    Args:
+        old: the snapshot for which events were published the last time (None if never)
+        new: current snapshot
+    """
+    events = []
+    old = old or {}
+
+    if bool(new['state_on']) != bool(old.get('state_on')):
+        events.append(Event('enabled' if new['state_on'] else 'disabled', new, {}))
+
+    changed_colors = {
+        name
+        for name in color_settings
+        if name in old and old[name] != new[name]
+    }
+    if changed_colors:
+        events.append(Event('colors_changed', new, {'settings': changed_colors}))
+
+    if 'disabled_stylers' in old:
+        toggled = set(old['disabled_stylers']) ^ set(new['disabled_stylers'])
+        if toggled:
+            events.append(Event('styler_toggled', new, {'stylers': toggled}))
+
+    return events
+
+
+def reference_to(callback):
+    if ismethod(callback):
+        return WeakMethod(callback)
+    if isbuiltin(callback):
+        # bound builtins are created on each attribute access, a weak reference would die at once
+        return lambda: callback
+    return ref(callback)
+
+
+class EventBus:
+
+    names = {'enabled', 'disabled', 'colors_changed', 'styler_toggled'}
+
+    def __init__(self):
+        self.subscribers = {name: [] for name in self.names}
+        self.last_snapshot = None
+
+    def check_name(self, name):
+        if name not in self.names:
+            raise ValueError(f'Unknown event "{name}"; available events: {", ".join(sorted(self.names))}')
+
+    def subscribe(self, name, callback):
+        """Call the callback (with an Event) whenever the event of given name happens."""
+        self.check_name(name)
+        self.subscribers[name].append(reference_to(callback))
+
+    def unsubscribe(self, name, callback):
+        self.check_name(name)
+        self.subscribers[name] = [
+            reference
+            for reference in self.subscribers[name]
+            if reference() not in (None, callback)
+        ]
+
+    def publish(self, event):
+        references = self.subscribers[event.name]
+
+        for reference in list(references):
+            callback = reference()
+            if callback is None:
+                references.remove(reference)
+                continue
+            try:
+                callback(event)
+            except Exception:
+                # errors of other add-ons should not break the night mode
+                traceback.print_exc()
+
+    def publish_changes(self, snapshot):
+        """Publish events for all changes since the last publication (at most one event of each kind)."""
+        events = diff_snapshots(self.last_snapshot, snapshot)
+        self.last_snapshot = snapshot
+
+        for event in events:
+            self.publish(event)
+
+        return events
@@ -14,6 +14,33 @@ def inverted_icon(icon, width=32, height=32, as_image=False):
     return new_icon
 
 
+invert_filter = (
+    '<defs><filter id="night-mode-invert" color-interpolation-filters="sRGB">'
+    '<feColorMatrix type="matrix" values="-1 0 0 0 1 0 -1 0 0 1 0 0 -1 0 1 0 0 0 1 0"/>'
+    '</filter></defs>'
+)
+
+
+def inverted_svg(svg):
+    """SVG image with inverted colors, drawn through an SVG filter (once, when the image is decoded)."""
+    start = svg.index('>', svg.index('<svg')) + 1
+    end = svg.rindex('</svg>')
+    return (
+        svg[:start] + invert_filter + '<g filter="url(#night-mode-invert)">' +
+        svg[start:end] + '</g>' + svg[end:]
+    )
+
+
+def anki_web_image(name):
+    """Path to an image served by Anki to its web views (as /_anki/imgs/name), if it can be found."""
+    try:
+        from aqt.utils import aqt_data_folder
+    except ImportError:
+        return None
+    path = join(aqt_data_folder(), 'web', 'imgs', name)
+    return path if isfile(path) else None
+
+
 class Icons:
 
     paths = {}
@@ -52,6 +79,27 @@ class Icons:
 
         self.paths['arrow'] = arrow_path
 
+        # inverted once, rather than with a CSS filter on each row of the deck browser;
+        # the copy is served to the web views by Anki, from the exported folder of the add-on
+        self.paths['gears'] = None
+        gears_path = anki_web_image('gears.svg')
+        add_ons = getattr(mw, 'addonManager', None)
+
+        if gears_path and hasattr(add_ons, 'setWebExports'):
+            with open(gears_path, encoding='utf-8') as original:
+                svg = original.read()
+            if '<svg' in svg and '</svg>' in svg:
+                with open(join(icons_path, 'gears.svg'), 'w', encoding='utf-8') as inverted:
+                    inverted.write(inverted_svg(svg))
+                add_ons.setWebExports(__name__, r'user_files/icons/.*\.svg')
+                add_on = add_ons.addonFromModule(__name__)
+                self.paths['gears'] = f'/_addons/{add_on}/user_files/icons/gears.svg'
+
     @property
     def arrow(self):
         return self.paths['arrow']
+
+    @property
+    def gears(self):
+        """URL of inverted gears icon of the deck browser (None if Anki's icon could not be exported)."""
+        return self.paths['gears']
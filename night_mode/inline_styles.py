@@ -0,0 +1,60 @@
+import re
+
+from .colors import parse_color, normalize_color_map, to_css
+from .config import ConfigValueGetter
+from .css_parser import Declaration
+
+
+# a single pass over HTML: every style attribute is tokenized into
+# color declarations, which are then rewritten using night mode colors
+style_attribute = re.compile(r'((?<![\w-])style\s*=\s*)(["\'])(.*?)\2', re.IGNORECASE | re.DOTALL)
+color_declaration = re.compile(
+    r'(?<![\w-])(color|background-color|background|border-color)(\s*:\s*)([^;]+)',
+    re.IGNORECASE
+)
+
+
+class InlineStyles:
+    """Rewrites colors set in the style attributes of HTML elements.
+
+    Such colors cannot be targeted with stylesheets, but these are
+    frequently present in cards created from content copied from the web.
+    """
+
+    def __init__(self, app, palettes):
+        self.config = ConfigValueGetter(app.config)
+        self.palettes = palettes
+
+    def rewrite(self, html):
+        background = parse_color(self.config.color_b)
+        text = parse_color(self.config.color_t)
+
+        if background is None or text is None:
+            return html
+
+        color_map = normalize_color_map(self.config.user_color_map)
+
+        def rewrite_declaration(match):
+            name, separator, value = match.groups()
+            declaration = Declaration(name.lower(), value.strip(), False)
+
+            color = parse_color(declaration.value)
+            if declaration.property == 'color' and color in color_map:
+                return name + separator + to_css(color_map[color])
+
+            night_declaration = self.palettes.night_declaration(declaration, background, text)
+            if not night_declaration:
+                return match.group(0)
+
+            # shorthand with an image or position: override the color only
+            if declaration.property == 'background' and color is None:
+                return match.group(0) + ';background-color' + separator + night_declaration.value
+
+            return night_declaration.property + separator + night_declaration.value
+
+        def rewrite_attribute(match):
+            prefix, quote, style = match.groups()
+            style = color_declaration.sub(rewrite_declaration, style)
+            return prefix + quote + style + quote
+
+        return style_attribute.sub(rewrite_attribute, html)
@@ -1,6 +1,7 @@
 import re
 from PyQt5 import QtCore
 from abc import abstractmethod, ABCMeta
+from importlib import import_module
 from inspect import isclass
 from types import MethodType
 
@@ -8,6 +9,9 @@ from anki.hooks import wrap
 from anki.lang import _
 from aqt.utils import showWarning
 
+from .css_minifier import minify
+from .css_templates import compile_templates
+
 
 try:
     from_utf8 = QtCore.QString.fromUtf8
@@ -108,23 +112,38 @@ class MenuAction(SnakeNameMixin, metaclass=AbstractRegisteringType):
         return bool(self.value)
 
 
-def singleton_creator(old_creator):
-    def one_to_rule_them_all(cls, *args, **kwargs):
+class SingletonMixin:
+    """Makes classes singletons: the instance is created (and initialized) on the first call only."""
+
+    def __call__(cls, *args, **kwargs):
         if not cls.instance:
-            cls.instance = old_creator(cls)
+            cls.instance = super().__call__(*args, **kwargs)
         return cls.instance
-    return one_to_rule_them_all
 
 
-class SingletonMetaclass(AbstractRegisteringType):
+class TemplatesMixin:
+    """Compiles CSS templates defined in body of the class (and collects inherited ones)."""
+
+    def collect_templates(cls, attributes):
+        cls.templates = {
+            **getattr(cls, 'templates', {}),
+            **compile_templates(attributes)
+        }
+
+    def config_dependencies(cls):
+        """Names of config settings which templates of the class depend on."""
+        return set().union(*[template.config_keys for template in cls.templates.values()])
+
+
+class SingletonMetaclass(SingletonMixin, TemplatesMixin, AbstractRegisteringType):
 
     def __init__(cls, name, bases, attributes):
         super().__init__(name, bases, attributes)
 
         # singleton
         cls.instance = None
-        old_creator = cls.__new__
-        cls.__new__ = singleton_creator(old_creator)
+
+        cls.collect_templates(attributes)
 
 
 class RequiringMixin:
@@ -146,6 +165,7 @@ class RequiringMixin:
 class Setting(RequiringMixin, SnakeNameMixin, metaclass=SingletonMetaclass):
 
     def __init__(self, app):
+        self.listeners = []
         RequiringMixin.__init__(self, app)
         self.default_value = self.value
         self.app = app
@@ -155,6 +175,20 @@ class Setting(RequiringMixin, SnakeNameMixin, metaclass=SingletonMetaclass):
         """Default value of a setting"""
         pass
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name == 'value':
+            self.notify()
+
+    def subscribe(self, callback):
+        """Call the callback (with the setting) whenever the value changes."""
+        self.listeners.append(callback)
+
+    def notify(self):
+        """Inform the listeners about a change; to be called explicitly after in-place modifications of the value."""
+        for callback in self.__dict__.get('listeners', []):
+            callback(self)
+
     def on_load(self):
         """Callback called after loading of initial value"""
         pass
@@ -182,7 +216,7 @@ def decorate_or_call(operator):
 
 @decorate_or_call
 def style_tag(some_css):
-    return '<style>' + some_css + '</style>'
+    return '<style>' + minify(some_css) + '</style>'
 
 
 @decorate_or_call
@@ -190,13 +224,13 @@ def percent_escaped(text):
     return text.replace('%', '%%')
 
 
-class StylerMetaclass(AbstractRegisteringType):
+class StylerMetaclass(SingletonMixin, TemplatesMixin, AbstractRegisteringType):
     """
     Makes classes: singletons, work with:
         wraps,
         appends_in_night_mode,
         replaces_in_night_mode
-    decorators
+    decorators and compiles their CSS templates
     """
 
     def __init__(cls, name, bases, attributes):
@@ -204,19 +238,19 @@ class StylerMetaclass(AbstractRegisteringType):
 
         # singleton
         cls.instance = None
-        old_creator = cls.__new__
-        cls.__new__ = singleton_creator(old_creator)
+
+        cls.collect_templates(attributes)
 
         # additions and replacements
         cls.additions = {}
         cls.replacements = {}
+        # wrappers which are yet to be compiled, by name of the wrapped attribute
+        cls.wrappers = {}
 
         target = attributes.get('target', None)
 
-        def callback_maker(wrapper):
-            def raw_new(*args, **kwargs):
-                return wrapper(cls.instance, *args, **kwargs)
-            return raw_new
+        if isinstance(target, str):
+            target = cls.target = LazyTarget(target)
 
         for key, attr in attributes.items():
 
@@ -227,19 +261,7 @@ class StylerMetaclass(AbstractRegisteringType):
                 if not target:
                     raise Exception(f'Asked to wrap "{key}" but target of {name} not defined')
 
-                original = getattr(target, key)
-
-                if type(original) is MethodType:
-                    original = original.__func__
-
-                new = wrap(original, callback_maker(attr), attr.position)
-
-                # for classes, just add the new function, it will be bound later,
-                # but instances need some more work: we need to bind!
-                if not isclass(target):
-                    new = MethodType(new, target)
-
-                cls.replacements[key] = new
+                cls.wrappers[key] = attr
 
             if hasattr(attr, 'appends_in_night_mode'):
                 if not target:
@@ -254,6 +276,85 @@ class StylerMetaclass(AbstractRegisteringType):
             if hasattr(attr, 'is_css'):
                 pass
 
+        # stylers with lazy targets are compiled on their first activation
+        if not cls.is_lazy:
+            cls.compile_wrappers()
+
+    @property
+    def is_lazy(cls):
+        """Is the target of the styler still waiting to be resolved?"""
+        return isinstance(cls.target, LazyTarget)
+
+    def resolve_target(cls):
+        if cls.is_lazy:
+            cls.target = cls.target.resolve()
+            cls.compile_wrappers()
+
+    def compile_wrappers(cls):
+        target = cls.target
+
+        def callback_maker(wrapper):
+            def raw_new(*args, **kwargs):
+                return wrapper(cls.instance, *args, **kwargs)
+            return raw_new
+
+        def constructor_callback_maker(wrapper):
+            def raw_init(instance, *args, **kwargs):
+                cls.instance.register_instance(instance)
+                return wrapper(cls.instance, instance, *args, **kwargs)
+            return raw_init
+
+        for key, attr in cls.wrappers.items():
+
+            original = getattr(target, key)
+
+            if type(original) is MethodType:
+                original = original.__func__
+
+            if key == '__init__':
+                callback = constructor_callback_maker(attr)
+            else:
+                callback = callback_maker(attr)
+
+            new = wrap(original, callback, attr.position)
+
+            # for classes, just add the new function, it will be bound later,
+            # but instances need some more work: we need to bind!
+            if not isclass(target):
+                new = MethodType(new, target)
+
+            cls.replacements[key] = new
+
+
+class LazyTarget:
+    """Target of a styler, resolved when the styler is activated for the first time.
+
+    Args:
+        target: dotted path of the target (like 'aqt.browser.Browser')
+            or a callable returning the target
+    """
+
+    def __init__(self, target):
+        self.target = target
+
+    def resolve(self):
+        if callable(self.target):
+            return self.target()
+
+        parts = self.target.split('.')
+
+        # the longest importable prefix is the module, the rest are attributes
+        for i in range(len(parts), 0, -1):
+            try:
+                obj = import_module('.'.join(parts[:i]))
+            except ImportError:
+                continue
+            for attribute in parts[i:]:
+                obj = getattr(obj, attribute)
+            return obj
+
+        raise ImportError(f'Could not resolve target "{self.target}"')
+
 
 def wraps(method=None, position='after'):
     """Decorator for methods extending Anki QT methods.
@@ -9,7 +9,8 @@ from .languages import _
 def get_or_create_menu(attribute_name, label):
 
     if not hasattr(mw, attribute_name):
-        menu = QMenu(_(label), mw)
+        # parented to the menu bar, so the menu bar's style sheet applies
+        menu = QMenu(_(label), mw.form.menubar)
         setattr(mw, attribute_name, menu)
 
         mw.form.menubar.insertMenu(
@@ -24,6 +25,12 @@ def get_or_create_menu(attribute_name, label):
 
 
 class Menu:
+    """Menu of the add-on; the entries are created on the first opening of the menu.
+
+    Actions with shortcuts are the exception: these are created (and added
+    to the main window) right away, so that the shortcuts work from the start.
+    Checkable entries follow changes of their settings.
+    """
 
     actions = {
         # action name => action
@@ -34,34 +41,53 @@ class Menu:
     }
 
     def __init__(self, app, menu_name, layout, attach_to=None):
-        self.menu = QMenu(_(menu_name), mw)
+        self.menu = QMenu(_(menu_name), attach_to or mw)
 
         if attach_to:
             attach_to.addMenu(self.menu)
 
-        layout = [
+        self.layout = [
             entry(app) if hasattr(entry, 'action') else entry
             for entry in layout
         ]
 
         self.raw_actions = {
             entry.name: entry
-            for entry in layout
+            for entry in self.layout
             if hasattr(entry, 'action')
         }
 
         for action in self.raw_actions.values():
+            if action.shortcut:
+                mw.addAction(self.get_or_create_action(action.name))
+
+        self.is_built = False
+        self.menu.aboutToShow.connect(self.build)
+
+    def build(self):
+        if self.is_built:
+            return
+        self.setup_layout(self.layout)
+        self.is_built = True
 
+    def get_or_create_action(self, name):
+        if name not in self.actions:
+            action = self.raw_actions[name]
             self.create_action(
                 action.name,
-                _(action.label),
+                action.label,
                 action.action,
                 checkable=action.checkable,
                 shortcut=action.shortcut
             )
+            self.connect(self.actions[name], self.connections[self.actions[name]])
 
-        self.setup_layout(layout)
-        self.setup_connections()
+            if action.checkable:
+                self.set_checked(name, action.is_checked)
+                # only settings can be checkable
+                action.subscribe(self.on_setting_change)
+
+        return self.actions[name]
 
     def create_action(self, name, text, callback, checkable=False, shortcut=None):
         action = QAction(_(text), mw, checkable=checkable)
@@ -80,22 +106,16 @@ class Menu:
     def set_checked(self, name, value=True):
         self.actions[name].setChecked(value)
 
+    def on_setting_change(self, setting):
+        self.set_checked(setting.name, setting.is_checked)
+
     def setup_layout(self, layout):
         for entry in layout:
             if entry == '-':
                 self.menu.addSeparator()
             else:
-                action = self.actions[entry.name]
+                action = self.get_or_create_action(entry.name)
                 self.menu.addAction(action)
 
-    def setup_connections(self):
-        for menu_entry, connection in self.connections.items():
-            self.connect(menu_entry, connection)
-
     def connect(self, action, callback):
         action.triggered.connect(callback)
-
-    def update_checkboxes(self, settings):
-        for name, setting in settings.items():
-            if name in self.actions and self.raw_actions[name].checkable:
-                self.set_checked(name, setting.is_checked)
@@ -1,9 +1,29 @@
-from PyQt5.QtCore import Qt, pyqtSlot as slot, QTime
+from PyQt5.QtCore import Qt, pyqtSlot as slot, QTime, QObject, QEvent
 from PyQt5.QtWidgets import QWidget, QLabel, QGridLayout, QHBoxLayout, QVBoxLayout, QTimeEdit
 
 from .gui import create_button, AddonDialog, iterate_widgets
 
 
+class PaletteChangeWatcher(QObject):
+    """Calls back whenever the application palette changes (e.g. after a switch of the system theme).
+
+    The filter is installed on a single (top-level) widget rather than on the
+    application, so that it does not intercept events of all the other widgets.
+    """
+
+    events = {QEvent.ApplicationPaletteChange}
+
+    def __init__(self, watched, callback):
+        super().__init__(watched)
+        self.callback = callback
+        watched.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() in self.events:
+            self.callback()
+        return False
+
+
 class TimeEdit(QWidget):
 
     def __init__(self, parent, initial_time, label, on_update=lambda x: x):
@@ -68,7 +88,8 @@ class ModeWindow(AddonDialog):
             'the "ctrl+n" shortcut and menu checkbox for '
             'quick toggle will switch between the manual '
             'and automatic mode (when used for the first '
-            'time).'
+            'time). In the "Follow system" mode the night '
+            'mode is on whenever the system uses a dark theme.'
         )
         header.setWordWrap(True)
 
@@ -76,8 +97,10 @@ class ModeWindow(AddonDialog):
         mode_switches.addWidget(QLabel('Mode:'))
         self.manual = create_button('Manual', self.on_set_manual)
         self.auto = create_button('Automatic', self.on_set_automatic)
+        self.system = create_button('Follow system', self.on_set_system)
         mode_switches.addWidget(self.manual)
         mode_switches.addWidget(self.auto)
+        mode_switches.addWidget(self.system)
 
         time_controls = QHBoxLayout()
         time_controls.setAlignment(Qt.AlignTop)
@@ -120,11 +143,19 @@ class ModeWindow(AddonDialog):
     def on_set_automatic(self):
         self.set_mode('auto')
 
-    def switch_buttons(self, auto):
-        self.auto.setEnabled(not auto)
-        self.manual.setEnabled(auto)
-        self.auto.setChecked(auto)
-        self.manual.setChecked(not auto)
+    @slot()
+    def on_set_system(self):
+        self.set_mode('system')
+
+    def switch_buttons(self, mode):
+        buttons = {
+            'manual': self.manual,
+            'auto': self.auto,
+            'system': self.system
+        }
+        for button_mode, button in buttons.items():
+            button.setEnabled(button_mode != mode)
+            button.setChecked(button_mode == mode)
 
     def set_mode(self, mode, run_callback=True):
         auto = mode == 'auto'
@@ -132,6 +163,6 @@ class ModeWindow(AddonDialog):
         # time controls are needed only in the 'auto' mode
         for widget in iterate_widgets(self.time_controls):
             widget.setEnabled(auto)
-        self.switch_buttons(auto)
+        self.switch_buttons(mode)
         if run_callback:
             self.on_update()
@@ -36,6 +36,7 @@ Special thanks to translators:
 - Is (German)
 """
 import traceback
+from time import perf_counter
 
 from anki.hooks import addHook
 from aqt import appVersion
@@ -44,12 +45,21 @@ from aqt import mw
 from PyQt5.QtWidgets import QMessageBox
 
 from .actions_and_settings import *
-from .internals import alert
-from .config import Config, ConfigValueGetter
+from .cache import LRUCache
+from .card_profiles import CardProfileTable, deck_of
+from .compilation import CompilationBridge
+from .internals import alert, style_tag
+from .config import Config, ConfigValueGetter, card_settings, switch_settings
 from .css_class import inject_css_class
+from .events import EventBus
 from .icons import Icons
+from .inline_styles import InlineStyles
 from .menu import get_or_create_menu, Menu
-from .stylers import Styler
+from .note_types import NoteTypePalettes
+from .prefetch import CardPrefetcher, TransformedCard
+from .qt_palette import config_palette
+from .web_views import WebViewRegistry
+from .stylers import Styler, EditorWebViewStyler
 from .styles import Style, MessageBoxStyle
 
 __addon_name__ = 'Night Mode'
@@ -72,25 +82,108 @@ if not appVersion.startswith(__anki_version__):
 
 class StylingManager:
     def __init__(self, app):
+        self.app = app
         self.styles = Style.members
         self.stylers = [
             styler(app)
             for styler in Styler.members
         ]
         self.config = ConfigValueGetter(app.config)
+        # (styler, values of the styling settings) => compiled attributes
+        self.variants = LRUCache(max_size=512)
+        # has to be done before any replacement, so that the instances
+        # are tracked also when the original attributes are restored
+        self.track_instances()
 
     @property
     def active_stylers(self):
         return [
             styler
             for styler in self.stylers
-            if styler.name not in self.config.disabled_stylers
+            if self.is_active(styler.name)
         ]
 
+    def is_active(self, styler_name):
+        return styler_name not in self.config.disabled_stylers
+
+    def track_instances(self):
+        for styler in self.stylers:
+            styler.track_instances()
+
+    def restyle_live_instances(self, night_mode):
+        """Update styling of already open windows.
+
+        All the windows are restored first, then styled in the order in which
+        styling would be applied when creating the windows (e.g. editors first).
+        """
+        stylers = [styler for styler in self.stylers if styler.instances]
+
+        for styler in stylers:
+            styler.unstyle_instances()
+
+        if night_mode:
+            active_stylers = [styler for styler in stylers if self.is_active(styler.name)]
+            for styler in sorted(active_stylers, key=lambda styler: styler.restyle_priority):
+                styler.style_instances()
+
+    def register(self, styler_class):
+        """Start using a styler defined after the add-on was loaded (e.g. by another add-on)."""
+        styler = styler_class(self.app)
+
+        if styler not in self.stylers:
+            self.stylers.append(styler)
+            styler.track_instances()
+
+        return styler
+
+    def unregister(self, styler_class):
+        styler = styler_class.instance
+
+        if styler in self.stylers:
+            styler.restore_attributes()
+            styler.untrack_instances()
+            styler.unstyle_instances()
+            self.stylers.remove(styler)
+
+        Styler.members.discard(styler_class)
+
     def replace(self):
         for styler in self.active_stylers:
             styler.replace_attributes()
 
+    def prepare(self):
+        """Resolve targets of the active stylers; has to be done on the main thread, before compile()."""
+        stylers = self.active_stylers
+        for styler in stylers:
+            styler.compile()
+        return stylers
+
+    def compile(self, stylers, snapshot):
+        """Generate attributes of the stylers from given snapshot of the configuration (thread-safe).
+
+        Already generated variants are reused, e.g. after switching some setting on and back off.
+        """
+        with ConfigValueGetter.overridden(snapshot):
+            key = self.config.key()
+            return {
+                styler: self.variants.get_or_compute((styler, key), styler.compile_attributes)
+                for styler in stylers
+            }
+
+    def precompile_variants(self, stylers, snapshot, is_stale):
+        """Generate the variants which differ from the snapshot by a single switch from the menu.
+
+        This way flipping a checkbox only selects an already generated styling.
+        """
+        for name in sorted(switch_settings):
+            if is_stale():
+                return
+            self.compile(stylers, {**snapshot, name: not snapshot[name]})
+
+    def apply(self, compiled):
+        for styler, attributes in compiled.items():
+            styler.apply_attributes(attributes)
+
     def restore(self):
         for styler in self.stylers:
             styler.restore_attributes()
@@ -118,12 +211,41 @@ class NightMode:
         About
     ]
 
+    # roles of web views which are updated in place rather than re-rendered on refresh
+    live_web_view_roles = {'editor', 'browser', 'card_layout', 'stats', 'other'}
+
+    # stylers which all have to be active for the web views of given role to be dark
+    first_paint_stylers = {
+        'main': {'anki_web_view_styler', 'deck_browser_styler', 'overview_styler', 'reviewer_cards'},
+        'toolbar': {'toolbar_styler'},
+        'bottom': {'deck_browser_bottom_styler', 'overview_bottom_styler', 'reviewer_styler'},
+        'editor': {'editor_web_view_styler'},
+        'browser': {'browser_styler'},
+        'stats': {'stats_report_styler'},
+    }
+    dialog_web_view_roles = {'editor', 'browser', 'stats'}
+
     def __init__(self):
         self.profile_loaded = False
         self.config = Config(self, prefix='nm_')
         self.config.init_settings()
         self.icons = Icons(mw)
         self.styles = StylingManager(self)
+        self.compilation = CompilationBridge(self)
+        # notifications for other add-ons (and for the add-on itself)
+        self.events = EventBus()
+        self.note_types = NoteTypePalettes(self)
+        self.inline_styles = InlineStyles(self, self.note_types)
+        self.card_profiles = CardProfileTable(self)
+        # (card id, card modification time, values of the card settings, context) => TransformedCard
+        self.transformed_cards = LRUCache(max_size=256)
+        self.prefetcher = CardPrefetcher(self)
+
+        self.web_views = WebViewRegistry()
+        self.web_views.track()
+        # these were created before the add-on was loaded
+        for web in [mw.web, mw.toolbar.web, mw.bottomWeb]:
+            self.web_views.register(web)
 
         view_menu = get_or_create_menu('addon_view_menu', '&View')
         self.menu = Menu(
@@ -134,9 +256,12 @@ class NightMode:
         )
 
         addHook('unloadProfile', self.save)
+        addHook('unloadProfile', self.prefetcher.stop)
         addHook('profileLoaded', self.load)
 
+        addHook('prepareQA', self.card_transformation)
         addHook('prepareQA', self.night_class_injection)
+        addHook('showQuestion', self.prefetcher.schedule)
 
         addHook('loadNote', self.background_bug_workaround)
 
@@ -149,10 +274,34 @@ class NightMode:
         self.profile_loaded = True
 
         self.refresh()
-        self.update_menu()
 
-    def update_menu(self):
-        self.menu.update_checkboxes(self.config.settings)
+    def register_styler(self, styler_class):
+        """Register a styler at runtime; to be used by other add-ons.
+
+        Targets of stylers can be given lazily (as a dotted path or as a
+        LazyTarget with a callable), so that nothing is imported or wrapped
+        until the night mode is turned on with the styler active:
+
+            class HeatmapStyler(Styler):
+                target = 'heatmap.Heatmap'
+
+                @wraps
+                def init(self, heatmap):
+                    ...
+
+            night_mode.register_styler(HeatmapStyler)
+        """
+        styler = self.styles.register(styler_class)
+
+        if self.profile_loaded and self.config.state_on.value and self.styles.is_active(styler.name):
+            styler.replace_attributes()
+            styler.style_instances()
+
+        return styler
+
+    def unregister_styler(self, styler_class):
+        """Restore everything that the styler changed and stop using it."""
+        self.styles.unregister(styler_class)
 
     def save(self):
         self.config.save()
@@ -169,22 +318,47 @@ class NightMode:
         """
         Refresh display by re-enabling night or normal mode,
         regenerate customizable css strings.
+
+        The css strings are generated on a worker thread; the current
+        styling stays in effect until these are ready to be applied.
         """
         state = self.config.state_on.value
+        self.config.bump_version()
 
         if not self.profile_loaded:
             alert(ERROR_NO_PROFILE)
             return
 
+        if state:
+            self.compilation.submit(
+                self.styles.prepare(),
+                lambda result: self.switch(state, reload, result)
+            )
+        else:
+            self.switch(state, reload)
+
+        return True
+
+    def switch(self, state, reload, result=None):
+        """Apply the (compiled) styling and update everything on the screen, on the main thread."""
+        if result and result.error:
+            alert(ERROR_SWITCH % result.error)
+            self.revert_switch(state)
+            return
+
         try:
             if state:
+                self.web_views.set_first_paint(self.config.color_b.value, self.first_paint_roles)
                 if reload:
                     self.off()
-                self.on()
+                self.styles.apply(result.compiled)
             else:
+                self.web_views.set_first_paint()
                 self.off()
+            self.styles.restyle_live_instances(state)
         except Exception:
             alert(ERROR_SWITCH % traceback.format_exc())
+            self.revert_switch(state)
             return
 
         # Reload current screen.
@@ -198,8 +372,32 @@ class NightMode:
 
         # Redraw toolbar (should be always visible).
         mw.toolbar.draw()
-        self.update_menu()
-        return True
+
+        # Update other web views (editors, previews, etc.) without re-rendering
+        self.web_views.push(night_class=state, roles=self.live_web_view_roles)
+
+        # editors get their style sheet on the next note load, unless these are not to be styled anymore
+        if not (state and self.styles.is_active('editor_web_view_styler')):
+            self.web_views.push(css='', roles={'editor'}, style_id=EditorWebViewStyler.style_id)
+
+        self.events.publish_changes(self.config.snapshot())
+
+    def revert_switch(self, state):
+        """Go back to the previous state after a failed (manual) switch; the menu follows the setting."""
+        enable_night_mode = self.config.enable_night_mode
+        if self.config.mode_settings.mode == 'manual' and enable_night_mode.value == state:
+            enable_night_mode.value = not state
+            self.config.state_on.update_state()
+
+    @property
+    def first_paint_roles(self):
+        """Roles of the web views which the active stylers make dark."""
+        return {
+            role
+            for role, stylers in self.first_paint_stylers.items()
+            if all(self.styles.is_active(styler) for styler in stylers)
+            and (self.config.enable_in_dialogs.value or role not in self.dialog_web_view_roles)
+        }
 
     def about(self):
         about_box = self.message_box()
@@ -213,9 +411,67 @@ class NightMode:
         box = QMessageBox()
         if self.config.state_on.value:
             box_style = MessageBoxStyle(self)
-            box.setStyleSheet(box_style.style)
+            if 'message_box' in self.config.palette_stylers.value:
+                box.setPalette(config_palette(ConfigValueGetter(self.config)))
+            else:
+                box.setStyleSheet(box_style.style)
         return box
 
+    @property
+    def transforms_cards(self):
+        return self.config.state_on.value and self.styles.is_active('reviewer_cards')
+
+    def card_key(self, card, context):
+        return card.id, card.mod, ConfigValueGetter(self.config).key(card_settings), context
+
+    def transform_card(self, html, model, deck_id=None):
+        """Apply night mode transformations to the HTML of a card.
+
+        Colors in style attributes of card's elements are replaced, and overrides
+        of colors hard-coded in the CSS of card's note type are appended (the CSS
+        is placed before the HTML, so appending ensures that these take precedence).
+
+        Cards with a profile are transformed using the settings of the profile
+        and get the stylesheet of the profile appended as well.
+        """
+        profile = self.card_profiles.get(deck_id, model['id'])
+
+        if profile:
+            with ConfigValueGetter.overridden(profile.overrides):
+                return self.recolor_card(html, model) + profile.style
+
+        return self.recolor_card(html, model)
+
+    def recolor_card(self, html, model):
+        html = self.inline_styles.rewrite(html)
+        css = self.note_types.stylesheet(model)
+        if css:
+            html += style_tag(css)
+        return html
+
+    def card_transformation(self, html, card, context):
+        """Transform the card, reusing memoized or prefetched results if available."""
+        if not self.transforms_cards:
+            return html
+
+        key = self.card_key(card, context)
+        cached = self.transformed_cards.get(key)
+
+        # the card's HTML could have been modified by other add-ons
+        if cached and cached.html == html:
+            self.prefetcher.record(cached, memoized=True)
+            if cached.prefetched:
+                self.transformed_cards.set(key, cached._replace(prefetched=False))
+            return cached.transformed
+
+        start = perf_counter()
+        transformed = self.transform_card(html, card.model(), deck_of(card))
+        cached = TransformedCard(html, transformed, perf_counter() - start, False)
+
+        self.prefetcher.record(cached)
+        self.transformed_cards.set(key, cached)
+        return transformed
+
     def night_class_injection(self, html, card, context):
         html = inject_css_class(self.config.state_on.value, html)
         return html
@@ -282,9 +538,10 @@ class NightMode:
                     return get_rid_of_background
                 }
 
-                var field = $('.field')
+                // called on each load of a note: remove the handlers bound previously
+                var field = $('.field').off('.nightModeBackground')
 
-                field.on('keydown', function(e){
+                field.on('keydown.nightModeBackground', function(e){
                     var raw_field = this
                     var get_rid_of_background = background_workaround_callback(raw_field)
 
@@ -293,7 +550,7 @@ class NightMode:
                     }
                 })
 
-                field.on('paste', function(){
+                field.on('paste.nightModeBackground', function(){
                     var raw_field = this
                     var get_rid_of_background = background_workaround_callback(raw_field)
 
@@ -303,7 +560,7 @@ class NightMode:
             })()
             """
         else:
-            javascript = ''
+            javascript = "$('.field').off('.nightModeBackground')"
 
         editor.web.eval(javascript)
 
@@ -0,0 +1,131 @@
+import re
+
+from .colors import parse_color, night_variant, to_css, to_hsl
+from .config import ConfigValueGetter
+from .css_parser import parse_rules, serialize_rule, Declaration
+
+
+color_token = re.compile(r'#[0-9a-fA-F]{3,8}\b|(?:rgba?|hsla?)\([^)]*\)|\b[a-zA-Z]+\b')
+url = re.compile(r'url\([^)]*\)', re.IGNORECASE)
+# classes of the body in night mode: set by the add-on and by Anki 2.1.20+
+night_class = re.compile(r'\.night_?mode\b', re.IGNORECASE)
+
+
+def find_color(value):
+    """Find the first color in a (possibly shorthand) CSS value.
+
+    Gradients are not supported (None is returned).
+    """
+    if 'gradient(' in value:
+        return None
+    for token in color_token.findall(url.sub('', value)):
+        color = parse_color(token)
+        if color is not None:
+            return color
+    return None
+
+
+class NoteTypePalettes:
+    """Derives night mode equivalents of colors hard-coded in CSS of note types.
+
+    The resulting stylesheets are cached per note type (model) id and
+    invalidated when either the note type or the configuration changes.
+    """
+
+    text_properties = {
+        'color', 'fill', 'stroke', 'text-decoration-color', 'caret-color',
+    }
+    background_properties = {
+        'background', 'background-color',
+    }
+    border_properties = {
+        'border-color', 'border-top-color', 'border-right-color',
+        'border-bottom-color', 'border-left-color', 'outline-color',
+    }
+
+    # WCAG 2.0: 4.5 for the text, 3 for graphical objects
+    text_contrast = 4.5
+    border_contrast = 3
+
+    # Colors very close to the default black text or white background
+    # are replaced with the text and background colors chosen by the user
+    extreme_lightness = 0.1
+
+    def __init__(self, app):
+        self.app = app
+        self.config = ConfigValueGetter(app.config)
+        # model id => ((modification time, colors), stylesheet)
+        self.cache = {}
+
+    def stylesheet(self, model):
+        # the colors can be overridden for some of the cards (see CardProfiles)
+        stamp = (model['mod'], self.config.color_b, self.config.color_t)
+        cached = self.cache.get(model['id'])
+
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+        css = self.derive(model['css'])
+        self.cache[model['id']] = (stamp, css)
+        return css
+
+    def derive(self, css):
+        """Generate a stylesheet overriding all colors declared in given stylesheet.
+
+        Rules written for the night mode (i.e. for the night mode class
+        of the body) are left as they are. Nothing is overridden if the
+        configured colors are not valid.
+        """
+        background = parse_color(self.config.color_b)
+        text = parse_color(self.config.color_t)
+
+        if background is None or text is None:
+            return ''
+
+        overrides = []
+
+        for rule in parse_rules(css):
+            selectors = [selector for selector in rule.selectors if not night_class.search(selector)]
+            if not selectors:
+                continue
+            declarations = []
+            for declaration in rule.declarations:
+                night_declaration = self.night_declaration(declaration, background, text)
+                if night_declaration:
+                    declarations.append(night_declaration)
+            if declarations:
+                overrides.append(serialize_rule(selectors, declarations))
+
+        return ''.join(overrides)
+
+    def night_declaration(self, declaration, background, text):
+        name = declaration.property
+
+        if name in self.text_properties or name in self.border_properties:
+            color = parse_color(declaration.value)
+        elif name in self.background_properties:
+            color = find_color(declaration.value)
+            name = 'background-color'
+        else:
+            return None
+
+        # leave transparent colors as they are
+        if color is None or not color & 0xff:
+            return None
+
+        lightness = to_hsl(color)[2]
+
+        if name in self.text_properties:
+            if lightness < self.extreme_lightness:
+                night_color = text
+            else:
+                night_color = night_variant(color, background, self.text_contrast)
+        elif name in self.border_properties:
+            night_color = night_variant(color, background, self.border_contrast)
+        else:
+            if lightness > 1 - self.extreme_lightness:
+                night_color = background
+            else:
+                night_color = night_variant(color, text, self.text_contrast)
+
+        return Declaration(name, to_css(night_color), True)
@@ -0,0 +1,171 @@
+import re
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, product, zip_longest
+from time import perf_counter
+
+from PyQt5.QtCore import QTimer
+from aqt import mw
+from aqt.utils import mungeQA
+
+from .card_profiles import deck_of
+
+
+TransformedCard = namedtuple('TransformedCard', ['html', 'transformed', 'cost', 'prefetched'])
+
+
+class PrefetchStatistics:
+
+    def __init__(self):
+        # cards served from the prefetched results
+        self.hits = 0
+        # cards which had to be transformed when being shown
+        self.misses = 0
+        # cards served from the results memoized when these were shown before (e.g. after an undo);
+        # these are not counted in the hit rate, as the prefetching did not help with them
+        self.memoized = 0
+        self.saved_seconds = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0
+
+    def __str__(self):
+        return (
+            f'{self.hits} hits, {self.misses} misses ({self.hit_rate:.0%} hit rate), '
+            f'{self.memoized} memoized, saved {self.saved_seconds * 1000:.1f} ms'
+        )
+
+
+class CardPrefetcher:
+    """Transforms HTML of the upcoming cards while the user looks at the current one.
+
+    Cards are rendered on the main thread (the collection is not thread-safe),
+    but only once the current question has been displayed, one side of a card
+    at a time, so that the events are processed in between; the night mode
+    transformations are then run on a worker thread.
+    """
+
+    contexts = ['reviewQuestion', 'reviewAnswer']
+
+    # attributes of the reviewer which the type answer filter reads or modifies
+    type_answer_state = ['card', 'typeCorrect', 'typeFont', 'typeSize']
+
+    def __init__(self, app, depth=3):
+        self.app = app
+        self.depth = depth
+        # created on demand, shut down when the profile is closed
+        self.executor = None
+        self.statistics = PrefetchStatistics()
+        # (card id, context) pairs to be prefetched; None until the upcoming cards are found
+        self.pending = deque()
+        self.timer = QTimer(mw)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.prefetch_next)
+
+    def schedule(self):
+        # let the current card be displayed first
+        self.pending = None
+        self.timer.start(0)
+
+    def stop(self):
+        """Drop the pending cards and wait for the worker to finish; called when the profile is closed."""
+        self.timer.stop()
+        self.pending = deque()
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def upcoming_card_ids(self):
+        """Guess which cards will be shown next by peeking into the scheduler's queues."""
+        scheduler = mw.col.sched
+
+        learning = [card_id for due, card_id in getattr(scheduler, '_lrnQueue', [])[:self.depth]]
+        # review and new queues are consumed from the end
+        review = getattr(scheduler, '_revQueue', [])[-self.depth:][::-1]
+        new = getattr(scheduler, '_newQueue', [])[-self.depth:][::-1]
+
+        current_id = mw.reviewer.card.id if mw.reviewer.card else None
+
+        upcoming = []
+        for card_id in chain.from_iterable(zip_longest(learning, review, new)):
+            if card_id and card_id != current_id and card_id not in upcoming:
+                upcoming.append(card_id)
+
+        return upcoming[:self.depth]
+
+    def prefetch_next(self):
+        if not mw.col or not self.app.transforms_cards:
+            self.pending = deque()
+            return
+
+        if self.pending is None:
+            self.pending = deque(product(self.upcoming_card_ids(), self.contexts))
+
+        if self.pending:
+            self.prefetch(*self.pending.popleft())
+
+        if self.pending:
+            self.timer.start(0)
+
+    def prefetch(self, card_id, context):
+        card = mw.col.getCard(card_id)
+        key = self.app.card_key(card, context)
+
+        if key in self.app.transformed_cards:
+            return
+
+        html = self.render(card, context)
+        if html is None:
+            return
+
+        if not self.executor:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        self.executor.submit(self.transform, key, html, card.model(), deck_of(card))
+
+    def render(self, card, context):
+        """HTML of the card as passed by the reviewer to the prepareQA hook (see Reviewer._mungeQA).
+
+        Returns None for the answers with a type answer field, as these
+        depend on what the user will type in.
+        """
+        reviewer = mw.reviewer
+        is_question = context == 'reviewQuestion'
+        html = mungeQA(mw.col, card.q() if is_question else card.a())
+
+        if not re.search(reviewer.typeAnsPat, html):
+            return html
+
+        if not is_question:
+            return None
+
+        # the filter works on the current card of the reviewer
+        state = {name: getattr(reviewer, name, None) for name in self.type_answer_state}
+        reviewer.card = card
+        try:
+            return reviewer.typeAnsQuestionFilter(html)
+        finally:
+            for name, value in state.items():
+                setattr(reviewer, name, value)
+
+    def transform(self, key, html, model, deck_id):
+        start = perf_counter()
+        transformed = self.app.transform_card(html, model, deck_id)
+        cost = perf_counter() - start
+        self.app.transformed_cards.set(key, TransformedCard(html, transformed, cost, True))
+
+    def record(self, transformed_card, memoized=False):
+        """Count the card being shown in the statistics.
+
+        Args:
+            transformed_card: the TransformedCard served to the reviewer
+            memoized: was it served from the results of the transformations done previously?
+        """
+        if transformed_card.prefetched:
+            self.statistics.hits += 1
+            self.statistics.saved_seconds += transformed_card.cost
+        elif memoized:
+            self.statistics.memoized += 1
+        else:
+            self.statistics.misses += 1
@@ -0,0 +1,214 @@
+"""
+Helpers for applying Qt style sheets (QSS) to as few widgets as possible.
+
+Each change of a widget's style sheet makes Qt re-resolve (repolish)
+styles of this widget and all of its descendants. Applying rules to the
+narrowest widget which they concern (e.g. the menu bar rather than the
+main window) avoids repolishing of unrelated widgets (e.g. web views).
+"""
+import re
+from contextlib import contextmanager
+from weakref import WeakKeyDictionary
+
+from PyQt5.QtCore import QEvent, QObject, Qt
+from PyQt5.QtGui import QPalette
+from PyQt5.QtWidgets import QWidget
+
+from .css_parser import rules, strip_comments, split_selectors
+
+
+selector_root = re.compile(r'^([A-Za-z_]\w*)')
+
+
+def selector_type(selector):
+    """Name of the widget class which the selector starts with (if any)."""
+    match = selector_root.match(selector)
+    return match.group(1) if match else None
+
+
+def scope_style_sheet(style_sheet, scopes, default):
+    """Split the style sheet into parts applicable to the narrowest widgets.
+
+    A rule is assigned to a scope widget only if all of its selectors
+    start with a type mapped to this widget; otherwise it goes to default.
+
+    Args:
+        style_sheet: Qt style sheet to split
+        scopes: mapping of widget class names (as used in selectors) to the widgets
+        default: the widget to apply not-scoped rules to
+
+    Returns:
+        dict: widget => style sheet, preserving the order of rules
+    """
+    scoped = {}
+
+    for match in rules.finditer(strip_comments(style_sheet)):
+        selector_text, body = match.groups()
+        widgets = {
+            scopes.get(selector_type(selector), default)
+            for selector in split_selectors(selector_text)
+        }
+        widget = widgets.pop() if len(widgets) == 1 else default
+        scoped[widget] = scoped.get(widget, '') + selector_text.strip() + '{' + body.strip() + '}'
+
+    return scoped
+
+
+class StyleSheetApplicator:
+    """Sets style sheets of widgets, skipping the updates which would not change anything.
+
+    Every call of setStyleSheet() triggers parsing of the style sheet and
+    repolishing of the widget with all its descendants, even if the new
+    style sheet is identical to the one already applied.
+    """
+
+    # the original style sheet is stored as a dynamic property of the widget, so it lives
+    # exactly as long as the widget (Python wrappers of widgets may be recreated)
+    original_property = 'night_mode_original_style_sheet'
+    palette_property = 'night_mode_palette'
+
+    def __init__(self):
+        # widget => hash of the last style sheet applied by this applicator
+        self.fingerprints = WeakKeyDictionary()
+        self.applied = 0
+        self.avoided = 0
+
+    def original_style_sheet(self, widget):
+        original = widget.property(self.original_property)
+        return widget.styleSheet() if original is None else original
+
+    def apply(self, widget, style_sheet):
+        if widget.property(self.original_property) is None:
+            widget.setProperty(self.original_property, widget.styleSheet())
+
+        fingerprint = hash(style_sheet)
+
+        # the widget's style sheet could have been changed by someone else in the meantime
+        if self.fingerprints.get(widget) == fingerprint and widget.styleSheet() == style_sheet:
+            self.avoided += 1
+            return False
+
+        widget.setStyleSheet(style_sheet)
+        self.fingerprints[widget] = fingerprint
+        self.applied += 1
+        return True
+
+    def apply_palette(self, widget, palette):
+        widget.setPalette(palette)
+        widget.setProperty(self.palette_property, True)
+
+    def restore(self, window):
+        """Restore the original style sheets and palettes of the window and all its descendants."""
+        for widget in [window] + window.findChildren(QWidget):
+            original = widget.property(self.original_property)
+            if original is not None:
+                self.apply(widget, original)
+                widget.setProperty(self.original_property, None)
+            if widget.property(self.palette_property):
+                # palette with nothing set (resolved), i.e. inheriting from the parent
+                widget.setPalette(QPalette())
+                widget.setProperty(self.palette_property, None)
+
+    @contextmanager
+    def batch(self, *widgets):
+        """Suspend painting of given widgets while style sheets of these (or their children) are being changed."""
+        updates_enabled = [widget.updatesEnabled() for widget in widgets]
+
+        for widget in widgets:
+            widget.setUpdatesEnabled(False)
+        try:
+            yield self
+        finally:
+            for widget, enabled in zip(widgets, updates_enabled):
+                widget.setUpdatesEnabled(enabled)
+
+
+style_sheets = StyleSheetApplicator()
+
+
+class PolishWatcher(QObject):
+    """Passes the children of a widget to the callback as these get polished (i.e. before being shown first time)."""
+
+    def __init__(self, widget, callback):
+        super().__init__(widget)
+        self.widget = widget
+        self.callback = callback
+        self.watching = False
+
+    def watch(self, enabled):
+        if enabled and not self.watching:
+            self.widget.installEventFilter(self)
+        elif not enabled and self.watching:
+            self.widget.removeEventFilter(self)
+        self.watching = enabled
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.ChildPolished:
+            self.callback(event.child())
+        return False
+
+
+class ScopedStyleSetter:
+    """Distributes rules of a style sheet among the narrowest matching widgets.
+
+    Original style sheets of the widgets are preserved; the rules are
+    appended to these. Setting an empty style sheet restores the originals.
+
+    Args:
+        default: the widget to apply not-scoped rules to
+        scopes: mapping of widget class names to the widgets (see scope_style_sheet())
+        popups: mapping of widget class names to windows; top-level children of the window
+            of this class (like context menus, which do not inherit the style sheet of
+            the scope widget) get the same rules as the scope widget of the class,
+            including the children created later on
+    """
+
+    def __init__(self, default, scopes, popups=None):
+        self.default = default
+        self.scopes = scopes
+        self.popups = popups or {}
+        self.originals = {}
+        # widget class name => style sheet for the popups of this class
+        self.popup_styles = {}
+        # widget class name => PolishWatcher
+        self.watchers = {}
+
+    @property
+    def css(self):
+        # the original style sheets are kept separately for each of the widgets
+        return ''
+
+    @css.setter
+    def css(self, value):
+        scoped = scope_style_sheet(value, self.scopes, self.default)
+
+        for widget in set(self.originals) | set(scoped):
+            if widget not in self.originals:
+                self.originals[widget] = widget.styleSheet()
+            style_sheets.apply(widget, self.originals[widget] + scoped.get(widget, ''))
+
+        for class_name, window in self.popups.items():
+            self.style_popups(class_name, window, scoped.get(self.scopes.get(class_name, self.default), ''))
+
+    def style_popups(self, class_name, window, style):
+        self.popup_styles[class_name] = style
+
+        if class_name not in self.watchers:
+            self.watchers[class_name] = PolishWatcher(
+                window,
+                lambda child: self.style_popup(class_name, child)
+            )
+        self.watchers[class_name].watch(bool(style))
+
+        for child in window.findChildren(QWidget, options=Qt.FindDirectChildrenOnly):
+            self.style_popup(class_name, child)
+
+    def style_popup(self, class_name, widget):
+        if not (widget.isWindow() and widget.inherits(class_name)):
+            return
+
+        style = self.popup_styles.get(class_name)
+        if style:
+            style_sheets.apply(widget, style_sheets.original_style_sheet(widget) + style)
+        else:
+            style_sheets.restore(widget)
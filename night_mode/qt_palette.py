@@ -0,0 +1,54 @@
+from functools import lru_cache
+
+from PyQt5.QtGui import QColor, QPalette
+
+
+@lru_cache(maxsize=8)
+def night_palette(text_color, background_color, auxiliary_color, active_color):
+    """Create dark QPalette from the colors used by the style sheets.
+
+    Painting with palette is much faster than with the style sheets,
+    as the style sheet style disables many of Qt's fast paint paths.
+    """
+    text = QColor(text_color)
+    background = QColor(background_color)
+    auxiliary = QColor(auxiliary_color)
+    active = QColor(active_color)
+    disabled_text = text.darker(180)
+
+    palette = QPalette()
+
+    roles = {
+        QPalette.Window: background,
+        QPalette.WindowText: text,
+        QPalette.Base: background,
+        QPalette.AlternateBase: auxiliary,
+        QPalette.Text: text,
+        QPalette.BrightText: text,
+        QPalette.Button: auxiliary,
+        QPalette.ButtonText: text,
+        QPalette.Highlight: active,
+        QPalette.HighlightedText: text,
+        QPalette.ToolTipBase: auxiliary,
+        QPalette.ToolTipText: text,
+        QPalette.Link: QColor('#0099CC'),
+        # used for bevels, frames and grid lines
+        QPalette.Light: auxiliary.lighter(130),
+        QPalette.Midlight: auxiliary.lighter(115),
+        QPalette.Mid: auxiliary,
+        QPalette.Dark: background.darker(130),
+        QPalette.Shadow: background.darker(200),
+    }
+
+    for role, color in roles.items():
+        palette.setColor(role, color)
+
+    for role in [QPalette.WindowText, QPalette.Text, QPalette.ButtonText]:
+        palette.setColor(QPalette.Disabled, role, disabled_text)
+
+    return palette
+
+
+def config_palette(config):
+    """Night palette for given ConfigValueGetter"""
+    return night_palette(config.color_t, config.color_b, config.color_s, config.color_a)
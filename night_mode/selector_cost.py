@@ -0,0 +1,214 @@
+"""
+Estimates how costly the selectors of the injected stylesheets are for the style engine.
+
+Browser engines match selectors right to left: the rightmost (key) compound
+selector is tested against every element of the page; only if it matches,
+the rest of the selector is checked, walking up the tree for descendant
+combinators. The key selectors which cannot be bucketed by id, class or
+tag (universal, attribute-only) and long ancestor walks are the costly ones.
+
+Only the rewrites which do not change what is matched are applied during
+minification (see optimize_selector()); the rest is reported (together with
+suggestions, see cheaper_alternative()), so that the tests can catch new
+expensive selectors.
+"""
+import re
+from collections import namedtuple
+
+from .css_parser import parse_rules
+
+
+Cost = namedtuple('Cost', ['selector', 'score', 'reasons'])
+
+universal_cost = 10
+attribute_cost = 2
+# the style attribute is compared as a serialized string
+style_attribute_cost = 4
+descendant_cost = 1
+
+# selectors scoring more than that are reported as expensive
+expensive_threshold = 5
+
+# declarations for which a universal rule could often be replaced by a rule for body;
+# color is inherited and a background set on body shows through transparent elements.
+# It is not equivalent: elements with their own colors (links, form controls) would keep
+# these, so it is only suggested in the report.
+body_equivalent_properties = {'color', 'background-color', 'background'}
+
+type_or_class = re.compile(r'^(?:[A-Za-z][\w-]*|[.#][\w-]+)')
+redundant_universal = re.compile(r'(^|[\s>+~])\*(?=[.#\[:])')
+style_tags = re.compile(r'<style>(.*?)</style>', re.DOTALL)
+qt_type = re.compile(r'(?:^|[\s>+~,])Q[A-Z]\w*')
+
+
+def split_compounds(selector):
+    """Split the selector into compound selectors and the combinators between them.
+
+    Returns:
+        list of compound selectors, list of combinators (' ', '>', '+' or '~')
+    """
+    compounds = ['']
+    combinators = []
+    depth = 0
+    quote = None
+    pending = None
+
+    for character in selector.strip():
+        if quote:
+            compounds[-1] += character
+            if character == quote:
+                quote = None
+            continue
+        if character in '"\'':
+            quote = character
+        elif character in '[(':
+            depth += 1
+        elif character in '])':
+            depth -= 1
+        elif not depth and (character.isspace() or character in '>+~'):
+            if character in '>+~' or pending is None:
+                pending = character if character in '>+~' else ' '
+            continue
+
+        if pending:
+            combinators.append(pending)
+            compounds.append('')
+            pending = None
+        compounds[-1] += character
+
+    return compounds, combinators
+
+
+def selector_cost(selector):
+    compounds, combinators = split_compounds(selector)
+    score = 0
+    reasons = []
+
+    key = compounds[-1]
+    # rules for pseudo-elements alone (like ::-webkit-scrollbar) are resolved only for these
+    if not (type_or_class.match(key.lstrip('*')) or key.startswith('::')) or key == '*':
+        score += universal_cost
+        reasons.append('universal key selector')
+
+    for compound in compounds:
+        for attribute in re.findall(r'\[\s*([\w-]+)', compound):
+            if attribute == 'style':
+                score += style_attribute_cost
+                reasons.append('style attribute selector')
+            else:
+                score += attribute_cost
+                reasons.append('attribute selector')
+
+    walks = sum(combinator in ' ~' for combinator in combinators)
+    if walks:
+        score += walks * descendant_cost
+        reasons.append(f'descendant depth {walks}')
+
+    return Cost(selector, score, reasons)
+
+
+def optimize_selector(selector):
+    """Rewrite the selector to an equivalent but cheaper one, if possible."""
+    # *.class, *[attribute], *:hover and so on: the universal part does not narrow anything
+    return redundant_universal.sub(r'\1', selector)
+
+
+def optimize_selectors(selectors):
+    optimized = []
+    for selector in selectors:
+        selector = optimize_selector(selector)
+        if selector not in optimized:
+            optimized.append(selector)
+    return optimized
+
+
+def is_qt_style_sheet(css):
+    return any(
+        qt_type.search(selector)
+        for rule in parse_rules(css)
+        for selector in rule.selectors
+    )
+
+
+def web_stylesheets(styler):
+    """Stylesheets which the styler injects into web views, by attribute name.
+
+    Qt style sheets and fragments without any rules are skipped.
+    """
+    stylesheets = {}
+
+    for key, addition in styler.additions.items():
+        html = addition.value(styler)
+        if isinstance(html, str) and style_tags.search(html):
+            stylesheets[key] = ''.join(style_tags.findall(html))
+
+    for cls in reversed(type(styler).__mro__):
+        for key, attribute in vars(cls).items():
+            if getattr(attribute, 'is_css', False):
+                css = getattr(styler, key)
+                if isinstance(css, str) and '{' in css and not is_qt_style_sheet(css):
+                    stylesheets[key] = css
+
+    return stylesheets
+
+
+def cheaper_alternative(selector, properties):
+    """Suggest a cheaper selector, which is not equivalent, but might be good enough.
+
+    Args:
+        selector: the selector (after optimization)
+        properties: names of the properties declared in the rule of the selector
+    """
+    if selector == '*' and properties and set(properties) <= body_equivalent_properties:
+        return 'body'
+
+
+def stylesheet_costs(css):
+    """Costs of the selectors of the stylesheet, as these would be injected (i.e. after optimization)."""
+    costs = []
+
+    for rule in parse_rules(css):
+        properties = [declaration.property for declaration in rule.declarations]
+
+        for selector in optimize_selectors(rule.selectors):
+            cost = selector_cost(selector)
+            alternative = cheaper_alternative(selector, properties)
+            if alternative:
+                cost.reasons.append(f'consider {alternative} (if elements with own colors can keep these)')
+            costs.append(cost)
+
+    return costs
+
+
+def expensive_selectors(stylers, threshold=expensive_threshold):
+    """Returns: dict (styler name, attribute name) => list of costs of the expensive selectors"""
+    found = {}
+    for styler in stylers:
+        for key, css in web_stylesheets(styler).items():
+            costs = [cost for cost in stylesheet_costs(css) if cost.score > threshold]
+            if costs:
+                found[styler.name, key] = costs
+    return found
+
+
+def report(stylers, threshold=expensive_threshold):
+    lines = []
+
+    for styler in sorted(stylers, key=lambda styler: styler.name):
+        stylesheets = web_stylesheets(styler)
+        if not stylesheets:
+            continue
+
+        lines.append(styler.name)
+
+        for key, css in stylesheets.items():
+            costs = stylesheet_costs(css)
+            important = len(re.findall(r'!\s*important', css))
+            total = sum(cost.score for cost in costs)
+            lines.append(f'    {key}: {len(costs)} selectors, total cost {total}, {important} !important')
+
+            for cost in sorted(costs, key=lambda cost: -cost.score):
+                if cost.score > threshold:
+                    lines.append(f'        {cost.score:>3} {cost.selector} ({", ".join(cost.reasons)})')
+
+    return '\n'.join(lines)
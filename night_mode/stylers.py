@@ -1,8 +1,13 @@
+from collections import namedtuple
+from inspect import isclass
+from weakref import WeakSet
+
 from PyQt5.QtCore import Qt
 
 import aqt
+from anki.hooks import wrap
 from anki.stats import CollectionStats
-from aqt import mw, editor, QPixmap
+from aqt import mw, QPixmap
 from aqt.addcards import AddCards
 from aqt.browser import Browser
 from aqt.clayout import CardLayout
@@ -12,13 +17,22 @@ from aqt.progress import ProgressManager
 from aqt.stats import DeckStats
 from .gui import AddonDialog, iterate_widgets
 
+from .cache import LRUCache
 from .config import ConfigValueGetter
+from .css_minifier import minify
 from .css_class import inject_css_class
+from .css_templates import css_template
 from .internals import percent_escaped, move_args_to_kwargs, from_utf8, PropertyDescriptor
 from .internals import style_tag, wraps, appends_in_night_mode, replaces_in_night_mode, css
 from .styles import SharedStyles, ButtonsStyle, ImageStyle, DeckStyle, LatexStyle, DialogStyle
 from .internals import SnakeNameMixin, StylerMetaclass, abstract_property
 from .internals import RequiringMixin
+from .qss import ScopedStyleSetter, style_sheets
+from .qt_palette import config_palette
+
+
+# values of additions and replacements of a styler, by attribute name
+CompiledAttributes = namedtuple('CompiledAttributes', ['additions', 'replacements'])
 
 
 class Styler(RequiringMixin, SnakeNameMixin, metaclass=StylerMetaclass):
@@ -28,6 +42,8 @@ class Styler(RequiringMixin, SnakeNameMixin, metaclass=StylerMetaclass):
         self.app = app
         self.config = ConfigValueGetter(app.config)
         self.original_attributes = {}
+        # live instances of the target class (e.g. open windows)
+        self.instances = WeakSet()
 
     @abstract_property
     def target(self):
@@ -37,6 +53,67 @@ class Styler(RequiringMixin, SnakeNameMixin, metaclass=StylerMetaclass):
     def is_active(self):
         return self.name not in self.config.disabled_stylers
 
+    @property
+    def uses_palette(self):
+        """Should the dialogs be styled with Qt palette rather than with style sheets?"""
+        return self.name in self.config.palette_stylers
+
+    def set_palette(self, widget):
+        style_sheets.apply_palette(widget, config_palette(self.config))
+
+    @property
+    def tracks_instances(self):
+        return '__init__' in self.replacements and isclass(self.target)
+
+    def track_instances(self):
+        """Record instances of the target class created from now on, regardless of the night mode state.
+
+        Whenever the night mode is on, the instances are also
+        recorded by the wrapped constructor (see StylerMetaclass).
+        """
+        if self.tracks_instances and 'untracked_init' not in self.__dict__:
+            self.untracked_init = self.target.__init__
+            self.target.__init__ = wrap(self.untracked_init, self.register_instance)
+
+    def untrack_instances(self):
+        """Remove the constructor wrapper added by track_instances()."""
+        if 'untracked_init' in self.__dict__:
+            self.target.__init__ = self.__dict__.pop('untracked_init')
+
+    def compile(self):
+        """Resolve the lazy target (if any) and compile the wrappers; done once per styler."""
+        if type(self).is_lazy:
+            type(self).resolve_target()
+            self.track_instances()
+
+    def register_instance(self, instance, *args, **kwargs):
+        self.instances.add(instance)
+
+    # order in which live instances are styled; the lower the earlier
+    restyle_priority = 1
+
+    def for_each_instance(self, method):
+        for instance in list(self.instances):
+            try:
+                method(instance)
+            except RuntimeError:
+                # underlying Qt object has already been deleted
+                self.instances.discard(instance)
+
+    def style_instances(self):
+        """Style the live instances (e.g. open dialogs) of the target class."""
+        self.for_each_instance(self.restyle)
+
+    def unstyle_instances(self):
+        self.for_each_instance(self.unstyle)
+
+    def restyle(self, instance):
+        with style_sheets.batch(instance):
+            self.init(instance, mw)
+
+    def unstyle(self, instance):
+        style_sheets.restore(instance)
+
     @property
     def friendly_name(self):
         name = self.name.replace('_styler', '')
@@ -51,24 +128,40 @@ class Styler(RequiringMixin, SnakeNameMixin, metaclass=StylerMetaclass):
 
         return original
 
-    def replace_attributes(self):
+    def compile_attributes(self):
+        """Generate the values of the additions and replacements, without applying these.
+
+        Nothing but the values is computed here (no Qt calls, no changes
+        to the target), so it is safe to run it on a worker thread.
+        """
+        additions = {
+            key: addition.value(self)
+            for key, addition in self.additions.items()
+        }
+        replacements = {
+            key: replacement.value(self) if isinstance(replacement, PropertyDescriptor) else replacement
+            for key, replacement in self.replacements.items()
+        }
+        return CompiledAttributes(additions, replacements)
+
+    def apply_attributes(self, compiled):
         try:
-            for key, addition in self.additions.items():
+            for key, addition in compiled.additions.items():
                 original = self.get_or_create_original(key)
-                setattr(self.target, key, original + addition.value(self))
+                setattr(self.target, key, original + addition)
 
-            for key, replacement in self.replacements.items():
+            for key, replacement in compiled.replacements.items():
                 self.get_or_create_original(key)
-
-                if isinstance(replacement, PropertyDescriptor):
-                    replacement = replacement.value(self)
-
                 setattr(self.target, key, replacement)
 
         except (AttributeError, TypeError):
             print('Failed to inject style to:', self.target, key, self.name)
             raise
 
+    def replace_attributes(self):
+        self.compile()
+        self.apply_attributes(self.compile_attributes())
+
     def restore_attributes(self):
         for key, original in self.original_attributes.items():
             setattr(self.target, key, original)
@@ -99,11 +192,23 @@ class StyleSetter:
 
     @css.setter
     def css(self, value):
-        self.target.setStyleSheet(value)
+        style_sheets.apply(self.target, value)
 
 
 class MenuStyler(Styler):
-    target = StyleSetter(mw)
+    # only the menu bar (and menus attached to it) need to be repolished;
+    # menus opened from the main window (context menus, the gears of the decks,
+    # "More" of the reviewer) are separate windows, styled as they get polished
+    target = ScopedStyleSetter(
+        default=mw,
+        scopes={
+            'QMenuBar': mw.form.menubar,
+            'QMenu': mw.form.menubar
+        },
+        popups={
+            'QMenu': mw
+        }
+    )
 
     @appends_in_night_mode
     def css(self):
@@ -122,9 +227,7 @@ class ReviewerStyler(Styler):
     def _bottomHTML(self, reviewer, _old):
         return _old(reviewer) + style_tag(percent_escaped(self.bottom_css))
 
-    @property
-    def bottom_css(self):
-        return self.buttons.html + self.shared.colors_replacer + """
+    bottom_css = css_template("""${buttons.html}${shared.colors_replacer}
         body, #outer
         {
             background:-webkit-gradient(linear, left top, left bottom, from(#333), to(#222));
@@ -139,13 +242,14 @@ class ReviewerStyler(Styler):
         {
             color:#ddd
         }
-        """
+        """)
 
 
 class ReviewerCards(Styler):
 
     target = mw.reviewer
     require = {
+        SharedStyles,
         LatexStyle,
         ImageStyle
     }
@@ -157,9 +261,29 @@ class ReviewerCards(Styler):
 
     @css
     def body(self):
+        css = self.card_style + self.shared.user_color_map + self.shared.body_colors
+
         # Invert images and latex if needed
+        if self.config.invert_image:
+            css += self.image.invert
+        if self.config.invert_latex:
+            css += self.latex.invert
+
+        return css
 
-        css_body = """
+    @css
+    def profile_css(self):
+        """Stylesheet for cards with a profile (see CardProfiles), overriding the one of the reviewer."""
+        css = self.body
+
+        if not self.config.invert_image:
+            css += self.image.revert
+        if not self.config.invert_latex:
+            css += self.latex.revert
+
+        return css
+
+    card_style = css_template("""
         .card input
         {
             background-color:black!important;
@@ -168,7 +292,7 @@ class ReviewerCards(Styler):
         }
         .card input::selection
         {
-            color: """ + self.config.color_t + """;
+            color: ${config.color_t};
             background: #0864d4
         }
         .typeGood
@@ -205,22 +329,10 @@ class ReviewerCards(Styler):
         {
             color:#0099CC
         }
-        """
-
-        card_color = """
         .card{
-            color:""" + self.config.color_t + """!important;
+            color:${config.color_t}!important;
         }
-        """
-
-        css = css_body + card_color + self.shared.user_color_map + self.shared.body_colors
-
-        if self.config.invert_image:
-            css += self.image.invert
-        if self.config.invert_latex:
-            css += self.latex.invert
-
-        return css
+        """)
 
 
 class DeckBrowserStyler(Styler):
@@ -263,17 +375,15 @@ class OverviewStyler(Styler):
         styles_html = style_tag(percent_escaped(self.css))
         return inject_css_class(True, styles_html)
 
-    @css
-    def css(self):
-        return f"""
-        {self.buttons.html}
-        {self.shared.colors_replacer}
-        {self.shared.body_colors}
+    css = css_template("""
+        ${buttons.html}
+        ${shared.colors_replacer}
+        ${shared.body_colors}
         .descfont
-        {{
-            color: {self.config.color_t}
-        }}
-        """
+        {
+            color: ${config.color_t}
+        }
+        """)
 
 
 class OverviewBottomStyler(Styler):
@@ -337,24 +447,30 @@ class BrowserStyler(Styler):
     @wraps
     def init(self, browser, mw):
 
-        if self.config.enable_in_dialogs:
+        if self.config.enable_in_dialogs and self.uses_palette:
+            self.set_palette(browser)
+            style_sheets.apply(browser.form.searchEdit, self.search_box_arrow)
+
+        elif self.config.enable_in_dialogs:
 
             basic_css = browser.styleSheet()
             global_style = '#' + browser.form.centralwidget.objectName() + '{' + self.shared.colors + '}'
-            browser.setStyleSheet(self.shared.menu + self.style + basic_css + global_style)
 
-            browser.form.tableView.setStyleSheet(self.table)
-            browser.form.tableView.horizontalHeader().setStyleSheet(self.table_header)
+            with style_sheets.batch(browser):
+                # rules for all widgets (needed to style the splitter) also darken the scroll bars of the whole window
+                style_sheets.apply(browser, self.shared.menu + self.style + basic_css + global_style)
 
-            browser.form.searchEdit.setStyleSheet(self.search_box)
-            browser.form.searchButton.setStyleSheet(self.buttons.qt)
-            browser.form.previewButton.setStyleSheet(self.buttons.qt)
+                style_sheets.apply(browser.form.tableView, self.table)
+                style_sheets.apply(browser.form.tableView.horizontalHeader(), self.table_header)
 
-    # TODO: test this
-    #@wraps
-    def _renderPreview(self, browser, cardChanged=False):
-        if browser._previewWindow:
-            self.app.take_care_of_night_class(web_object=browser._previewWeb)
+                style_sheets.apply(browser.form.searchEdit, self.search_box)
+                style_sheets.apply(browser.form.searchButton, self.buttons.qt)
+                style_sheets.apply(browser.form.previewButton, self.buttons.qt)
+
+    def unstyle(self, browser):
+        super().unstyle(browser)
+        # icons in the sidebar are inverted (or not) when the tree is built
+        browser.buildTree()
 
     @wraps
     def buildTree(self, browser):
@@ -373,105 +489,109 @@ class BrowserStyler(Styler):
         rep, cs = _old(browser)
 
         if self.config.enable_in_dialogs:
-            rep += style_tag("""
+            rep += style_tag(self.card_info)
+        return rep, cs
+
+    card_info = css_template("""
                 *
                 {
-                    """ + self.shared.colors + """
+                    ${shared.colors}
                 }
                 div
                 {
                     border-color:#fff!important
                 }
-                """ + self.shared.colors_replacer + """
+                ${shared.colors_replacer}
                 """)
-        return rep, cs
 
-    @css
-    def style(self):
-        return """
+    style = css_template("""
         QSplitter::handle
         {
             /* handled below as QWidget */
         }
-        #""" + from_utf8("widget") + """, QTreeView
+        #widget, QTreeView
         {
-            """ + self.shared.colors + """
+            ${shared.colors}
         }
         QTreeView::item:selected:active, QTreeView::branch:selected:active
         {
-            color: """ + self.config.color_t + """;
-            background-color:""" + self.config.color_a + """
+            color: ${config.color_t};
+            background-color:${config.color_a}
         }
         QTreeView::item:selected:!active, QTreeView::branch:selected:!active
         {
-            color: """ + self.config.color_t + """;
-            background-color:""" + self.config.color_a + """
+            color: ${config.color_t};
+            background-color:${config.color_a}
         }
-        """ + (
-            """
+        ${splitter}""")
+
+    @css
+    def splitter(self):
+        return self.splitter_style if self.config.style_scroll_bars else ''
+
+    splitter_style = css_template("""
             /* make the splitter light-dark (match all widgets as selecting with QSplitter does not work) */
             QWidget{
-                background-color: """ + self.config.color_s + """;
-                color: """ + self.config.color_t + """;
+                background-color: ${config.color_s};
+                color: ${config.color_t};
             }
             /* make sure that no other important widgets - like tags box - are light-dark */
             QGroupBox{
-                background-color: """ + self.config.color_b + """;
+                background-color: ${config.color_b};
             }
-            """
-            if self.config.style_scroll_bars else
-            ''
-        )
+            """)
 
-    @css
-    def table(self):
-        return f"""
+    table = css_template("""
             QTableView
-            {{
-                selection-color: {self.config.color_t};
-                alternate-background-color: {self.config.color_s};
-                gridline-color: {self.config.color_s};
-                {self.shared.colors}
-                selection-background-color: {self.config.color_a}
-            }}
-            """
+            {
+                selection-color: ${config.color_t};
+                alternate-background-color: ${config.color_s};
+                gridline-color: ${config.color_s};
+                ${shared.colors}
+                selection-background-color: ${config.color_a}
+            }
+            """)
 
-    @css
-    def table_header(self):
-        return """
+    table_header = css_template("""
             QHeaderView, QHeaderView::section
             {
-                """ + self.shared.colors + """
-                border:1px solid """ + self.config.color_s + """
+                ${shared.colors}
+                border:1px solid ${config.color_s}
             }
-            """
+            """)
 
-    @css
-    def search_box(self):
-        return """
+    # the only part of the browser which palette cannot style
+    search_box_arrow = css_template("""
+        QComboBox::down-arrow
+        {
+            image: url('${app.icons.arrow}')
+        }
+        """)
+
+    search_box = css_template("""
         QComboBox
         {
-            border:1px solid """ + self.config.color_s + """;
+            border:1px solid ${config.color_s};
             border-radius:3px;
             padding:0px 4px;
-            """ + self.shared.colors + """
+            ${shared.colors}
         }
 
         QComboBox:!editable
         {
-            background:""" + self.config.color_a + """
+            background:${config.color_a}
         }
 
         QComboBox QAbstractItemView
         {
             border:1px solid #111;
-            """ + self.shared.colors + """
+            ${shared.colors}
             background:#444
         }
 
         QComboBox::drop-down, QComboBox::drop-down:editable
         {
-            """ + self.shared.colors + """
+            ${shared.colors}
             width:24px;
             border-left:1px solid #444;
             border-top-right-radius:3px;
@@ -482,9 +602,9 @@ class BrowserStyler(Styler):
         QComboBox::down-arrow
         {
             top:1px;
-            image: url('""" + self.app.icons.arrow + """')
+            image: url('${app.icons.arrow}')
         }
-        """
+        """)
 
 
 class AddCardsStyler(Styler):
@@ -499,20 +619,21 @@ class AddCardsStyler(Styler):
     def init(self, add_cards, mw):
         if self.config.enable_in_dialogs:
 
-            # style add/history button
-            add_cards.form.buttonBox.setStyleSheet(self.buttons.qt)
+            with style_sheets.batch(add_cards):
+                # style add/history button
+                style_sheets.apply(add_cards.form.buttonBox, self.buttons.qt)
 
-            self.set_style_to_objects_inside(add_cards.form.horizontalLayout, self.buttons.qt)
+                self.set_style_to_objects_inside(add_cards.form.horizontalLayout, self.buttons.qt)
 
-            # style the single line which has some bright color
-            add_cards.form.line.setStyleSheet('#' + from_utf8('line') + '{border: 0px solid #333}')
+                # style the single line which has some bright color
+                style_sheets.apply(add_cards.form.line, '#' + from_utf8('line') + '{border: 0px solid #333}')
 
             add_cards.form.fieldsArea.setAutoFillBackground(False)
 
     @staticmethod
     def set_style_to_objects_inside(layout, style):
         for widget in iterate_widgets(layout):
-            widget.setStyleSheet(style)
+            style_sheets.apply(widget, style)
 
 
 class EditCurrentStyler(Styler):
@@ -526,7 +647,7 @@ class EditCurrentStyler(Styler):
     def init(self, edit_current, mw):
         if self.config.enable_in_dialogs:
             # style close button
-            edit_current.form.buttonBox.setStyleSheet(self.buttons.qt)
+            style_sheets.apply(edit_current.form.buttonBox, self.buttons.qt)
 
 
 class ProgressStyler(Styler):
@@ -539,8 +660,10 @@ class ProgressStyler(Styler):
     }
 
     def init(self, progress, *args, **kwargs):
-        if self.config.enable_in_dialogs:
-            progress.setStyleSheet(self.buttons.qt + self.dialog.style)
+        if self.config.enable_in_dialogs and self.uses_palette:
+            self.set_palette(progress)
+        elif self.config.enable_in_dialogs:
+            style_sheets.apply(progress, self.buttons.qt + self.dialog.style)
 
 
 if hasattr(ProgressManager, 'ProgressNoCancel'):
@@ -560,9 +683,9 @@ if hasattr(ProgressManager, 'ProgressNoCancel'):
                 label = aqt.QLabel(label)
                 progress.setLabel(label)
                 label.setAlignment(Qt.AlignCenter)
-                label.setStyleSheet(self.dialog.style)
+                style_sheets.apply(label, self.dialog.style)
 
-                progress.setStyleSheet(self.buttons.qt + self.dialog.style)
+                style_sheets.apply(progress, self.buttons.qt + self.dialog.style)
 
     class ProgressNoCancel(Styler):
 
@@ -579,6 +702,9 @@ if hasattr(ProgressManager, 'ProgressNoCancel'):
         def init(self, progress, *args, **kwargs):
             self.legacy_progress_styler.init(progress, *args, **kwargs)
 
+        def restyle(self, progress):
+            self.init(progress)
+
 
     class ProgressCancelable(Styler):
 
@@ -589,6 +715,9 @@ if hasattr(ProgressManager, 'ProgressNoCancel'):
         def init(self, progress, *args, **kwargs):
             self.legacy_progress_styler.init(progress, *args, **kwargs)
 
+        def restyle(self, progress):
+            self.init(progress)
+
 else:
     # beta 31 or newer
 
@@ -613,8 +742,10 @@ class StatsWindowStyler(Styler):
 
     @wraps
     def init(self, stats, *args, **kwargs):
-        if self.config.enable_in_dialogs:
-            stats.setStyleSheet(self.buttons.qt + self.dialog.style)
+        if self.config.enable_in_dialogs and self.uses_palette:
+            self.set_palette(stats)
+        elif self.config.enable_in_dialogs:
+            style_sheets.apply(stats, self.buttons.qt + self.dialog.style)
 
 
 class StatsReportStyler(Styler):
@@ -656,21 +787,38 @@ class EditorStyler(Styler):
     @wraps
     def init(self, editor, mw, widget, parentWindow, addMode=False):
 
-        if self.config.enable_in_dialogs:
+        if self.config.enable_in_dialogs and self.uses_palette:
+            self.set_palette(editor.parentWindow)
+            self.set_palette(editor.tags.completer.popup())
+
+        elif self.config.enable_in_dialogs:
 
             editor_css = self.dialog.style + self.buttons.qt
 
             editor_css += '#' + widget.objectName() + '{' + self.shared.colors + '}'
 
-            editor.parentWindow.setStyleSheet(editor_css)
+            with style_sheets.batch(editor.parentWindow):
+                style_sheets.apply(editor.parentWindow, editor_css)
+
+                style_sheets.apply(editor.tags.completer.popup(), self.completer)
+
+                style_sheets.apply(
+                    widget,
+                    self.qt_mid_buttons +
+                    self.buttons.advanced_qt(restrict_to='#' + self.encode_class_name('fields')) +
+                    self.buttons.advanced_qt(restrict_to='#' + self.encode_class_name('layout'))
+                )
+
+    # editors are created (and styled) before the windows which contain them
+    restyle_priority = 0
 
-            editor.tags.completer.popup().setStyleSheet(self.completer)
+    def restyle(self, editor):
+        with style_sheets.batch(editor.parentWindow):
+            self.init(editor, editor.mw, editor.widget, editor.parentWindow)
 
-            widget.setStyleSheet(
-                self.qt_mid_buttons +
-                self.buttons.advanced_qt(restrict_to='#' + self.encode_class_name('fields')) +
-                self.buttons.advanced_qt(restrict_to='#' + self.encode_class_name('layout'))
-            )
+    def unstyle(self, editor):
+        style_sheets.restore(editor.parentWindow)
+        style_sheets.restore(editor.tags.completer.popup())
 
     @staticmethod
     def encode_class_name(string):
@@ -705,37 +853,51 @@ class CardLayoutStyler(Styler):
     @wraps
     def init(self, card_layout, *args, **kwargs):
         if self.config.enable_in_dialogs:
-            card_layout.mainArea.setStyleSheet(self.qt_style)
+            style_sheets.apply(card_layout.mainArea, self.qt_style)
 
-    @css
-    def qt_style(self):
-        return f"""
+    qt_style = css_template("""
         QGroupBox::title
-        {{
-            {self.shared.colors}
-        }}
+        {
+            ${shared.colors}
+        }
         QTextEdit
-        {{
-            color: {self.config.color_t};
-            background-color: {self.config.color_s}
-        }}
-        """
+        {
+            color: ${config.color_t};
+            background-color: ${config.color_s}
+        }
+        """)
 
 
 class EditorWebViewStyler(Styler):
+    """Styles the web view of editors with a live style sheet, replaced whenever a note is loaded.
+
+    This way changes of the configuration apply also to the editors which are already open.
+    """
 
-    target = editor
+    target = Editor
     require = {
         ButtonsStyle,
         ImageStyle,
         LatexStyle
     }
 
-    # TODO: currently restart is required for this to take effect after configuration change
-    @appends_in_night_mode
-    @style_tag
-    @percent_escaped
-    def _html(self):
+    style_id = 'night-mode-editor-style'
+
+    def __init__(self, app):
+        super().__init__(app)
+        # minified style sheets, by values of the styling settings
+        self.variants = LRUCache(16)
+
+    @wraps
+    def loadNote(self, editor, *args, **kwargs):
+        editor.web.eval(self.app.web_views.script(css=self.live_css, style_id=self.style_id))
+
+    @css
+    def live_css(self):
+        return self.variants.get_or_compute(self.config.key(), lambda: minify(self.editor_css))
+
+    @css
+    def editor_css(self):
         if self.config.enable_in_dialogs:
 
             custom_css = f"""
@@ -752,7 +914,7 @@ class EditorWebViewStyler(Styler):
             }}
             a
             {{
-                color: 00BBFF
+                color: #00BBFF
             }}
             html, body, #topbuts, .field, .fname, #topbutsOuter
             {{
@@ -784,7 +946,10 @@ class AddonDialogStyler(Styler):
             self.style(window)
 
     def style(self, window):
-        window.setStyleSheet(
+        if self.uses_palette:
+            return self.set_palette(window)
+        style_sheets.apply(
+            window,
             self.buttons.qt +
             'QDialog, QCheckBox, QLabel, QTimeEdit{' + self.shared.colors + '}'
         )
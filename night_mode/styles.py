@@ -1,4 +1,7 @@
+from .cache import LRUCache
+from .colors import normalize_color_map, spellings, to_css
 from .config import ConfigValueGetter
+from .css_templates import Template, css_template
 from .internals import css, snake_case, SingletonMetaclass, RequiringMixin
 
 
@@ -45,9 +48,7 @@ class SharedStyles(Style):
         }
         """
 
-    @css
-    def menu(self):
-        return """
+    menu = css_template("""
         QMenuBar,QMenu
         {
             background-color:#444!important;
@@ -59,7 +60,7 @@ class SharedStyles(Style):
         }
         QMenuBar::item:selected
         {
-            background-color:""" + self.config.color_a + """!important;
+            background-color:${config.color_a}!important;
             border-top-left-radius:6px;
             border-top-right-radius:6px
         }
@@ -69,18 +70,16 @@ class SharedStyles(Style):
         }
         QMenu::item::selected
         {
-            background-color:""" + self.config.color_a + """;
+            background-color:${config.color_a};
         }
         QMenu::item
         {
             padding:3px 25px 3px 25px;
             border:1px solid transparent
         }
-        """
+        """)
 
-    @css
-    def colors(self):
-        return f'color: {self.config.color_t}; background-color: {self.config.color_b};'
+    colors = css_template('color: ${config.color_t}; background-color: ${config.color_b};')
 
     @css
     def colors_replacer(self):
@@ -103,18 +102,19 @@ class SharedStyles(Style):
         }
         """
 
-    @css
-    def body_colors(self):
-        """Generate and return CSS style of class "card"."""
-        return (" body {    color:" + self.config.color_t + "!important;" +
-                "background-color:" + self.config.color_b + "!important}")
+    # CSS style of the card body
+    body_colors = css_template(' body {    color:${config.color_t}!important;background-color:${config.color_b}!important}')
 
     @css
     def user_color_map(self):
         style = ''
-        for old, new in self.config.user_color_map.items():
-            if old and new:
-                style += f'font[color="{old}"]{{color: {new}!important}}'
+        color_map = normalize_color_map(self.config.user_color_map)
+        for old, new in color_map.items():
+            selectors = ','.join(
+                f'font[color="{spelling}" i]'
+                for spelling in spellings(old)
+            )
+            style += f'{selectors}{{color: {to_css(new)}!important}}'
         return style
 
 
@@ -135,38 +135,53 @@ class ButtonsStyle(Style):
     hover = 'color: #fff;'
     active = 'color: #fff;'
 
+    def __init__(self, app):
+        super().__init__(app)
+        # scoped variants of the buttons style sheet, by arguments of advanced_qt
+        # (the template does not depend on the configuration)
+        self.advanced_qt_variants = LRUCache(32)
+
     @css
     def qt(self):
         return self.advanced_qt() + (self.qt_scrollbars if self.config.style_scroll_bars else '')
 
     def advanced_qt(self, restrict_to_parent='', restrict_to=''):
-        return """
-        """ + restrict_to_parent + """ QPushButton""" + restrict_to + """
+        return self.advanced_qt_variants.get_or_compute(
+            (restrict_to_parent, restrict_to),
+            lambda: self.advanced_qt_template.render(
+                self,
+                restrict_to_parent=restrict_to_parent,
+                restrict_to=restrict_to
+            )
+        )
+
+    advanced_qt_template = Template("""
+        ${restrict_to_parent} QPushButton${restrict_to}
         {
             background: qlineargradient(x1: 0.0, y1: 0.0, x2: 0.0, y2: 1.0, radius: 1, stop: 0.03 #3D4850, stop: 0.04 #313d45, stop: 1 #232B30);
             border-radius: 3px;
-            """ + self.idle + """
+            ${idle}
         }
-        """ + restrict_to_parent + """ QPushButton""" + restrict_to + """:hover
+        ${restrict_to_parent} QPushButton${restrict_to}:hover
         {
-            """ + self.hover + """
+            ${hover}
             background: qlineargradient(x1: 0.0, y1: 0.0, x2: 0.0, y2: 1.0, radius: 1, stop: 0.03 #4C5A64, stop: 0.04 #404F5A, stop: 1 #2E3940);
         }
-        """ + restrict_to_parent + """ QPushButton""" + restrict_to + """:pressed
+        ${restrict_to_parent} QPushButton${restrict_to}:pressed
         {
-            """ + self.active + """
+            ${active}
             background: qlineargradient(x1: 0.0, y1: 0.0, x2: 0.0, y2: 1.0, radius: 1, stop: 0.03 #20282D, stop: 0.51 #252E34, stop: 1 #222A30);
         }
-        """ + restrict_to_parent + """ QPushButton""" + restrict_to + """:disabled
+        ${restrict_to_parent} QPushButton${restrict_to}:disabled
         {
-            """ + self.active + """
+            ${active}
             background: qlineargradient(x1: 0.0, y1: 0.0, x2: 0.0, y2: 1.0, radius: 1, stop: 0.03 #20282D, stop: 0.51 #252E34, stop: 1 #222A30);
         }
-        """ + restrict_to_parent + """ QPushButton""" + restrict_to + """:focus
+        ${restrict_to_parent} QPushButton${restrict_to}:focus
         {
             outline: 1px dotted #4a90d9
         }
-        """
+        """)
 
     scrollbar_size = 15
     scrollbar_background = '#313d45'
@@ -233,32 +248,34 @@ class ButtonsStyle(Style):
         """
 
     @css
-    def html(self):
-        return f"""
+    def optional_scrollbars(self):
+        return self.scrollbars if self.config.style_scroll_bars else ''
+
+    html = css_template("""
         button
-        {{
-            { self.idle }
+        {
+            ${idle}
             text-shadow:1px 1px #1f272b;
             display: inline-block;
             background: #313d45;
             background: gradient(linear, left top, left bottom, color-stop(3%,#3D4850), color-stop(4%,#313d45), color-stop(100%,#232B30));
             box-shadow: 1px 1px 1px rgba(0,0,0,0.1);
             border-radius: 3px
-        }}
+        }
         button:hover
-        {{
-            { self.hover }
-            background: #404F5A);
+        {
+            ${hover}
+            background: #404F5A;
             background: gradient(linear, left top, left bottom, color-stop(3%,#4C5A64), color-stop(4%,#404F5A), color-stop(100%,#2E3940));
-        }}
+        }
         button:active
-        {{
-            { self.active }
+        {
+            ${active}
             background: #252E34;
             background: gradient(linear, left top, left bottom, color-stop(3%,#20282D), color-stop(51%,#252E34), color-stop(100%,#222A30));
             box-shadow: 1px 1px 1px rgba(255,255,255,0.1);
-        }}
-        """ + (self.scrollbars if self.config.style_scroll_bars else '')
+        }
+        ${optional_scrollbars}""")
 
 
 class DeckStyle(Style):
@@ -267,9 +284,7 @@ class DeckStyle(Style):
         ButtonsStyle
     }
 
-    @css
-    def bottom(self):
-        return self.buttons.html + """
+    bottom = css_template("""${buttons.html}
         #header
         {
             color:#ccc!important;
@@ -277,11 +292,11 @@ class DeckStyle(Style):
             border-top-color:#000;
             height:40px
         }
-        """
+        """)
 
-    @css
-    def style(self):
-        return self.buttons.html + self.shared.colors_replacer + """
+    # Rules are matched against every row of the deck tree, which can have thousands of rows:
+    # prefer class and child selectors here; the due/new counts are recolored by colors_replacer.
+    style = css_template("""${buttons.html}${shared.colors_replacer}
         a
         {
             color:#0099CC
@@ -294,28 +309,26 @@ class DeckStyle(Style):
         {
             color:#efe
         }
-        tr.deck td
+        tr.deck > td
         {
             height:35px;
             border-bottom-color:#333
         }
-        tr.deck font[color="#007700"]
-        {
-            color:#00CC00
-        }
-        tr.deck font[color="#000099"]
-        {
-            color:#00BBFF
-        }
         .filtered
         {
             color:#00AAEE!important
         }
         .gears
         {
-            filter: invert(1)
+            ${gears}
         }
-        """
+        """)
+
+    @property
+    def gears(self):
+        if self.app.icons.gears:
+            return f"content:url('{self.app.icons.gears}')"
+        return 'filter: invert(1)'
 
 
 class MessageBoxStyle(Style):
@@ -324,24 +337,19 @@ class MessageBoxStyle(Style):
         ButtonsStyle
     }
 
-    @css
-    def style(self):
-        """
-        Generate and return CSS style of class QMessageBox,
-        using global color declarations
-        """
-        return f"""
+    # CSS style of class QMessageBox, using global color declarations
+    style = css_template("""
         QMessageBox,QLabel
-        {{
-            color: { self.config.color_t };
-            background-color: { self.config.color_b }
-        }}
-        { self.buttons.qt }
+        {
+            color: ${config.color_t};
+            background-color: ${config.color_b}
+        }
+        ${buttons.qt}
         QPushButton
-        {{
+        {
             min-width: 70px
-        }}
-        """
+        }
+        """)
 
 
 class ImageStyle(Style):
@@ -356,6 +364,16 @@ class ImageStyle(Style):
         }
         """
 
+    @css
+    def revert(self):
+        return """
+        img
+        {
+            filter:none;
+            -webkit-filter:none
+        }
+        """
+
 
 class LatexStyle(Style):
 
@@ -369,6 +387,16 @@ class LatexStyle(Style):
         }
         """
 
+    @css
+    def revert(self):
+        return """
+        .latex
+        {
+            filter:none;
+            -webkit-filter:none
+        }
+        """
+
 
 class DialogStyle(Style):
 
@@ -378,22 +406,24 @@ class DialogStyle(Style):
     }
 
     @css
-    def style(self):
-        return """
+    def tab_buttons(self):
+        return self.buttons.advanced_qt("QTabWidget")
+
+    style = css_template("""
             QDialog,QLabel,QListWidget,QFontComboBox,QCheckBox,QSpinBox,QRadioButton,QHBoxLayout
             {
-            """ + self.shared.colors + """
+            ${shared.colors}
             }
             QFontComboBox::drop-down{border: 0px; border-left: 1px solid #555; width: 30px;}
             QFontComboBox::down-arrow{width:12px; height:8px;
                 top:1px;
-                image:url('""" + self.app.icons.arrow + """')
+                image:url('${app.icons.arrow}')
             }
             QFontComboBox, QSpinBox{border: 1px solid #555}
 
             QTabWidget QWidget
             {
-                color:""" + self.config.color_t + """;
+                color:${config.color_t};
                 background-color:#222;
                 border-color:#555
             }
@@ -414,4 +444,4 @@ class DialogStyle(Style):
                 subcontrol-position:top left;
                 margin-top:-7px
             }
-            """ + self.buttons.advanced_qt("QTabWidget")
+            ${tab_buttons}""")
@@ -0,0 +1,133 @@
+import json
+from weakref import WeakSet
+
+from PyQt5.QtGui import QColor
+from anki.hooks import wrap
+from aqt import mw
+from aqt.webview import AnkiWebView
+
+
+class WebViewRegistry:
+    """Keeps track of all live AnkiWebView objects, allowing to update all of them at once.
+
+    Roles of the web views (like 'main', 'editor' or 'stats') are resolved
+    when needed, as the constructor does not know where the view will be placed.
+    """
+
+    style_id = 'night-mode-live-style'
+    original_background_property = 'night_mode_original_background'
+
+    roles_by_window = {
+        'Browser': 'browser',
+        'CardLayout': 'card_layout',
+        'DeckStats': 'stats',
+        'NewDeckStats': 'stats',
+    }
+
+    def __init__(self):
+        self.web_views = WeakSet()
+        # background color of the pages to be used before anything is painted; None if disabled
+        self.first_paint_background = None
+        # roles of the web views which get the background
+        self.first_paint_roles = set()
+
+    def track(self):
+        AnkiWebView.__init__ = wrap(AnkiWebView.__init__, self.register)
+        # the role of a web view is known once it is placed in a window, i.e. before it loads anything
+        AnkiWebView.setHtml = wrap(AnkiWebView.setHtml, self.prepare_first_paint, 'before')
+
+    def register(self, web, *args, **kwargs):
+        self.web_views.add(web)
+
+    def role(self, web):
+        if web is mw.web:
+            return 'main'
+        if web is mw.toolbar.web:
+            return 'toolbar'
+        if web is mw.bottomWeb:
+            return 'bottom'
+        if type(web).__name__ == 'EditorWebView':
+            return 'editor'
+        window_class = type(web.window()).__name__
+        # previews are separate windows, usually without a dedicated class
+        return self.roles_by_window.get(window_class, 'other')
+
+    def live(self, roles=None):
+        for web in list(self.web_views):
+            try:
+                # also when all the roles are requested, to find out if the view is still alive
+                role = self.role(web)
+            except RuntimeError:
+                # underlying Qt object has already been deleted
+                self.web_views.discard(web)
+                continue
+            if roles is None or role in roles:
+                yield web
+
+    def script(self, css=None, night_class=None, style_id=None):
+        """JavaScript replacing the live style sheet and/or toggling the night_mode class.
+
+        Args:
+            style_id: id of the live style sheet to replace, if other than the default one
+        """
+        statements = []
+        style_id = style_id or self.style_id
+
+        if css is not None:
+            statements.append(f"""
+            var style = document.getElementById('{style_id}');
+            if(!style)
+            {{
+                style = document.createElement('style');
+                style.id = '{style_id}';
+                (document.head || document.documentElement).appendChild(style);
+            }}
+            style.textContent = {json.dumps(css)};
+            """)
+
+        if night_class is not None:
+            statements.append(f"""
+            if(document.body)
+                document.body.classList.toggle('night_mode', {json.dumps(bool(night_class))});
+            """)
+
+        return '(function(){' + ''.join(statements) + '})()'
+
+    def set_first_paint(self, background=None, roles=()):
+        """Make the web views of given roles (also these created later) dark from the very first frame.
+
+        Only the background of the pages is changed: it is visible until the
+        page paints its own background, preventing the white flash on each
+        navigation. Call without arguments to restore the default behaviour.
+        """
+        self.first_paint_background = background
+        self.first_paint_roles = set(roles) if background else set()
+
+        for web in self.live():
+            self.prepare_first_paint(web)
+
+    def prepare_first_paint(self, web, *args, **kwargs):
+        page = web.page()
+        original_background = web.property(self.original_background_property)
+
+        if self.first_paint_roles and self.role(web) in self.first_paint_roles:
+            if original_background is None:
+                web.setProperty(self.original_background_property, page.backgroundColor())
+            page.setBackgroundColor(QColor(self.first_paint_background))
+
+        elif original_background is not None:
+            page.setBackgroundColor(original_background)
+
+    def push(self, css=None, night_class=None, roles=None, style_id=None):
+        """Update all the live web views (of given roles) with a single eval() call per view.
+
+        Args:
+            css: the new content of the live style sheet (None to leave it unchanged)
+            night_class: should the night_mode class be added or removed (None to leave it unchanged)
+            roles: collection of roles of web views to update (None for all)
+            style_id: id of the live style sheet to replace, if other than the default one
+        """
+        script = self.script(css, night_class, style_id)
+
+        for web in self.live(roles):
+            web.eval(script)
@@ -0,0 +1,111 @@
+"""
+Helpers shared by the tests.
+
+Anki and the add-on are imported inside of the helpers only,
+as these have to be called within anki_running().
+"""
+import gc
+import os
+from copy import deepcopy
+from time import perf_counter
+
+import pytest
+
+
+class FakeSetting:
+    def __init__(self, value):
+        self.value = value
+
+
+class FakeConfig:
+
+    defaults = {
+        'color_t': '#ffffff',
+        'color_b': '#272828',
+        'color_s': '#373838',
+        'color_a': '#443477',
+        'style_scroll_bars': True,
+        'enable_in_dialogs': True,
+        'invert_image': True,
+        'invert_latex': True,
+        'user_color_map': {'#000000': '#ffffff'},
+        'disabled_stylers': set(),
+        'palette_stylers': set(),
+    }
+
+    def __init__(self, **values):
+        self.version = 0
+        # each config gets its own copies of the (mutable) default values
+        for name, value in {**deepcopy(self.defaults), **values}.items():
+            setattr(self, name, value if isinstance(value, FakeSetting) else FakeSetting(value))
+
+
+class FakeApp:
+    """Stands for the add-on in tests of the parts which only need its configuration.
+
+    Not to be passed to the (singleton) stylers and styles, these are initialized with the add-on itself.
+    """
+
+    def __init__(self, **values):
+        self.config = FakeConfig(**values)
+
+
+def loaded_addon():
+    """The add-on object; its stylers (and the styles these require) are created on import."""
+    from night_mode import night_mode as app
+    return app
+
+
+def enabled_night_mode():
+    app = loaded_addon()
+    app.profile_loaded = True
+    app.config.mode_settings.value['mode'] = 'manual'
+    app.config.enable_night_mode.value = True
+    return app
+
+
+def wait_for(condition, timeout=10):
+    from PyQt5.QtWidgets import QApplication
+
+    start = perf_counter()
+    while not condition():
+        assert perf_counter() - start < timeout
+        QApplication.processEvents()
+
+
+def settle():
+    from PyQt5.QtCore import QEvent
+    from PyQt5.QtWidgets import QApplication
+
+    QApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+    QApplication.processEvents()
+    gc.collect()
+
+
+def finish_compilation(app):
+    # the worker runs the jobs in order, so all the previous are done once this one is
+    app.compilation.executor.submit(lambda: None).result()
+    # the results are passed to the main thread as queued events
+    settle()
+
+
+def switch_night_mode(app, state, reload=False):
+    """Switch the night mode and wait until the styling compiled on the worker thread is applied."""
+    app.profile_loaded = True
+    app.config.mode_settings.value['mode'] = 'manual'
+    app.config.enable_night_mode.value = state
+    app.refresh(reload=reload)
+    finish_compilation(app)
+
+
+def benchmark_sizes(variable):
+    """Sizes for a benchmark given in the environment variable, like "500,2000,5000"."""
+    return [int(size) for size in os.environ.get(variable, '').split(',') if size]
+
+
+def benchmark(variable):
+    """Mark a benchmark to be run only when its sizes are given in the environment variable.
+
+    The benchmarks report their timings (use pytest -s to see them) rather than assert on these.
+    """
+    return pytest.mark.skipif(not benchmark_sizes(variable), reason=f'set {variable} to run the benchmark')
@@ -0,0 +1,145 @@
+"""
+Benchmark of the interactions with the Browser on synthetic collections, with night mode on and off.
+
+Runs only when the sizes of the collections (in cards) are given with NIGHT_MODE_BROWSER_SIZES
+(e.g. "10000,100000"); there is one deck per 50 cards and one tag per 20 cards.
+The timings are reported (use pytest -s to see them), not asserted.
+"""
+import os
+from time import perf_counter
+
+from anki_testing import anki_running
+
+from helpers import benchmark, benchmark_sizes, settle, switch_night_mode
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+collection_sizes = benchmark_sizes('NIGHT_MODE_BROWSER_SIZES')
+
+interactions = ['open', 'sidebar', 'search', 'select', 'scroll']
+
+
+def populate(col, size):
+    """Add notes (one card each), decks and tags until the collection has given number of cards."""
+    from anki.utils import guid64, fieldChecksum, intTime
+
+    existing = col.cardCount()
+    if existing >= size:
+        return
+
+    model = col.models.byName('Basic')
+    deck_ids = [
+        col.decks.id(f'Benchmark::Group {i // 50}::Deck {i}')
+        for i in range(max(size // 50, 1))
+    ]
+    tags = [f'benchmark_tag_{i}' for i in range(max(size // 20, 1))]
+    col.tags.register(tags)
+
+    first_id = (col.db.scalar('select max(id) from notes') or 0) + 1
+    modified = intTime()
+    notes = []
+    cards = []
+
+    for i in range(existing, size):
+        note_id = first_id + i
+        front = f'Front {i}'
+        notes.append((
+            note_id, guid64(), model['id'], modified, -1,
+            f' {tags[i % len(tags)]} {tags[(i * 7) % len(tags)]} ',
+            f'{front}\x1fBack <b>{i}</b>', front, fieldChecksum(front), 0, ''
+        ))
+        cards.append((
+            note_id, note_id, deck_ids[i % len(deck_ids)], 0, modified, -1,
+            0, 0, i, 0, 0, 0, 0, 0, 0, 0, 0, ''
+        ))
+
+    col.db.executemany('insert into notes values (?,?,?,?,?,?,?,?,?,?,?)', notes)
+    col.db.executemany('insert into cards values (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)', cards)
+    col.setMod()
+
+
+def measure(action, repeats=3):
+    """Returns the shortest time (in seconds) of the action, including processing of the events it caused"""
+    from PyQt5.QtWidgets import QApplication
+
+    times = []
+    for i in range(repeats):
+        start = perf_counter()
+        action(i)
+        QApplication.processEvents()
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def benchmark_browser():
+    import aqt
+    from aqt import mw
+
+    opened = []
+
+    def open_browser(i):
+        opened.append(aqt.dialogs.open('Browser', mw))
+
+    def close_browser():
+        opened.pop().close()
+        settle()
+
+    times = {}
+
+    for i in range(3):
+        times['open'] = min(times.get('open', float('inf')), measure(open_browser, repeats=1))
+        close_browser()
+
+    open_browser(0)
+    browser = opened[-1]
+    table = browser.form.tableView
+    search_box = browser.form.searchEdit.lineEdit()
+
+    def search(i):
+        search_box.setText(f'tag:benchmark_tag_{i}* or deck:Benchmark::Group {i}*')
+        search_box.returnPressed.emit()
+
+    def select(i):
+        table.selectRow(i * 10)
+
+    def scroll(i):
+        scroll_bar = table.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.value() + scroll_bar.pageStep())
+        # paint synchronously, as that is what is measured
+        table.viewport().repaint()
+
+    times['sidebar'] = measure(lambda i: browser.buildTree())
+    times['search'] = measure(search)
+
+    search_box.setText('deck:Benchmark*')
+    search_box.returnPressed.emit()
+
+    times['select'] = measure(select)
+    times['scroll'] = measure(scroll, repeats=10)
+
+    close_browser()
+    return times
+
+
+@benchmark('NIGHT_MODE_BROWSER_SIZES')
+def test_browser_overhead():
+    with anki_running():
+        from aqt import mw
+        from night_mode import night_mode as app
+
+        for size in collection_sizes:
+            populate(mw.col, size)
+
+            results = {}
+            for state in [False, True]:
+                switch_night_mode(app, state)
+                results[state] = benchmark_browser()
+
+            for interaction in interactions:
+                normal, night = results[False][interaction], results[True][interaction]
+                print(
+                    f'{size} cards, {interaction}: {normal * 1000:.1f} ms without, '
+                    f'{night * 1000:.1f} ms with night mode ({night / normal:.2f}x)'
+                )
+
+        switch_night_mode(app, False)
@@ -0,0 +1,62 @@
+from anki_testing import anki_running
+
+from helpers import FakeApp, FakeSetting, loaded_addon
+
+
+class CardProfiles(FakeSetting):
+    overridable = {'invert_image', 'invert_latex', 'color_t', 'color_b', 'user_color_map'}
+
+
+def app_with_profiles():
+    return FakeApp(card_profiles=CardProfiles([
+        {'note_types': [20], 'settings': {'color_b': '#000000'}},
+        {'decks': [1], 'settings': {'invert_image': False, 'version': 'ignored'}},
+        {'decks': [1], 'note_types': [20], 'settings': {'color_b': '#111111'}},
+    ]))
+
+
+def test_lookup():
+    with anki_running():
+        from night_mode.card_profiles import CardProfileTable
+
+        # the profiles are rendered by the reviewer styler of the add-on
+        loaded_addon()
+        app = app_with_profiles()
+        profiles = CardProfileTable(app)
+
+        assert profiles.get(2, 10) is None
+        assert profiles.get(2, 20).overrides == {'color_b': '#000000'}
+        assert profiles.get(1, 10).overrides == {'invert_image': False}
+        # the most specific profile wins
+        assert profiles.get(1, 20).overrides == {'color_b': '#111111'}
+
+        # resolved once, then served from the table
+        assert profiles.table[1, 20] is profiles.get(1, 20)
+
+        assert 'background-color:#000000!important' in profiles.get(2, 20).style
+        assert 'img{filter:none' in profiles.get(1, 10).style
+        assert 'img{filter:none' not in profiles.get(2, 20).style
+
+        # recompiled when the configuration changes
+        app.config.card_profiles.value = []
+        assert profiles.get(1, 20) is not None
+        app.config.version += 1
+        assert profiles.get(1, 20) is None
+
+
+def test_overrides_are_thread_local():
+    with anki_running():
+        from threading import Thread
+        from night_mode.config import ConfigValueGetter
+
+        getter = ConfigValueGetter(FakeApp().config)
+        seen = []
+
+        with ConfigValueGetter.overridden({'color_b': '#000000'}):
+            assert getter.color_b == '#000000'
+            thread = Thread(target=lambda: seen.append(getter.color_b))
+            thread.start()
+            thread.join()
+
+        assert seen == ['#272828']
+        assert getter.color_b == '#272828'
@@ -0,0 +1,139 @@
+import os
+
+from anki_testing import anki_running
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+def test_import_and_export():
+    with anki_running():
+        from night_mode.color_map import parse_mappings, export_mappings
+
+        color_map = {'#000000': 'white', 'red': '#ff7777'}
+
+        for file_format in ['json', 'csv']:
+            exported = export_mappings(color_map, file_format)
+            assert dict(parse_mappings(exported)) == color_map
+
+        assert parse_mappings('[["blue", "#8080ff"]]') == [('blue', '#8080ff')]
+        assert parse_mappings('#000, white\n\n#00f, yellow') == [('#000', 'white'), ('#00f', 'yellow')]
+
+
+def test_model_applies_import_as_one_update():
+    with anki_running():
+        from night_mode.color_map import ColorMapModel
+
+        updates = []
+        color_map = {'#000000': 'white'}
+        model = ColorMapModel(color_map, on_update=lambda: updates.append(True))
+
+        skipped = model.merge([('black', '#eeeeee'), ('blue', '#8080ff'), ('not a color', 'red')])
+
+        assert len(updates) == 1
+        assert skipped == [('not a color', 'red')]
+        # the same color in a different spelling replaces the existing mapping
+        assert color_map == {'black': '#eeeeee', 'blue': '#8080ff'}
+        assert model.rowCount() == 2
+
+        assert not model.setData(model.index(1, 0), '#000')
+        assert model.setData(model.index(1, 1), 'yellow')
+        assert color_map['blue'] == 'yellow'
+
+        model.remove({0, 1})
+        assert color_map == {}
+        assert len(updates) == 3
+
+
+def test_invalid_imports():
+    with anki_running():
+        from pytest import raises
+        from night_mode.color_map import parse_mappings
+
+        for text in ['{"black": "white"', '["black", "white"]', '[1, 2]', 'black', '#000, white, red']:
+            with raises(ValueError):
+                parse_mappings(text)
+
+
+def test_many_mappings():
+    with anki_running():
+        from night_mode.color_map import ColorMapWindow
+
+        color_map = {f'#{i:06x}': '#ffffff' for i in range(1000)}
+        window = ColorMapWindow(None, color_map)
+        model = window.model
+        assert model.rowCount() == 1000
+
+        queried_rows = set()
+        data = model.data
+
+        def recording_data(index, *args, **kwargs):
+            queried_rows.add(index.row())
+            return data(index, *args, **kwargs)
+
+        model.data = recording_data
+        try:
+            window.table.viewport().grab()
+        finally:
+            del model.data
+
+        # only the visible rows are painted
+        assert queried_rows
+        assert max(queried_rows) < 100
+        window.close()
+
+
+def test_colors_are_edited_with_color_picker():
+    with anki_running():
+        from PyQt5.QtCore import Qt
+        from PyQt5.QtGui import QColor
+        from PyQt5.QtTest import QTest
+        from night_mode import color_map as color_map_module
+        from night_mode.color_map import ColorMapWindow
+
+        color_map = {'#000000': '#ffffff'}
+        window = ColorMapWindow(None, color_map)
+        table = window.table
+        index = window.model.index(0, 1)
+
+        get_color = color_map_module.QColorDialog.getColor
+        color_map_module.QColorDialog.getColor = lambda *args, **kwargs: QColor('#eeeeee')
+        try:
+            cell = table.visualRect(index).center()
+            QTest.mouseClick(table.viewport(), Qt.LeftButton, pos=cell)
+            QTest.mouseDClick(table.viewport(), Qt.LeftButton, pos=cell)
+        finally:
+            color_map_module.QColorDialog.getColor = get_color
+
+        assert color_map == {'#000000': '#eeeeee'}
+        # no editor was left open in the cell
+        assert table.indexWidget(index) is None
+        window.close()
+
+
+def test_unreadable_and_unwritable_files():
+    with anki_running():
+        from night_mode import color_map as color_map_module
+        from night_mode.color_map import ColorMapWindow
+
+        color_map = {'#000000': '#ffffff'}
+        window = ColorMapWindow(None, color_map)
+        # a directory can be neither read nor written as a file
+        path = os.path.dirname(os.path.abspath(__file__))
+        alerts = []
+
+        dialog = color_map_module.QFileDialog
+        originals = dialog.getOpenFileName, dialog.getSaveFileName, color_map_module.alert
+        dialog.getOpenFileName = dialog.getSaveFileName = lambda *args, **kwargs: (path, '')
+        color_map_module.alert = alerts.append
+        try:
+            window.on_import()
+            window.on_export()
+        finally:
+            dialog.getOpenFileName, dialog.getSaveFileName, color_map_module.alert = originals
+
+        assert [message.split(':')[0] for message in alerts] == [
+            'Could not read the color mappings',
+            'Could not write the color mappings'
+        ]
+        assert color_map == {'#000000': '#ffffff'}
+        window.close()
@@ -0,0 +1,35 @@
+from anki_testing import anki_running
+
+
+def test_parse_color():
+    with anki_running():
+        from night_mode.colors import parse_color
+
+        white = parse_color('white')
+
+        assert white == 0xffffffff
+        assert parse_color('#FFF') == white
+        assert parse_color('#ffffff') == white
+        assert parse_color('rgb(255, 255, 255)') == white
+        assert parse_color('hsl(0, 0%, 100%)') == white
+        assert parse_color('rgba(0, 0, 0, 0.5)') == 0x00000080
+        assert parse_color('00BBFF') is None
+        assert parse_color('#404F5A)') is None
+
+
+def test_contrast_ratio():
+    with anki_running():
+        from night_mode.colors import parse_color, contrast_ratio
+
+        assert contrast_ratio(parse_color('white'), parse_color('black')) == 21
+        assert contrast_ratio(parse_color('#777'), parse_color('#777')) == 1
+
+
+def test_normalize_color_map():
+    with anki_running():
+        from night_mode.colors import normalize_color_map, duplicate_colors
+
+        color_map = {'#FFF': 'black', 'white': 'red', 'foo': 'red'}
+
+        assert normalize_color_map(color_map) == {0xffffffff: 0x000000ff}
+        assert duplicate_colors(color_map) == ['white']
@@ -0,0 +1,116 @@
+import os
+
+from anki_testing import anki_running
+
+from helpers import enabled_night_mode, finish_compilation, wait_for
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+def test_compiled_from_snapshot():
+    with anki_running():
+        from threading import current_thread
+        from night_mode.stylers import DeckBrowserStyler
+
+        app = enabled_night_mode()
+        styler = DeckBrowserStyler.instance
+        threads = []
+
+        original_compile = styler.compile_attributes
+
+        def compile_attributes():
+            threads.append(current_thread())
+            return original_compile()
+
+        styler.compile_attributes = compile_attributes
+
+        snapshot = app.config.snapshot()
+        snapshot['color_b'] = '#010203'
+
+        received = []
+        app.config.color_b.value = '#0a0b0c'
+        app.compilation.submit([styler], received.append)
+        # the configuration changes after the snapshot was taken, but before the compilation
+        app.config.color_b.value = '#040506'
+
+        wait_for(lambda: received)
+        compiled = received[0].compiled[styler]
+
+        assert threads and current_thread() not in threads
+        assert '#0a0b0c' in compiled.additions['_body']
+        assert '#040506' not in compiled.additions['_body']
+
+        compiled = app.styles.compile([styler], snapshot)
+        assert '#010203' in compiled[styler].additions['_body']
+
+        # the overrides do not leak out of the compilation
+        assert styler.config.color_b == '#040506'
+
+        del styler.compile_attributes
+        app.config.color_b.reset()
+
+
+def test_stale_results_are_discarded():
+    with anki_running():
+        app = enabled_night_mode()
+        stylers = app.styles.prepare()
+        received = []
+
+        first = app.compilation.submit(stylers, received.append)
+        # settings changed in the meantime
+        app.config.bump_version()
+        second = app.compilation.submit(stylers, received.append)
+
+        wait_for(lambda: received)
+        finish_compilation(app)
+
+        assert [result.job for result in received] == [second]
+        assert first.version != app.config.version
+
+
+def test_styling_kept_until_ready():
+    with anki_running():
+        from aqt import mw
+        from night_mode.stylers import DeckBrowserStyler
+
+        app = enabled_night_mode()
+        app.refresh()
+        finish_compilation(app)
+
+        styled = mw.deckBrowser._body
+        assert styled != DeckBrowserStyler.instance.original_attributes['_body']
+
+        app.refresh(reload=True)
+        # the styling is not restored before the new one is ready
+        assert mw.deckBrowser._body == styled
+
+        finish_compilation(app)
+        assert mw.deckBrowser._body == styled
+
+
+def test_failed_switch_is_reverted():
+    with anki_running():
+        from importlib import import_module
+
+        # the package exports the add-on object under the name of the module
+        night_mode_module = import_module('night_mode.night_mode')
+        app = enabled_night_mode()
+        app.menu.menu.aboutToShow.emit()
+        alerts = []
+
+        def failing_compile(stylers, snapshot):
+            raise ValueError('broken stylesheet')
+
+        app.styles.compile = failing_compile
+        original_alert = night_mode_module.alert
+        night_mode_module.alert = alerts.append
+        try:
+            app.refresh()
+            finish_compilation(app)
+        finally:
+            night_mode_module.alert = original_alert
+            del app.styles.compile
+
+        assert 'broken stylesheet' in alerts[0]
+        assert not app.config.enable_night_mode.value
+        assert not app.menu.actions['enable_night_mode'].isChecked()
@@ -0,0 +1,84 @@
+from anki_testing import anki_running
+
+from helpers import loaded_addon
+
+
+def test_compress():
+    with anki_running():
+        from night_mode.css_minifier import compress
+
+        minified = compress("""
+        /* comment */
+        a, b > c
+        {
+            color: red;
+            color: 00BBFF;
+            background: #404F5A);
+            color: red;
+            content: "two  spaces";
+            background: url(data:image/png;base64,AAA)
+        }
+        """)
+
+        assert minified.css == 'a,b > c{color:red;content:"two  spaces";background:url(data:image/png;base64,AAA)}'
+        assert [problem.reason for problem in minified.problems] == [
+            'malformed color',
+            'unbalanced parentheses or quotes'
+        ]
+
+        # only the literal colors are checked
+        minified = compress(
+            'a{color: var(--text-fg); background-color: color-mix(in srgb, red 50%, blue); color: rgb(1, 2)}'
+        )
+        assert minified.css == 'a{color:var(--text-fg);background-color:color-mix(in srgb, red 50%, blue)}'
+        assert [problem.reason for problem in minified.problems] == ['malformed color']
+
+        # semicolons and parentheses in quoted strings are a part of the value
+        minified = compress('a::before{content: ";"; color: red} b::after{content: \'(;\'; quotes: "\'" "\'"}')
+        assert minified.css == 'a::before{content:";";color:red}b::after{content:\'(;\';quotes:"\'" "\'"}'
+        assert not minified.problems
+
+
+# maximal sizes (in bytes) of the minified stylesheets injected into web views
+budgets = {
+    'buttons.html': 1100,
+    'deck.style': 1500,
+    'deck.bottom': 1300,
+    'reviewer_styler.bottom_css': 1600,
+    'reviewer_cards.body': 1400,
+    'overview_styler.css': 1500,
+    'anki_web_view_styler.waiting_screen': 1200,
+    'editor_web_view_styler.editor_css': 1600,
+}
+
+
+def test_size_budgets():
+    with anki_running():
+        from night_mode.css_minifier import compress
+        from night_mode.styles import ButtonsStyle, DeckStyle
+        from night_mode.stylers import ReviewerStyler, ReviewerCards, OverviewStyler
+        from night_mode.stylers import AnkiWebViewStyler, EditorWebViewStyler
+
+        # the stylesheets as injected by the add-on, with the default settings
+        app = loaded_addon()
+        deck = DeckStyle(app)
+
+        stylesheets = {
+            'buttons.html': ButtonsStyle(app).html,
+            'deck.style': deck.style,
+            'deck.bottom': deck.bottom,
+            'reviewer_styler.bottom_css': ReviewerStyler.instance.bottom_css,
+            'reviewer_cards.body': ReviewerCards.instance.body,
+            'overview_styler.css': OverviewStyler.instance.css,
+            'anki_web_view_styler.waiting_screen': AnkiWebViewStyler.instance.waiting_screen,
+            'editor_web_view_styler.editor_css': EditorWebViewStyler.instance.editor_css,
+        }
+
+        for name, css in stylesheets.items():
+            minified = compress(css)
+            size = len(minified.css.encode())
+
+            print(f'{name}: {len(css.encode())} B, minified: {size} B')
+
+            assert not minified.problems, name
+            assert size <= budgets[name], name
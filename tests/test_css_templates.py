@@ -0,0 +1,138 @@
+from time import perf_counter
+
+from anki_testing import anki_running
+
+from helpers import benchmark, benchmark_sizes, loaded_addon
+
+
+def test_render():
+    with anki_running():
+        from night_mode.css_templates import Template, css_template
+
+        class Element:
+            color = '#fff'
+            size = 3
+            rule = css_template('a{color: ${color}; width: ${size}px}')
+
+        assert Element().rule == 'a{color: #fff; width: 3px}'
+        assert Element.rule.dependencies == ['color', 'size']
+
+        template = Template('${parent} QPushButton${restrict_to}{${idle}}')
+        assert template.render(Element(), parent='QDialog', restrict_to='#a', idle='') == 'QDialog QPushButton#a{}'
+        assert Template('no slots').render(None) == 'no slots'
+
+
+def test_config_dependencies():
+    with anki_running():
+        from night_mode.styles import DialogStyle, SharedStyles
+        from night_mode.stylers import BrowserStyler
+
+        assert DialogStyle.templates['style'].config_keys == {'color_t'}
+        assert SharedStyles.config_dependencies() == {'color_t', 'color_b', 'color_a'}
+        assert BrowserStyler.config_dependencies() == {'color_t', 'color_b', 'color_a', 'color_s'}
+
+
+def test_advanced_qt_variants_are_cached():
+    with anki_running():
+        from night_mode.styles import ButtonsStyle
+
+        app = loaded_addon()
+        buttons = ButtonsStyle(app)
+
+        fields = buttons.advanced_qt(restrict_to='#fields')
+        hits = buttons.advanced_qt_variants.hits
+
+        assert buttons.advanced_qt(restrict_to='#fields') is fields
+        assert buttons.advanced_qt(restrict_to='#layout') is not fields
+        assert buttons.advanced_qt_variants.hits == hits + 1
+
+        # the singleton is shared by all the styles which require it
+        assert ButtonsStyle(app).advanced_qt(restrict_to='#fields') is fields
+
+
+def concatenated_dialog_style(style):
+    # DialogStyle.style, as it was written before the templates were introduced
+    return """
+            QDialog,QLabel,QListWidget,QFontComboBox,QCheckBox,QSpinBox,QRadioButton,QHBoxLayout
+            {
+            """ + style.shared.colors + """
+            }
+            QFontComboBox::drop-down{border: 0px; border-left: 1px solid #555; width: 30px;}
+            QFontComboBox::down-arrow{width:12px; height:8px;
+                top:1px;
+                image:url('""" + style.app.icons.arrow + """')
+            }
+            QFontComboBox, QSpinBox{border: 1px solid #555}
+
+            QTabWidget QWidget
+            {
+                color:""" + style.config.color_t + """;
+                background-color:#222;
+                border-color:#555
+            }
+            QTabWidget QLabel {
+                position:relative
+            }
+            QTabWidget QTabBar
+            {
+                color:#000
+            }
+            QTabWidget QTextEdit
+            {
+                border-color:#555
+            }
+            QTabWidget QGroupBox::title
+            {
+                subcontrol-origin: margin;
+                subcontrol-position:top left;
+                margin-top:-7px
+            }
+            """ + style.buttons.advanced_qt("QTabWidget")
+
+
+def test_templates_match_concatenation():
+    with anki_running():
+        from night_mode.config import ConfigValueGetter
+        from night_mode.styles import DialogStyle
+
+        style = DialogStyle(loaded_addon())
+        template = DialogStyle.templates['style']
+
+        assert style.style == concatenated_dialog_style(style)
+        parts = template.parts
+
+        # rendered on each access, from the current configuration
+        with ConfigValueGetter.overridden({'color_t': '#eeeeee'}):
+            assert style.style == concatenated_dialog_style(style)
+            assert 'color:#eeeeee;' in style.style
+
+        # but split into parts only once
+        assert template.parts is parts
+
+
+@benchmark('NIGHT_MODE_TEMPLATE_RENDERS')
+def test_template_rendering_time():
+    """Compare rendering of the dialog style from the template and by concatenation.
+
+    Runs only when the numbers of renders are given with NIGHT_MODE_TEMPLATE_RENDERS (e.g. "20000");
+    the timings are reported, not asserted.
+    """
+    with anki_running():
+        from night_mode.styles import DialogStyle
+
+        style = DialogStyle(loaded_addon())
+
+        def measure(generate, repeats):
+            start = perf_counter()
+            for i in range(repeats):
+                generate(style)
+            return perf_counter() - start
+
+        for repeats in benchmark_sizes('NIGHT_MODE_TEMPLATE_RENDERS'):
+            concatenation_time = measure(concatenated_dialog_style, repeats)
+            template_time = measure(lambda style: style.style, repeats)
+
+            print(
+                f'{repeats} renders, concatenation: {concatenation_time * 1000:.0f} ms, '
+                f'template: {template_time * 1000:.0f} ms'
+            )
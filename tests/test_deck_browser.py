@@ -0,0 +1,119 @@
+"""
+Benchmark of the deck browser in night mode on synthetic deck trees of increasing size.
+
+Runs only when the sizes are given with NIGHT_MODE_DECK_COUNTS (e.g. "500,2000,5000");
+the timings are reported (use pytest -s to see them), not asserted.
+"""
+import os
+
+from anki_testing import anki_running
+
+from helpers import benchmark, benchmark_sizes, loaded_addon, wait_for
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+deck_counts = benchmark_sizes('NIGHT_MODE_DECK_COUNTS')
+
+
+def deck_row(did, depth, current=False, filtered=False):
+    """Mimics the markup of DeckBrowser._deckRow"""
+    indent = '&nbsp;' * 6 * depth
+    return (
+        f"<tr class='deck{' current' if current else ''}' id='{did}'>"
+        f"<td class=decktd colspan=5>{indent}<a class=collapse href=#>-</a>"
+        f"<a class=\"deck{' filtered' if filtered else ''}\" href=#>Deck {did}</a></td>"
+        f"<td align=right><font color='#007700'>{did % 50}</font></td>"
+        f"<td align=right><font color='#000099'>{did % 20}</font></td>"
+        f"<td align=center class=opts><a><img src='gears.svg' class=gears></a></td>"
+        f"</tr>"
+    )
+
+
+def deck_tree(count):
+    return ''.join(
+        deck_row(did, depth=did % 4, current=did == 1, filtered=did % 10 == 0)
+        for did in range(1, count + 1)
+    )
+
+
+# re-applies the stylesheets to the whole document, as happens when toggling the night mode
+measure_script = """
+(function(){
+    var sheets = Array.prototype.map.call(document.querySelectorAll('style'), function(style){
+        return style.sheet
+    });
+    function force_layout(){ return document.body.offsetHeight }
+
+    sheets.forEach(function(sheet){ sheet.disabled = true });
+    force_layout();
+
+    var start = performance.now();
+    sheets.forEach(function(sheet){ sheet.disabled = false });
+    force_layout();
+    var recalc_and_layout = performance.now() - start;
+
+    window.night_mode_benchmark = null;
+    requestAnimationFrame(function(){
+        var frame_start = performance.now();
+        requestAnimationFrame(function(){
+            window.night_mode_benchmark = [recalc_and_layout, performance.now() - frame_start];
+        })
+    })
+})()
+"""
+
+
+def run_javascript(web, script):
+    result = []
+    web.page().runJavaScript(script, result.append)
+    wait_for(lambda: result, timeout=30)
+    return result[0]
+
+
+def measure(web, html, repeats=5):
+    """Returns the lowest times (in milliseconds) of (style recalculation and layout, painting of a frame)"""
+    loaded = []
+    web.loadFinished.connect(loaded.append)
+    web.setHtml(html)
+    wait_for(lambda: loaded, timeout=30)
+    web.loadFinished.disconnect(loaded.append)
+
+    results = []
+    for i in range(repeats):
+        run_javascript(web, measure_script)
+        wait_for(lambda: run_javascript(web, 'window.night_mode_benchmark'), timeout=30)
+        results.append(run_javascript(web, 'window.night_mode_benchmark'))
+
+    return min(result[0] for result in results), min(result[1] for result in results)
+
+
+@benchmark('NIGHT_MODE_DECK_COUNTS')
+def test_deck_browser_scaling():
+    with anki_running():
+        from PyQt5.QtWebEngineWidgets import QWebEngineView
+        from night_mode.stylers import DeckBrowserStyler
+
+        loaded_addon()
+        styler = DeckBrowserStyler.instance
+        night_styles = styler.additions['_body'].value(styler)
+
+        web = QWebEngineView()
+        web.resize(800, 600)
+        web.show()
+
+        per_row = []
+
+        for count in deck_counts:
+            # DeckBrowser._body is %-formatted, hence percent_escaped styles
+            html = ('<html><body><center><table>%(tree)s</table></center>' + night_styles + '</body></html>') % {
+                'tree': deck_tree(count)
+            }
+            recalc_and_layout, paint = measure(web, html)
+            per_row.append(recalc_and_layout / count)
+
+            print(
+                f'{count} decks: style recalculation and layout {recalc_and_layout:.1f} ms '
+                f'({per_row[-1] * 1000:.2f} µs per row), frame {paint:.1f} ms'
+            )
+
+        web.close()
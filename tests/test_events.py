@@ -0,0 +1,97 @@
+from anki_testing import anki_running
+
+
+def snapshot(state_on=False, color_t='#ffffff', disabled_stylers=()):
+    return {
+        'state_on': state_on,
+        'color_t': color_t,
+        'color_b': '#272828',
+        'color_s': '#373838',
+        'color_a': '#443477',
+        'user_color_map': {'#000000': 'white'},
+        'disabled_stylers': set(disabled_stylers)
+    }
+
+
+def test_coalesced_events():
+    with anki_running():
+        from night_mode.events import EventBus
+
+        class Subscriber:
+
+            def __init__(self):
+                self.received = []
+
+            def receive(self, event):
+                self.received.append(event)
+
+        bus = EventBus()
+        subscriber = Subscriber()
+
+        for name in bus.names:
+            bus.subscribe(name, subscriber.receive)
+
+        bus.publish_changes(snapshot())
+        assert subscriber.received == []
+
+        # many changes between two refreshes result in one event of each kind
+        bus.publish_changes(snapshot(state_on=True, color_t='#eeeeee', disabled_stylers={'editor_styler'}))
+        assert [event.name for event in subscriber.received] == ['enabled', 'colors_changed', 'styler_toggled']
+        assert subscriber.received[1].details == {'settings': {'color_t'}}
+        assert subscriber.received[2].details == {'stylers': {'editor_styler'}}
+        assert subscriber.received[0].snapshot['color_t'] == '#eeeeee'
+
+        subscriber.received.clear()
+        bus.publish_changes(snapshot(state_on=True, color_t='#eeeeee', disabled_stylers={'editor_styler'}))
+        assert subscriber.received == []
+
+
+def test_subscribers_are_weak():
+    with anki_running():
+        import gc
+        from night_mode.events import EventBus
+
+        bus = EventBus()
+        received = []
+
+        def on_disabled(event):
+            received.append(event)
+
+        bus.subscribe('disabled', on_disabled)
+        bus.publish_changes(snapshot(state_on=True))
+        bus.publish_changes(snapshot(state_on=False))
+        assert len(received) == 1
+
+        del on_disabled
+        gc.collect()
+
+        bus.publish_changes(snapshot(state_on=True))
+        bus.publish_changes(snapshot(state_on=False))
+        assert len(received) == 1
+        assert bus.subscribers['disabled'] == []
+
+
+def test_builtin_subscribers():
+    with anki_running():
+        from night_mode.events import EventBus
+
+        bus = EventBus()
+        received = []
+
+        bus.subscribe('enabled', received.append)
+        bus.subscribe('enabled', len)
+        bus.publish_changes(snapshot(state_on=True))
+        assert [event.name for event in received] == ['enabled']
+
+        bus.unsubscribe('enabled', received.append)
+        bus.unsubscribe('enabled', len)
+        assert bus.subscribers['enabled'] == []
+
+
+def test_unknown_event():
+    with anki_running():
+        from pytest import raises
+        from night_mode.events import EventBus
+
+        with raises(ValueError):
+            EventBus().subscribe('colours_changed', print)
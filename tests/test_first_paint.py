@@ -0,0 +1,125 @@
+import os
+from time import perf_counter
+
+from anki_testing import anki_running
+
+from helpers import benchmark, benchmark_sizes
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+def dark_page(paragraphs):
+    """A page which would be dark only after the whole document is parsed"""
+    return (
+        '<html><body>'
+        + '<p>Some card content</p>' * paragraphs
+        + '<style>body{background-color: #272828; color: #ffffff}</style>'
+        + '</body></html>'
+    )
+
+
+page = dark_page(5000)
+
+
+def time_to_first_dark_frame(web, html, timeout=10):
+    from PyQt5.QtWidgets import QApplication
+
+    start = perf_counter()
+    web.setHtml(html)
+
+    while perf_counter() - start < timeout:
+        QApplication.processEvents()
+        # render to a pixmap, as offscreen windows are never exposed
+        image = web.grab().toImage()
+        if image.pixelColor(image.width() // 2, image.height() // 2).lightness() < 128:
+            return perf_counter() - start
+
+    return timeout
+
+
+def test_first_paint_background():
+    with anki_running():
+        from PyQt5.QtGui import QColor
+        from aqt.webview import AnkiWebView
+        from night_mode import night_mode as app
+
+        registry = app.web_views
+        dark = QColor('#272828')
+
+        web = AnkiWebView()
+        original = web.page().backgroundColor()
+
+        # the roles of the web views which are styled by the active stylers only
+        registry.set_first_paint('#272828', roles={'editor'})
+        web.setHtml(page)
+        assert web.page().backgroundColor() == original
+
+        registry.set_first_paint('#272828', roles={'other'})
+        assert web.page().backgroundColor() == dark
+
+        # web views created later get it before loading anything
+        later = AnkiWebView()
+        later.setHtml(page)
+        assert later.page().backgroundColor() == dark
+
+        # nothing is injected into the documents
+        for view in [web, later]:
+            assert not any('#272828' in script.sourceCode() for script in view.page().scripts().toList())
+
+        registry.set_first_paint()
+        for view in [web, later]:
+            assert view.page().backgroundColor() == original
+
+
+def test_first_paint_roles():
+    with anki_running():
+        from night_mode import night_mode as app
+
+        app.config.disabled_stylers.value = {'reviewer_cards'}
+        try:
+            assert 'main' not in app.first_paint_roles
+            assert {'toolbar', 'editor'} <= app.first_paint_roles
+
+            app.config.enable_in_dialogs.value = False
+            assert 'editor' not in app.first_paint_roles
+            assert 'toolbar' in app.first_paint_roles
+        finally:
+            app.config.disabled_stylers.reset()
+            app.config.enable_in_dialogs.reset()
+
+
+@benchmark('NIGHT_MODE_FIRST_PAINT_PARAGRAPHS')
+def test_time_to_first_dark_frame():
+    """Compare the time to the first dark frame of web views with and without the first paint background.
+
+    Runs only when the sizes of the pages (in paragraphs) are given with NIGHT_MODE_FIRST_PAINT_PARAGRAPHS
+    (e.g. "1000,5000"); the timings are reported, not asserted.
+    """
+    with anki_running():
+        from aqt.webview import AnkiWebView
+        from night_mode import night_mode as app
+
+        registry = app.web_views
+
+        def create_web_view():
+            web = AnkiWebView()
+            web.resize(800, 600)
+            web.show()
+            return web
+
+        try:
+            for paragraphs in benchmark_sizes('NIGHT_MODE_FIRST_PAINT_PARAGRAPHS'):
+                html = dark_page(paragraphs)
+
+                registry.set_first_paint()
+                default_time = time_to_first_dark_frame(create_web_view(), html)
+
+                registry.set_first_paint('#272828', roles={'other'})
+                first_paint_time = time_to_first_dark_frame(create_web_view(), html)
+
+                print(
+                    f'{paragraphs} paragraphs, first dark frame after: {default_time * 1000:.0f} ms (default), '
+                    f'{first_paint_time * 1000:.0f} ms (first paint background)'
+                )
+        finally:
+            registry.set_first_paint()
@@ -0,0 +1,23 @@
+from anki_testing import anki_running
+
+
+def test_inverted_svg():
+    with anki_running():
+        from xml.etree import ElementTree
+        from night_mode.icons import inverted_svg
+
+        svg = (
+            '<?xml version="1.0"?>\n'
+            '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16"><path d="M0 0h16v16z"/></svg>'
+        )
+        inverted = inverted_svg(svg)
+
+        root = ElementTree.fromstring(inverted)
+        namespace = '{http://www.w3.org/2000/svg}'
+        group = root.find(namespace + 'g')
+
+        # the whole image is drawn through the filter
+        assert group.get('filter') == 'url(#night-mode-invert)'
+        assert [child.tag for child in group] == [namespace + 'path']
+        assert root.find(f'{namespace}defs/{namespace}filter').get('id') == 'night-mode-invert'
+        assert inverted.startswith('<?xml version="1.0"?>\n<svg ')
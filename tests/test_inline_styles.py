@@ -0,0 +1,105 @@
+import re
+from time import perf_counter
+
+from anki_testing import anki_running
+
+from helpers import FakeApp, benchmark, benchmark_sizes
+
+
+# HTML of cards as produced by copying content from websites and word processors
+cards_corpus = [
+    '<div style="color: rgb(0, 0, 0); font-family: Arial, sans-serif; font-size: 14px;">'
+    '<span style="background-color: rgb(255, 255, 255);">Mitochondria</span> '
+    'is the <b style="color: rgb(34, 34, 34);">powerhouse</b> of the cell</div>',
+
+    '<p style="margin: 0px 0px 1em; color: rgb(32, 33, 34); font-family: sans-serif;">'
+    'The <a href="/wiki/Krebs_cycle" style="text-decoration: none; color: rgb(6, 69, 173); '
+    'background: none;">citric acid cycle</a> releases stored energy</p>',
+
+    '<table style="border-collapse: collapse; background: #ffffff url(paper.png) repeat;">'
+    '<tr><td style="border-color: #cccccc; color: #333;">der Hund</td>'
+    '<td style="color:#00F">the dog</td></tr></table>',
+
+    '<span style="font-weight: bold; color: red;">Warning:</span> '
+    '<span style="background-color: yellow;">never</span> mix these two',
+
+    '<div>plain card without any inline styles, '
+    'just <i>some</i> <b>formatting</b> and an <img src="picture.jpg"></div>',
+]
+
+
+def test_rewrite():
+    with anki_running():
+        from night_mode.inline_styles import InlineStyles
+        from night_mode.note_types import NoteTypePalettes
+
+        app = FakeApp(user_color_map={'#000000': 'white'})
+        inline_styles = InlineStyles(app, NoteTypePalettes(app))
+
+        html = inline_styles.rewrite(
+            '<span style="color: rgb(0, 0, 0); font-size: 14px">a</span>'
+            '<p data-style="color: red" style="background-color: white">b</p>'
+        )
+        assert html == (
+            '<span style="color: #ffffff; font-size: 14px">a</span>'
+            '<p data-style="color: red" style="background-color: #272828">b</p>'
+        )
+
+
+def test_rewrite_corpus():
+    with anki_running():
+        from night_mode.colors import parse_color, lightness
+        from night_mode.inline_styles import InlineStyles
+        from night_mode.note_types import NoteTypePalettes
+
+        app = FakeApp(user_color_map={'#000000': 'white'})
+        inline_styles = InlineStyles(app, NoteTypePalettes(app))
+
+        def without_styles(html):
+            return re.sub(r'style="[^"]*"', '', html)
+
+        for html in cards_corpus:
+            rewritten = inline_styles.rewrite(html)
+
+            # only the style attributes are modified
+            assert without_styles(rewritten) == without_styles(html)
+
+            for name, value in re.findall(r'(?<![\w-])(color|background-color):\s*([^;"]+)', rewritten):
+                color = parse_color(value)
+                # light text on dark background
+                assert lightness(color) > 127 if name == 'color' else lightness(color) < 128, (name, value)
+
+        assert inline_styles.rewrite(cards_corpus[-1]) == cards_corpus[-1]
+
+        # the image of the background is kept, only its color is overridden
+        table = inline_styles.rewrite(cards_corpus[2])
+        assert 'background: #ffffff url(paper.png) repeat;background-color: #272828' in table
+
+
+@benchmark('NIGHT_MODE_INLINE_STYLES_CARDS')
+def test_rewrite_throughput():
+    """Measure the throughput of rewriting of the inline styles on the corpus.
+
+    Runs only when the numbers of cards are given with NIGHT_MODE_INLINE_STYLES_CARDS (e.g. "1000,10000");
+    the throughput is reported, not asserted.
+    """
+    with anki_running():
+        from night_mode.inline_styles import InlineStyles
+        from night_mode.note_types import NoteTypePalettes
+
+        app = FakeApp(user_color_map={'#000000': 'white'})
+        inline_styles = InlineStyles(app, NoteTypePalettes(app))
+
+        for count in benchmark_sizes('NIGHT_MODE_INLINE_STYLES_CARDS'):
+            corpus = [cards_corpus[i % len(cards_corpus)] for i in range(count)]
+            size = sum(len(html) for html in corpus)
+
+            start = perf_counter()
+            for html in corpus:
+                inline_styles.rewrite(html)
+            elapsed = perf_counter() - start
+
+            print(
+                f'Rewrote {count} cards ({size / 1024:.0f} KiB) in {elapsed * 1000:.1f} ms, '
+                f'throughput: {size / 1024 / 1024 / elapsed:.1f} MiB/s'
+            )
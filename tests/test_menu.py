@@ -0,0 +1,67 @@
+from anki_testing import anki_running
+
+
+def test_lazy_menu():
+    with anki_running():
+        from aqt import mw
+        from night_mode.internals import Setting, MenuAction
+        from night_mode.menu import Menu
+
+        class InvertEverything(Setting, MenuAction):
+            value = False
+            label = 'Invert everything'
+            checkable = True
+
+            def action(self):
+                self.value = not self.value
+
+        class ToggleEverything(Setting, MenuAction):
+            value = False
+            label = 'Toggle everything'
+            checkable = True
+            shortcut = 'Ctrl+Shift+F12'
+
+            def action(self):
+                self.value = not self.value
+
+        menu = Menu(None, 'Test', [InvertEverything, '-', ToggleEverything])
+
+        try:
+            # only the actions with shortcuts are created before the menu is shown
+            assert 'invert_everything' not in menu.actions
+            assert menu.actions['toggle_everything'] in mw.actions()
+
+            menu.menu.aboutToShow.emit()
+            menu.menu.aboutToShow.emit()
+
+            assert len(menu.menu.actions()) == 3
+            assert not menu.actions['invert_everything'].isChecked()
+
+            # changes of settings are reflected by their actions
+            InvertEverything.instance.value = True
+            assert menu.actions['invert_everything'].isChecked()
+
+            menu.actions['toggle_everything'].trigger()
+            assert ToggleEverything.instance.value
+            assert menu.actions['toggle_everything'].isChecked()
+        finally:
+            mw.removeAction(menu.actions['toggle_everything'])
+            for name in ['invert_everything', 'toggle_everything']:
+                menu.actions.pop(name, None)
+            Setting.members -= {InvertEverything, ToggleEverything}
+
+
+def test_mode_settings_check_mark():
+    with anki_running():
+        from night_mode import night_mode as app
+
+        menu = app.menu
+        menu.menu.aboutToShow.emit()
+        action = menu.actions['mode_settings']
+        mode_settings = app.config.mode_settings
+
+        assert mode_settings.mode == 'manual'
+        # opening the settings window does not change the mode
+        action.trigger()
+        assert not action.isChecked()
+        mode_settings.window.close()
@@ -0,0 +1,28 @@
+import os
+
+from anki_testing import anki_running
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+def test_palette_change_watcher():
+    with anki_running():
+        from PyQt5.QtGui import QColor, QPalette
+        from PyQt5.QtWidgets import QApplication, QWidget
+        from night_mode.mode import PaletteChangeWatcher
+
+        def window_lightness():
+            return QApplication.palette().color(QPalette.Window).lightness()
+
+        widget = QWidget()
+        observed = []
+        PaletteChangeWatcher(widget, lambda: observed.append(window_lightness()))
+
+        original = QApplication.palette()
+        try:
+            QApplication.setPalette(QPalette(QColor('#202020')))
+            assert observed and observed[-1] < 128
+        finally:
+            QApplication.setPalette(original)
+
+        assert observed[-1] == window_lightness()
@@ -0,0 +1,47 @@
+from anki_testing import anki_running
+
+from helpers import FakeApp
+
+
+def test_derive():
+    with anki_running():
+        from night_mode.note_types import NoteTypePalettes
+
+        app = FakeApp()
+        palettes = NoteTypePalettes(app)
+
+        css = palettes.derive('.card {font-size: 20px; color: black; background: white} .hint {color: #000099}')
+
+        assert css == (
+            '.card{color:#ffffff!important;background-color:#272828!important}'
+            '.hint{color:#8080ff!important}'
+        )
+
+        # rules for the night mode are already dark
+        css = palettes.derive('.night_mode .card {background: black} .nightMode .hint, .hint {color: #000099}')
+        assert css == '.hint{color:#8080ff!important}'
+
+        app.config.color_b.value = 'not a color'
+        assert palettes.derive('.card {color: black}') == ''
+
+
+def test_stylesheets_are_cached():
+    with anki_running():
+        from night_mode.note_types import NoteTypePalettes
+
+        app = FakeApp()
+        palettes = NoteTypePalettes(app)
+        model = {'id': 1, 'mod': 100, 'css': '.card {color: black}'}
+
+        css = palettes.stylesheet(model)
+        assert css == '.card{color:#ffffff!important}'
+
+        # refreshes of the add-on do not invalidate the stylesheets
+        app.config.version += 1
+        assert palettes.stylesheet(model) is css
+
+        app.config.color_t.value = '#eeeeee'
+        assert palettes.stylesheet(model) == '.card{color:#eeeeee!important}'
+
+        model['css'], model['mod'] = '.card {background: white}', 101
+        assert palettes.stylesheet(model) == '.card{background-color:#272828!important}'
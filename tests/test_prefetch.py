@@ -0,0 +1,127 @@
+import os
+
+from anki_testing import anki_running
+
+from helpers import enabled_night_mode, wait_for
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+def add_card(model_name, **fields):
+    from anki.notes import Note
+    from aqt import mw
+
+    note = Note(mw.col, mw.col.models.byName(model_name))
+    for name, value in fields.items():
+        note[name] = value
+    mw.col.addNote(note)
+    return note.cards()[0]
+
+
+def test_statistics():
+    with anki_running():
+        from night_mode.prefetch import CardPrefetcher, PrefetchStatistics, TransformedCard
+
+        prefetcher = CardPrefetcher(enabled_night_mode())
+
+        prefetcher.record(TransformedCard('q', 'Q', 0.5, True))
+        prefetcher.record(TransformedCard('q', 'Q', 0.1, False), memoized=True)
+        prefetcher.record(TransformedCard('a', 'A', 0.1, False))
+
+        statistics = prefetcher.statistics
+        assert (statistics.hits, statistics.misses, statistics.memoized) == (1, 1, 1)
+        # the cards served from memoized results do not count
+        assert statistics.hit_rate == 0.5
+        assert statistics.saved_seconds == 0.5
+
+        assert PrefetchStatistics().hit_rate == 0
+
+
+def test_upcoming_cards_are_prefetched():
+    with anki_running():
+        from aqt import mw
+
+        app = enabled_night_mode()
+        prefetcher = app.prefetcher
+        statistics = prefetcher.statistics
+
+        basic = add_card('Basic', Front='<span style="color: black">Front</span>', Back='Back')
+        typed = add_card('Basic (type in the answer)', Front='Capital of France?', Back='Paris')
+
+        reviewer = mw.reviewer
+        reviewer_state = {name: getattr(reviewer, name, None) for name in prefetcher.type_answer_state}
+
+        prefetcher.upcoming_card_ids = lambda: [basic.id, typed.id]
+        prefetcher.schedule()
+        # the cards are rendered one side at a time, in between of other events
+        assert prefetcher.pending is None
+        wait_for(lambda: prefetcher.pending is not None and not prefetcher.pending)
+        prefetcher.executor.submit(lambda: None).result()
+        del prefetcher.upcoming_card_ids
+
+        # the current card of the reviewer is not affected
+        assert {name: getattr(reviewer, name, None) for name in prefetcher.type_answer_state} == reviewer_state
+
+        def prefetched(card, context):
+            return app.transformed_cards.get(app.card_key(card, context))
+
+        assert prefetched(basic, 'reviewQuestion').prefetched
+        assert prefetched(basic, 'reviewAnswer').prefetched
+        assert prefetched(typed, 'reviewQuestion').prefetched
+        # answers with the type answer field depend on what the user will type in
+        assert prefetched(typed, 'reviewAnswer') is None
+
+        # the HTML is the same as the one which the reviewer passes to the prepareQA hook
+        state = reviewer.state
+        reviewer.card, reviewer.state = typed, 'question'
+        try:
+            html = reviewer._mungeQA(typed.q())
+        finally:
+            reviewer.state = state
+            for name, value in reviewer_state.items():
+                setattr(reviewer, name, value)
+        assert 'typeans' in html
+
+        hits = statistics.hits
+        transformed = app.card_transformation(html, typed, 'reviewQuestion')
+        assert transformed == prefetched(typed, 'reviewQuestion').transformed
+        assert statistics.hits == hits + 1
+
+        # shown once again (e.g. after undo)
+        memoized, misses = statistics.memoized, statistics.misses
+        assert app.card_transformation(html, typed, 'reviewQuestion') == transformed
+        assert statistics.memoized == memoized + 1
+        assert statistics.misses == misses
+
+
+def test_stop():
+    with anki_running():
+        app = enabled_night_mode()
+        prefetcher = app.prefetcher
+
+        card = add_card('Basic', Front='Front', Back='Back')
+        prefetcher.prefetch(card.id, 'reviewQuestion')
+        assert prefetcher.executor
+
+        prefetcher.stop()
+        assert prefetcher.executor is None
+        # the worker finishes the transformations before the profile is closed
+        assert app.transformed_cards.get(app.card_key(card, 'reviewQuestion')).prefetched
+
+
+def test_card_keys():
+    with anki_running():
+        from night_mode.config import ConfigValueGetter
+
+        app = enabled_night_mode()
+        card = add_card('Basic', Front='Front', Back='Back')
+        key = app.card_key(card, 'reviewQuestion')
+
+        # the transformations stay valid across refreshes which do not change the settings
+        app.refresh()
+        assert app.card_key(card, 'reviewQuestion') == key
+
+        with ConfigValueGetter.overridden({'color_b': '#000000'}):
+            assert app.card_key(card, 'reviewQuestion') != key
+        with ConfigValueGetter.overridden({'card_profiles': [{'decks': [1], 'settings': {'invert_image': False}}]}):
+            assert app.card_key(card, 'reviewQuestion') != key
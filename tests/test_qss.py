@@ -0,0 +1,139 @@
+import os
+
+from anki_testing import anki_running
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+menu_style = """
+QMenuBar, QMenu
+{
+    background-color: #444;
+    color: #eee
+}
+QMenuBar::item:selected
+{
+    background-color: #443477
+}
+"""
+
+
+def test_scope_style_sheet():
+    with anki_running():
+        from night_mode.qss import scope_style_sheet
+
+        scoped = scope_style_sheet(
+            menu_style + 'QWidget, QMenu{color: red}',
+            scopes={'QMenuBar': 'menu bar', 'QMenu': 'menu bar'},
+            default='window'
+        )
+        assert scoped == {
+            'menu bar': 'QMenuBar, QMenu{background-color: #444;\n    color: #eee}'
+                        'QMenuBar::item:selected{background-color: #443477}',
+            'window': 'QWidget, QMenu{color: red}'
+        }
+
+
+def test_scoped_style_setter_repolishes_less():
+    with anki_running():
+        from PyQt5.QtCore import QObject, QEvent
+        from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QVBoxLayout, QWidget
+        from night_mode.qss import ScopedStyleSetter
+
+        class StyleChangeCounter(QObject):
+            count = 0
+
+            def eventFilter(self, obj, event):
+                if event.type() == QEvent.StyleChange:
+                    self.count += 1
+                return False
+
+        def create_window():
+            window = QMainWindow()
+            window.menuBar().addMenu('View')
+            central = QWidget()
+            layout = QVBoxLayout(central)
+            for i in range(500):
+                layout.addWidget(QLabel(f'Label {i}'))
+            window.setCentralWidget(central)
+            window.show()
+            return window
+
+        def count_style_changes(apply):
+            counter = StyleChangeCounter()
+            QApplication.instance().installEventFilter(counter)
+            apply()
+            QApplication.processEvents()
+            QApplication.instance().removeEventFilter(counter)
+            return counter.count
+
+        window = create_window()
+        global_count = count_style_changes(lambda: window.setStyleSheet(menu_style))
+
+        window = create_window()
+        setter = ScopedStyleSetter(
+            default=window,
+            scopes={'QMenuBar': window.menuBar(), 'QMenu': window.menuBar()}
+        )
+        scoped_count = count_style_changes(lambda: setattr(setter, 'css', menu_style))
+
+        assert scoped_count < global_count / 10
+
+
+def test_popups_get_scoped_rules():
+    with anki_running():
+        from PyQt5.QtWidgets import QMainWindow, QMenu
+        from night_mode.qss import ScopedStyleSetter
+
+        window = QMainWindow()
+        menu_bar = window.menuBar()
+        attached = menu_bar.addMenu('View')
+        existing = QMenu(window)
+
+        setter = ScopedStyleSetter(
+            default=window,
+            scopes={'QMenuBar': menu_bar, 'QMenu': menu_bar},
+            popups={'QMenu': window}
+        )
+        setter.css = menu_style
+
+        # opened after the style sheet was set, like context menus
+        created_later = QMenu(window)
+        created_later.ensurePolished()
+
+        assert menu_bar.styleSheet()
+        assert existing.styleSheet() == menu_bar.styleSheet()
+        assert created_later.styleSheet() == menu_bar.styleSheet()
+        # these inherit the rules from their parents
+        assert attached.styleSheet() == ''
+        assert window.styleSheet() == ''
+
+        setter.css = ''
+        assert existing.styleSheet() == created_later.styleSheet() == ''
+
+        created_after_restore = QMenu(window)
+        created_after_restore.ensurePolished()
+        assert created_after_restore.styleSheet() == ''
+
+
+def test_style_sheet_applicator_skips_no_op_updates():
+    with anki_running():
+        from PyQt5.QtWidgets import QLabel
+        from night_mode.qss import StyleSheetApplicator
+
+        applicator = StyleSheetApplicator()
+        label = QLabel()
+
+        with applicator.batch(label):
+            assert applicator.apply(label, menu_style)
+            assert not applicator.apply(label, menu_style)
+            assert not label.updatesEnabled()
+
+        assert label.updatesEnabled()
+
+        # changed by someone else in the meantime
+        label.setStyleSheet('')
+        assert applicator.apply(label, menu_style)
+
+        assert applicator.applied == 2
+        assert applicator.avoided == 1
@@ -0,0 +1,125 @@
+import os
+from time import perf_counter
+
+from anki_testing import anki_running
+
+from helpers import benchmark, benchmark_sizes
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+def test_night_palette():
+    with anki_running():
+        from PyQt5.QtGui import QColor, QPalette
+        from PyQt5.QtWidgets import QTableView
+        from night_mode.qt_palette import night_palette
+
+        colors = ['#ffffff', '#272828', '#373838', '#443477']
+        text, background, auxiliary, active = map(QColor, colors)
+
+        palette = night_palette(*colors)
+        # created once per combination of colors
+        assert night_palette(*colors) is palette
+
+        # the same colors as in BrowserStyler.table
+        table = QTableView()
+        table.setPalette(palette)
+        applied = table.palette()
+
+        expected = {
+            QPalette.Text: text,
+            QPalette.WindowText: text,
+            QPalette.HighlightedText: text,
+            QPalette.Base: background,
+            QPalette.Window: background,
+            QPalette.AlternateBase: auxiliary,
+            QPalette.Highlight: active,
+        }
+        for role, color in expected.items():
+            assert applied.color(QPalette.Active, role) == color, role
+            assert applied.color(QPalette.Inactive, role) == color, role
+
+        # disabled text is dimmed, but still light on the dark background
+        disabled = applied.color(QPalette.Disabled, QPalette.Text)
+        assert background.lightness() < disabled.lightness() < text.lightness()
+
+        # no style sheet is involved
+        assert table.styleSheet() == ''
+
+
+def scroll_and_paint(table, steps=200):
+    scroll_bar = table.verticalScrollBar()
+    start = perf_counter()
+    for step in range(steps):
+        scroll_bar.setValue(scroll_bar.maximum() * step // steps)
+        # render to a pixmap, as offscreen windows are never exposed
+        table.viewport().grab()
+    return perf_counter() - start
+
+
+@benchmark('NIGHT_MODE_PALETTE_ROWS')
+def test_palette_and_style_sheet_painting():
+    """Compare scrolling (and painting) of a table styled with the night palette and with a style sheet.
+
+    Runs only when the numbers of rows are given with NIGHT_MODE_PALETTE_ROWS (e.g. "10000,100000");
+    the timings are reported, not asserted.
+    """
+    with anki_running():
+        from PyQt5.QtCore import QAbstractTableModel, Qt
+        from PyQt5.QtWidgets import QTableView
+        from night_mode.qt_palette import night_palette
+
+        class Model(QAbstractTableModel):
+
+            def __init__(self, rows):
+                super().__init__()
+                self.rows = rows
+
+            def rowCount(self, parent=None):
+                return self.rows
+
+            def columnCount(self, parent=None):
+                return 5
+
+            def data(self, index, role=Qt.DisplayRole):
+                if role == Qt.DisplayRole:
+                    return f'Card {index.row()}, column {index.column()}'
+
+        def create_table(rows):
+            table = QTableView()
+            table.setModel(Model(rows))
+            table.setAlternatingRowColors(True)
+            table.resize(800, 600)
+            table.show()
+            return table
+
+        colors = ['#ffffff', '#272828', '#373838', '#443477']
+
+        # as in BrowserStyler.table
+        style_sheet = """
+        QTableView
+        {
+            selection-color: #ffffff;
+            alternate-background-color: #373838;
+            gridline-color: #373838;
+            color: #ffffff;
+            background-color: #272828;
+            selection-background-color: #443477
+        }
+        """
+
+        for rows in benchmark_sizes('NIGHT_MODE_PALETTE_ROWS'):
+            style_sheet_table = create_table(rows)
+            style_sheet_table.setStyleSheet(style_sheet)
+            style_sheet_time = scroll_and_paint(style_sheet_table)
+            style_sheet_table.close()
+
+            palette_table = create_table(rows)
+            palette_table.setPalette(night_palette(*colors))
+            palette_time = scroll_and_paint(palette_table)
+            palette_table.close()
+
+            print(
+                f'{rows} rows: {style_sheet_time * 1000:.0f} ms with the style sheet, '
+                f'{palette_time * 1000:.0f} ms with the palette ({palette_time / style_sheet_time:.2f}x)'
+            )
@@ -0,0 +1,56 @@
+from anki_testing import anki_running
+
+
+# expensive selectors which were considered and accepted, as: (styler name, attribute name, selector)
+accepted_expensive_selectors = {
+    # the card info is a small document; links and tables have to get the colors too
+    ('browser_styler', 'card_info', '*'),
+}
+
+
+def test_selector_cost():
+    with anki_running():
+        from night_mode.selector_cost import selector_cost, expensive_threshold
+
+        assert selector_cost('tr.deck > td').score == 0
+        assert selector_cost('.field img').reasons == ['descendant depth 1']
+        assert selector_cost('font[color="#007700"]').score <= expensive_threshold
+        assert selector_cost('::-webkit-scrollbar').score == 0
+
+        for selector in ['*', 'div *', '[color]', ':hover']:
+            assert selector_cost(selector).score > expensive_threshold, selector
+
+
+def test_rewrites():
+    with anki_running():
+        from night_mode.css_minifier import compress
+
+        assert compress('*.a > *[b], *:hover{color:#fff}').css == '.a > [b],:hover{color:#fff}'
+        assert compress('*.a, .a{color:#fff}').css == '.a{color:#fff}'
+        # not equivalent when applied to body only (links would keep their colors)
+        assert compress('*{color:#fff;background-color:#000}').css == '*{color:#fff;background-color:#000}'
+
+
+def test_suggestions():
+    with anki_running():
+        from night_mode.selector_cost import stylesheet_costs
+
+        colors, margins = stylesheet_costs('*{color:#fff}*{margin:0}')
+        assert 'consider body' in colors.reasons[-1]
+        assert not any('consider' in reason for reason in margins.reasons)
+
+
+def test_no_new_expensive_selectors():
+    with anki_running():
+        from night_mode import night_mode as app
+        from night_mode.selector_cost import expensive_selectors, report
+
+        print(report(app.styles.stylers))
+
+        found = {
+            (styler_name, key, cost.selector)
+            for (styler_name, key), costs in expensive_selectors(app.styles.stylers).items()
+            for cost in costs
+        }
+
+        assert found <= accepted_expensive_selectors, found - accepted_expensive_selectors
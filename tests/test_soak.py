@@ -0,0 +1,143 @@
+"""
+Soak tests: repeat toggling and opening of dialogs many times, checking that nothing keeps growing.
+
+The number of repetitions can be lowered with NIGHT_MODE_SOAK_SCALE (e.g. 0.01).
+"""
+import os
+import tracemalloc
+
+from anki_testing import anki_running
+
+from helpers import enabled_night_mode, settle, switch_night_mode
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+scale = float(os.environ.get('NIGHT_MODE_SOAK_SCALE', 1))
+
+# maximal growth of memory allocated by Python between the warm-up and the end of a test
+memory_tolerance = 512 * 1024
+
+
+def repetitions(count):
+    return max(int(count * scale), 10)
+
+
+def wrapper_depth(function):
+    """How many times was the function wrapped with anki.hooks.wrap()?"""
+    depth = 0
+    function = getattr(function, '__func__', function)
+
+    while 'old' in getattr(getattr(function, '__code__', None), 'co_freevars', ()):
+        old = function.__closure__[function.__code__.co_freevars.index('old')].cell_contents
+        function = getattr(old, '__func__', old)
+        depth += 1
+
+    return depth
+
+
+class Measurement:
+
+    def __init__(self, app):
+        from PyQt5.QtWidgets import QApplication
+
+        settle()
+        self.memory = tracemalloc.take_snapshot()
+        self.widgets = len(QApplication.allWidgets())
+        self.instances = {
+            styler.name: len(styler.instances)
+            for styler in app.styles.stylers
+        }
+        self.wrappers = {
+            (styler.name, key): wrapper_depth(getattr(styler.target, key))
+            for styler in app.styles.stylers
+            for key in styler.wrappers
+            if not type(styler).is_lazy
+        }
+
+    def assert_no_growth(self, later):
+        statistics = later.memory.compare_to(self.memory, 'filename')
+        growth = sum(statistic.size_diff for statistic in statistics)
+        print(f'Memory growth: {growth / 1024:.0f} KiB, widgets: {self.widgets} -> {later.widgets}')
+
+        assert growth < memory_tolerance, statistics[:10]
+        assert later.widgets <= self.widgets
+        for name, count in later.instances.items():
+            assert count <= self.instances.get(name, 0), name
+        assert later.wrappers == self.wrappers
+
+
+def soak(app, cycle, count):
+    # warm up the caches first, so that these are not counted as leaks
+    for i in range(10):
+        cycle(i)
+
+    tracemalloc.start()
+    try:
+        before = Measurement(app)
+        for i in range(repetitions(count)):
+            cycle(i)
+        after = Measurement(app)
+    finally:
+        tracemalloc.stop()
+
+    before.assert_no_growth(after)
+
+
+def test_refresh_cycles():
+    with anki_running():
+        app = enabled_night_mode()
+
+        def cycle(i):
+            # each refresh waits for its styling to be compiled and applied, so that the jobs do not pile up
+            switch_night_mode(app, True, reload=True)
+
+        soak(app, cycle, 10000)
+
+
+def test_dialogs():
+    with anki_running():
+        import aqt
+        from aqt import mw
+        app = enabled_night_mode()
+        app.refresh()
+
+        def open_and_close(name):
+            def cycle(i):
+                window = aqt.dialogs.open(name, mw)
+                window.close()
+                settle()
+            return cycle
+
+        for name in ['Browser', 'AddCards', 'DeckStats']:
+            soak(app, open_and_close(name), 300)
+
+        def setting_windows(i):
+            for setting in [app.config.user_color_map, app.config.mode_settings, app.config.disabled_stylers]:
+                setting.action()
+                setting.window.close()
+                settle()
+                assert setting.window is None
+
+        soak(app, setting_windows, 300)
+
+
+def test_loading_notes():
+    with anki_running():
+        import aqt
+        from aqt import mw
+        app = enabled_night_mode()
+        app.refresh()
+
+        add_cards = aqt.dialogs.open('AddCards', mw)
+        editor = add_cards.editor
+        note = editor.note
+
+        def cycle(i):
+            note.fields[0] = f'Note {i}'
+            editor.setNote(note)
+            if i % 100 == 0:
+                settle()
+
+        soak(app, cycle, 5000)
+
+        add_cards.close()
@@ -20,3 +20,136 @@ def test_appends():
 
         element = SomeElement()
         assert SomeElementStyler.additions['my_css'].value(element) == ' and my injection!'
+
+
+def test_instances_registry():
+
+    with anki_running():
+        import gc
+        from night_mode.stylers import Styler
+        from night_mode.internals import wraps
+
+        class Window:
+
+            def __init__(self):
+                self.styled = False
+
+        class WindowStyler(Styler):
+            target = Window
+
+            @wraps
+            def init(self, window):
+                window.styled = True
+
+        class App:
+            config = None
+
+        styler = WindowStyler(App())
+        styler.track_instances()
+
+        window = Window()
+        assert set(styler.instances) == {window}
+        assert not window.styled
+
+        styler.replace_attributes()
+        styled_window = Window()
+        assert styled_window.styled
+        assert set(styler.instances) == {window, styled_window}
+
+        # called again (e.g. when required by another styler): the singleton is not initialized again
+        assert WindowStyler(App()) is styler
+        assert set(styler.instances) == {window, styled_window}
+        assert '__init__' in styler.original_attributes
+
+        styler.restore_attributes()
+        assert not Window().styled
+        del window, styled_window
+        gc.collect()
+        assert not styler.instances
+
+
+def test_lazy_target():
+
+    with anki_running():
+        from night_mode.stylers import Styler
+        from night_mode.internals import wraps, LazyTarget
+        from night_mode.gui import AddonDialog
+
+        assert LazyTarget('night_mode.gui.AddonDialog').resolve() is AddonDialog
+
+        resolved = []
+
+        class Window:
+
+            def show(self):
+                return 'shown'
+
+        def resolve():
+            resolved.append(Window)
+            return Window
+
+        class LazyWindowStyler(Styler):
+            target = LazyTarget(resolve)
+
+            @wraps(position='around')
+            def show(self, window, _old):
+                return _old(window) + ' in the dark'
+
+        class App:
+            config = None
+
+        styler = LazyWindowStyler(App())
+        styler.track_instances()
+
+        # nothing is resolved nor wrapped until the styler is activated
+        assert LazyWindowStyler.is_lazy
+        assert not resolved
+
+        styler.replace_attributes()
+        assert resolved == [Window]
+        assert Window().show() == 'shown in the dark'
+
+        styler.restore_attributes()
+        assert Window().show() == 'shown'
+
+        styler.replace_attributes()
+        styler.restore_attributes()
+        assert resolved == [Window]
+
+        Styler.members.discard(LazyWindowStyler)
+
+
+def test_unregister():
+
+    with anki_running():
+        from night_mode import night_mode as app
+        from night_mode.stylers import Styler
+        from night_mode.internals import wraps
+
+        class Window:
+
+            def __init__(self):
+                self.styled = False
+
+        class WindowStyler(Styler):
+            target = Window
+
+            @wraps
+            def init(self, window):
+                window.styled = True
+
+        original_init = Window.__init__
+
+        styler = app.register_styler(WindowStyler)
+        assert Window.__init__ is not original_init
+
+        # registering again does not initialize the styler nor wrap the constructor once more
+        window = Window()
+        init = Window.__init__
+        assert app.register_styler(WindowStyler) is styler
+        assert set(styler.instances) == {window}
+        assert Window.__init__ is init
+
+        app.unregister_styler(WindowStyler)
+        assert Window.__init__ is original_init
+        assert WindowStyler not in Styler.members
@@ -0,0 +1,75 @@
+from anki_testing import anki_running
+
+from helpers import enabled_night_mode
+
+
+def test_switches_select_precompiled_variants():
+    with anki_running():
+        from night_mode.config import switch_settings, ConfigValueGetter
+        from night_mode.stylers import DeckBrowserStyler, ReviewerCards, EditorWebViewStyler
+
+        app = enabled_night_mode()
+        stylers = app.styles.prepare()
+        snapshot = app.config.snapshot()
+
+        compiled = app.styles.compile(stylers, snapshot)
+        app.styles.precompile_variants(stylers, snapshot, is_stale=lambda: False)
+
+        deck_browser = DeckBrowserStyler.instance
+
+        # the styling which each switch changes: compiled for the stylers which
+        # append to their targets, rendered on use for the reviewer and the editors
+        def scroll_bars_css(variant, flipped_snapshot):
+            return variant[deck_browser].additions['_body']
+
+        def card_css(variant, flipped_snapshot):
+            with ConfigValueGetter.overridden(flipped_snapshot):
+                return ReviewerCards.instance.body
+
+        def editor_css(variant, flipped_snapshot):
+            with ConfigValueGetter.overridden(flipped_snapshot):
+                return EditorWebViewStyler.instance.editor_css
+
+        affected_css = {
+            'style_scroll_bars': scroll_bars_css,
+            'invert_image': card_css,
+            'invert_latex': card_css,
+            'enable_in_dialogs': editor_css,
+        }
+        assert affected_css.keys() == switch_settings
+
+        misses = app.styles.variants.misses
+        for name, css in affected_css.items():
+            flipped_snapshot = {**snapshot, name: not snapshot[name]}
+            flipped = app.styles.compile(stylers, flipped_snapshot)
+
+            assert flipped.keys() == compiled.keys()
+            assert css(flipped, flipped_snapshot) != css(compiled, snapshot), name
+
+        assert app.styles.variants.misses == misses
+
+        # and back
+        assert app.styles.compile(stylers, snapshot) == compiled
+        assert app.styles.variants.misses == misses
+
+
+def test_editor_style_follows_settings():
+    with anki_running():
+        from night_mode.stylers import EditorWebViewStyler
+
+        app = enabled_night_mode()
+        styler = EditorWebViewStyler.instance
+        invert_image = app.config.invert_image
+
+        try:
+            invert_image.value = True
+            assert '.field img{filter:invert(1)' in styler.live_css
+
+            invert_image.value = False
+            assert '.field img' not in styler.live_css
+
+            app.config.enable_in_dialogs.value = False
+            assert styler.live_css == ''
+        finally:
+            invert_image.reset()
+            app.config.enable_in_dialogs.reset()
@@ -0,0 +1,130 @@
+import os
+
+from anki_testing import anki_running
+
+from helpers import wait_for
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+def load(web, html='<html><head></head><body><p>card</p></body></html>'):
+    loaded = []
+    web.page().loadFinished.connect(loaded.append)
+    web.setHtml(html)
+    wait_for(lambda: loaded)
+
+
+def evaluate(web, script):
+    results = []
+    web.page().runJavaScript(script, results.append)
+    wait_for(lambda: results)
+    return results[0]
+
+
+def test_roles():
+    with anki_running():
+        from aqt import mw
+        from aqt.webview import AnkiWebView
+        from PyQt5.QtWidgets import QDialog, QVBoxLayout
+        from night_mode.web_views import WebViewRegistry
+
+        registry = WebViewRegistry()
+
+        assert registry.role(mw.web) == 'main'
+        assert registry.role(mw.toolbar.web) == 'toolbar'
+        assert registry.role(mw.bottomWeb) == 'bottom'
+        assert registry.role(AnkiWebView()) == 'other'
+
+        # resolved by the class of the window, once the view is placed in it
+        class DeckStats(QDialog):
+            pass
+
+        window = DeckStats()
+        web = AnkiWebView()
+        assert registry.role(web) == 'other'
+        QVBoxLayout(window).addWidget(web)
+        assert registry.role(web) == 'stats'
+
+
+def test_script():
+    with anki_running():
+        from aqt.webview import AnkiWebView
+        from night_mode.web_views import WebViewRegistry
+
+        registry = WebViewRegistry()
+        web = AnkiWebView()
+        load(web)
+
+        def state(style_id=registry.style_id):
+            return evaluate(web, f"""
+            [
+                Array.from(document.querySelectorAll('#{style_id}')).map(style => style.textContent),
+                document.body.classList.contains('night_mode')
+            ]
+            """)
+
+        assert registry.script() == '(function(){})()'
+
+        evaluate(web, registry.script(css='p{color:"white"}', night_class=True))
+        assert state() == [['p{color:"white"}'], True]
+
+        # the live style sheet is replaced, not added again
+        evaluate(web, registry.script(css='p{color:#eee}'))
+        assert state() == [['p{color:#eee}'], True]
+
+        evaluate(web, registry.script(night_class=False))
+        assert state() == [['p{color:#eee}'], False]
+
+        evaluate(web, registry.script(css='a{}', style_id='other-style'))
+        assert state('other-style') == [['a{}'], False]
+        assert state() == [['p{color:#eee}'], False]
+
+
+def test_push():
+    with anki_running():
+        from aqt.webview import AnkiWebView
+        from PyQt5.QtWidgets import QDialog, QVBoxLayout
+        from night_mode.web_views import WebViewRegistry
+
+        class DeckStats(QDialog):
+            pass
+
+        registry = WebViewRegistry()
+        window = DeckStats()
+        stats, other = AnkiWebView(), AnkiWebView()
+        QVBoxLayout(window).addWidget(stats)
+
+        evaluated = {stats: [], other: []}
+        for web in [stats, other]:
+            registry.register(web)
+            web.eval = evaluated[web].append
+
+        registry.push(css='a{}', roles={'stats'})
+        assert evaluated == {stats: [registry.script(css='a{}')], other: []}
+
+        # a single script per view
+        registry.push(css='b{}', night_class=True)
+        assert evaluated[other] == [registry.script(css='b{}', night_class=True)]
+        assert len(evaluated[stats]) == 2
+
+
+def test_deleted_views_are_dropped():
+    with anki_running():
+        from aqt.webview import AnkiWebView
+        from night_mode.web_views import WebViewRegistry
+
+        try:
+            from PyQt5 import sip
+        except ImportError:
+            import sip
+
+        registry = WebViewRegistry()
+        kept, deleted = AnkiWebView(), AnkiWebView()
+        registry.register(kept)
+        registry.register(deleted)
+
+        # the Python object outlives the Qt one
+        sip.delete(deleted)
+
+        assert list(registry.live()) == [kept]
+        assert set(registry.web_views) == {kept}